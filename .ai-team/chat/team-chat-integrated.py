@@ -12,10 +12,25 @@ import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 import subprocess
+import threading
 import time
 
 # Add Virtual Office path to system
 sys.path.insert(0, r'C:\www.spa.com\.ai-team\virtual-office')
+sys.path.insert(1, str(Path(__file__).resolve().parent.parent / 'virtual-office'))
+
+# Shared Virtual Office modules are optional: without them the chat runs standalone
+try:
+    from channel_index import get_channel_index
+    from chat_log import ChatLog, render_markdown
+    from doc_cache import get_document_cache
+    from log_follower import MarkdownChatFollower
+    from office_server import OfficeStateClient
+    from office_writer import get_writer
+    from presence import PresenceLog
+    OFFICE_MODULES = True
+except ImportError:
+    OFFICE_MODULES = False
 
 # ANSI color codes
 class Colors:
@@ -37,6 +52,11 @@ class IntegratedTeamChat:
         self.chat_file = self.aidd_path / 'agent-chat.md'
         self.virtual_office = self.team_path / "virtual-office"
 
+        # Indexed chat log, batched writes and live follow (None in standalone mode)
+        self.chat_log = ChatLog.for_markdown(self.chat_file) if OFFICE_MODULES else None
+        self.writer = get_writer() if OFFICE_MODULES else None
+        self.follower = MarkdownChatFollower(self.chat_file) if OFFICE_MODULES else None
+
         # Virtual Office components
         self.tasks_dir = self.virtual_office / "tasks"
         self.inbox_dir = self.virtual_office / "inbox"
@@ -45,9 +65,22 @@ class IntegratedTeamChat:
         # State
         self.messages = []
         self.current_user = 'User'
+        self.doc_cache = get_document_cache() if OFFICE_MODULES else None
         self.agents = self.load_agents()
         self.ceo_interface = None
 
+        # Presence transitions written by the monitor (system/presence.log)
+        self.presence_log = PresenceLog(self.team_path / "system" / "presence.log") if OFFICE_MODULES else None
+        self.poll_presence = self.presence_log.follow() if self.presence_log else (lambda: [])
+
+        # Office state from `monitor.py serve` (shared scan); local scan if it is not running
+        self.office_state = OfficeStateClient() if OFFICE_MODULES else None
+
+        # Live follow of agent-chat.md
+        self.own_entries = []
+        self.following = False
+        self.prompt = ''
+
         # Try to import CEO Interface
         try:
             from ceo_interface import CEOInterface
@@ -67,18 +100,22 @@ class IntegratedTeamChat:
         # Load Virtual Office agents if available
         agents_config = self.team_path / "system" / "agents.json"
         if agents_config.exists():
-            with open(agents_config, 'r', encoding='utf-8') as f:
-                vo_data = json.load(f)
-                vo_agents = vo_data.get('agents', vo_data)  # Handle both formats
-                for agent_id, agent_data in vo_agents.items():
-                    if agent_id not in ['Claude', 'Cursor', 'User']:
-                        agents[agent_data['name']] = {
-                            'icon': agent_data.get('emoji', '🤖'),
-                            'color': Colors.TEAM,
-                            'status': agent_data.get('status', 'Available'),
-                            'role': agent_data.get('role', 'Specialist'),
-                            'skills': agent_data.get('skills', [])
-                        }
+            if self.doc_cache:
+                vo_data = self.doc_cache.load(agents_config)
+            else:
+                with open(agents_config, 'r', encoding='utf-8') as f:
+                    vo_data = json.load(f)
+            vo_agents = vo_data.get('agents', vo_data)  # Handle both formats
+            for agent_id, agent_data in vo_agents.items():
+                if agent_id not in ['Claude', 'Cursor', 'User']:
+                    agents[agent_data['name']] = {
+                        'id': agent_id,
+                        'icon': agent_data.get('emoji', '🤖'),
+                        'color': Colors.TEAM,
+                        'status': agent_data.get('status', 'Available'),
+                        'role': agent_data.get('role', 'Specialist'),
+                        'skills': agent_data.get('skills', [])
+                    }
 
         return agents
 
@@ -166,6 +203,17 @@ class IntegratedTeamChat:
         print(f"{Colors.BOLD}{Colors.TEAM}🏢 Virtual Office Status:{Colors.RESET}")
         print()
 
+        state = self.office_state.state() if self.office_state else None
+        if state is not None:
+            print(f"  🩺 Status: {Colors.BOLD}{state['status'].upper()}{Colors.RESET} "
+                  f"({state['agents_online']}/{state['total_agents']} agents online)")
+            print(f"  📋 Tasks: {Colors.BOLD}{state['tasks_total']}{Colors.RESET}")
+            print(f"  📥 Unread Messages: {Colors.BOLD}{state['unread_total']}{Colors.RESET}")
+            for agent in state["agents"]:
+                print(f"  • {agent['name']:<10} {agent['status']:<8} inbox {agent['inbox']:<4} tasks {agent['tasks_assigned']}")
+            print(f"{Colors.DIM}  (from monitor service, updated {state['updated_at'][11:19]}){Colors.RESET}")
+            return
+
         if not self.virtual_office.exists():
             print(f"{Colors.DIM}Virtual Office not initialized{Colors.RESET}")
             return
@@ -207,19 +255,187 @@ class IntegratedTeamChat:
 
     def save_message(self, author: str, message: str, status: str = "Active"):
         """Save message to agent-chat.md"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-
         # Check if it's a Virtual Office agent
         is_vo_agent = author not in ['User', 'Claude', 'Cursor', 'System']
 
-        entry = f"""
-### {timestamp} [{author}] {"Virtual Office" if is_vo_agent else "Terminal Chat"}
-**Статус**: {status}
-**Сообщение**: {message}
----
-"""
-        with open(self.chat_file, 'a', encoding='utf-8') as f:
-            f.write(entry)
+        if self.chat_log is None:
+            # Standalone: plain append to the markdown file
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+            with open(self.chat_file, 'a', encoding='utf-8') as f:
+                f.write(f"\n### {timestamp} [{author}] {'Virtual Office' if is_vo_agent else 'Terminal Chat'}\n"
+                        f"**Статус**: {status}\n**Сообщение**: {message}\n---\n")
+            return
+
+        entry = self.chat_log.append({
+            "author": author,
+            "title": "Virtual Office" if is_vo_agent else "Terminal Chat",
+            "status": status,
+            "message": message
+        })
+
+        # Markdown view for the dashboards and PowerShell agents
+        markdown = render_markdown(entry)
+        self.writer.append_text(self.chat_file, markdown)
+
+        # Do not echo our own entry back when following
+        self.own_entries.append(markdown.strip())
+
+    def fetch_new_messages(self) -> List[Dict]:
+        """Entries appended to agent-chat.md by other terminals and agents since the last check"""
+        new_messages = []
+        if self.follower is None:
+            return new_messages
+        for msg in self.follower.poll():
+            if msg['raw'] in self.own_entries:
+                self.own_entries.remove(msg['raw'])
+                continue
+            new_messages.append(msg)
+        self.messages.extend(new_messages)
+        return new_messages
+
+    def entry_to_message(self, entry: Dict) -> Dict:
+        """Convert a chat log entry to the header/content form used by print_message"""
+        lines = render_markdown(entry).strip().split('\n')
+        return {
+            'header': lines[0].lstrip('# '),
+            'content': '\n'.join(line for line in lines[1:] if line != '---')
+        }
+
+    def print_message(self, msg: Dict):
+        """Print one followed message, colored by its author"""
+        header = msg['header']
+        author = header[header.find('[') + 1:header.find(']')] if '[' in header else ''
+        color = self.agents.get(author, {}).get('color', Colors.SYSTEM)
+        print(f"{color}{header}{Colors.RESET}")
+        if msg['content']:
+            print(f"{Colors.DIM}{msg['content']}{Colors.RESET}")
+
+    def follow_loop(self, interval: float = 0.5):
+        """Background loop: one stat per tick, prints new messages above the prompt"""
+        while self.following:
+            try:
+                new_messages = self.fetch_new_messages()
+                transitions = self.poll_presence()
+            except Exception as e:
+                new_messages, transitions = [], []
+                print(f"\r{Colors.SYSTEM}Follow error: {e}{Colors.RESET}")
+            if new_messages or transitions:
+                print('\r\033[K', end='')
+                for msg in new_messages:
+                    self.print_message(msg)
+                for event in transitions:
+                    print(f"{Colors.DIM}• {event.describe()}{Colors.RESET}")
+                print(self.prompt, end='', flush=True)
+            time.sleep(interval)
+
+    def toggle_follow(self):
+        """Start or stop streaming new messages in the background"""
+        if self.following:
+            self.following = False
+            print(f"{Colors.SYSTEM}Live follow stopped{Colors.RESET}")
+            return
+        if self.follower is None:
+            print(f"{Colors.DIM}Live follow needs the Virtual Office modules{Colors.RESET}")
+            return
+
+        self.following = True
+        threading.Thread(target=self.follow_loop, daemon=True).start()
+        print(f"{Colors.SUCCESS}Live follow started - new messages appear automatically{Colors.RESET}")
+
+    def show_history(self, page: int = 0, page_size: int = 10):
+        """Show a page of chat history from the indexed log"""
+        if self.chat_log is None:
+            print(f"{Colors.DIM}Chat history needs the Virtual Office modules{Colors.RESET}")
+            return
+        try:
+            # Entries PowerShell agents appended straight to agent-chat.md
+            self.chat_log.import_markdown(self.chat_file)
+        except (OSError, ValueError) as e:
+            print(f"{Colors.SYSTEM}Could not import agent-chat.md: {e}{Colors.RESET}")
+        entries = self.chat_log.page(page, page_size)
+        if not entries:
+            print(f"{Colors.DIM}No messages on page {page}.{Colors.RESET}")
+            return
+
+        total_pages = (self.chat_log.count() + page_size - 1) // page_size
+        print(f"{Colors.BOLD}{Colors.SYSTEM}📜 History page {page}/{total_pages - 1}:{Colors.RESET}")
+        for entry in entries:
+            # Imported and line entries have no author/message fields: go through the markdown view
+            self.print_message(self.entry_to_message(entry))
+
+    def show_channel(self, args: List[str]):
+        """Show channel history: /channel general --since 10:00 --until 11:00 --from devops --last 20"""
+        if not args or args[0].startswith('--'):
+            print(f"{Colors.DIM}Usage: /channel <name> [--since HH:MM|YYYY-MM-DD HH:MM] [--until ...] "
+                  f"[--from agent] [--last N]{Colors.RESET}")
+            return
+        if not OFFICE_MODULES:
+            print(f"{Colors.DIM}Channel history needs the Virtual Office modules{Colors.RESET}")
+            return
+
+        channel_dir = self.virtual_office / "channels" / args[0].lstrip('#')
+        if not channel_dir.is_dir():
+            print(f"{Colors.DIM}Channel #{args[0].lstrip('#')} not found{Colors.RESET}")
+            return
+
+        options = {}
+        rest = args[1:]
+        i = 0
+        while i < len(rest):
+            flag = rest[i]
+            if flag.startswith('--') and i + 1 < len(rest):
+                value = rest[i + 1]
+                i += 2
+                # "--since 2025-09-17 10:00": date and time are separate words
+                if flag in ('--since', '--until') and len(value) == 10 and i < len(rest) and ':' in rest[i]:
+                    value += ' ' + rest[i]
+                    i += 1
+                options[flag] = value
+            else:
+                i += 1
+
+        def bound(value: Optional[str], day: str, end: bool) -> str:
+            if not value:
+                return ''
+            if len(value) <= 5 and ':' in value:
+                value = f"{day} {value.zfill(5)}"
+            # "10:30" as an upper bound includes the whole minute
+            if end and len(value) == 16:
+                value += ':59'
+            return value
+
+        since = bound(options.get('--since'), datetime.date.today().isoformat(), False)
+        # A bare "--until 11:00" is on the same day as --since
+        until = bound(options.get('--until'), since[:10] or datetime.date.today().isoformat(), True)
+        author = options.get('--from', '').lstrip('@') or None
+        last = options.get('--last')
+        limit = int(last) if last and last.isdigit() else (None if since or until else 20)
+
+        messages = get_channel_index(channel_dir).query(since, until, author, limit)
+        title = f"#{channel_dir.name}" + (f" from {author}" if author else "")
+        print(f"{Colors.BOLD}{Colors.TEAM}📺 {title}: {len(messages)} message(s){Colors.RESET}")
+        for msg in messages:
+            doc = msg.doc if isinstance(msg.doc, dict) else {}
+            agent = doc.get('agent', '?')
+            timestamp = doc.get('timestamp') or f"{doc.get('date', msg.day)} {doc.get('time', '')}".strip()
+            text = doc.get('message') or doc.get('today') or doc.get('question') or ''
+            print(f"{Colors.DIM}{timestamp}{Colors.RESET} {Colors.TEAM}[{agent}]{Colors.RESET} {text}")
+
+    def show_presence(self, args: List[str]):
+        """Show presence transitions: /presence [agent] [N]"""
+        agent = next((arg.lower().lstrip('@') for arg in args if not arg.isdigit()), None)
+        limit = next((int(arg) for arg in args if arg.isdigit()), 20)
+        if self.presence_log is None:
+            print(f"{Colors.DIM}Presence history needs the Virtual Office modules{Colors.RESET}")
+            return
+        events = self.presence_log.query(agent=agent, limit=limit)
+        if not events:
+            print(f"{Colors.DIM}No presence changes recorded.{Colors.RESET}")
+            return
+        print(f"{Colors.BOLD}{Colors.TEAM}👥 Presence changes:{Colors.RESET}")
+        for event in events:
+            stamp = datetime.datetime.fromtimestamp(event.at).strftime('%Y-%m-%d %H:%M')
+            print(f"{Colors.TEAM}[{stamp}] {event.agent}: {event.old} → {event.new}{Colors.RESET}")
 
     def show_help(self):
         """Show extended help"""
@@ -227,6 +443,9 @@ class IntegratedTeamChat:
         print(f"\n{Colors.BOLD}Basic Commands:{Colors.RESET}")
         print(f"  /help     - Show this help")
         print(f"  /clear    - Clear screen")
+        print(f"  /history [N] - Show page N of chat history (0 = newest)")
+        print(f"  /reload   - Show new messages from other terminals")
+        print(f"  /follow   - Toggle live follow of new messages")
         print(f"  /exit     - Exit chat")
 
         print(f"\n{Colors.BOLD}Team Commands:{Colors.RESET}")
@@ -240,6 +459,8 @@ class IntegratedTeamChat:
         print(f"  /monitor  - Start agents monitor")
         print(f"  /inbox    - Check office inbox")
         print(f"  /report   - Generate status report")
+        print(f"  /channel <name> [--since 10:00] [--until 11:00] [--from agent] [--last N]")
+        print(f"  /presence [agent] [N] - Online/idle/offline changes")
 
         print(f"\n{Colors.BOLD}Examples:{Colors.RESET}")
         print(f"  /task @Frontend implement booking calendar")
@@ -260,6 +481,16 @@ class IntegratedTeamChat:
             self.show_help()
         elif cmd == '/agents':
             self.show_agents()
+        elif cmd == '/history':
+            arg = command[len('/history'):].strip()
+            self.show_history(int(arg) if arg.isdigit() else 0)
+        elif cmd == '/reload':
+            new_messages = self.fetch_new_messages()
+            for msg in new_messages:
+                self.print_message(msg)
+            print(f"{Colors.SUCCESS}{len(new_messages)} new message(s){Colors.RESET}")
+        elif cmd == '/follow':
+            self.toggle_follow()
         elif cmd == '/office':
             self.show_office_status()
         elif cmd == '/monitor':
@@ -281,6 +512,10 @@ class IntegratedTeamChat:
                     print(f"  • {item.get('subject', 'No subject')}")
             else:
                 print(f"{Colors.DIM}Virtual Office not connected{Colors.RESET}")
+        elif cmd == '/channel':
+            self.show_channel(command.split()[1:])
+        elif cmd == '/presence':
+            self.show_presence(command.split()[1:])
         elif cmd == '/report':
             print(f"{Colors.TEAM}Generating status report...{Colors.RESET}")
             # Could integrate with Virtual Office reporting
@@ -320,12 +555,9 @@ class IntegratedTeamChat:
             # If Virtual Office agent, create task
             vo_mentions = [m for m in mentioned if m not in ['Claude', 'Cursor', 'User']]
             if vo_mentions and self.ceo_interface:
-                for agent in vo_mentions:
-                    self.ceo_interface.send_message(
-                        to=agent,
-                        subject=f"Mention from {self.current_user}",
-                        content=message
-                    )
+                # One stored message linked into every mentioned agent's inbox
+                recipients = [self.agents[m].get('id', m.lower()) for m in vo_mentions]
+                self.ceo_interface.send_to_agents(recipients, message, sender=self.current_user)
 
     def run(self):
         """Main chat loop"""
@@ -337,8 +569,8 @@ class IntegratedTeamChat:
             try:
                 # Create prompt
                 agent = self.agents.get(self.current_user, {'icon': '?', 'color': Colors.RESET})
-                prompt = f"{agent['color']}{agent['icon']} {self.current_user}> {Colors.RESET}"
-                message = input(prompt).strip()
+                self.prompt = f"{agent['color']}{agent['icon']} {self.current_user}> {Colors.RESET}"
+                message = input(self.prompt).strip()
 
                 if not message:
                     continue
@@ -346,6 +578,7 @@ class IntegratedTeamChat:
                 # Check commands
                 if message.startswith('/'):
                     if not self.process_command(message):
+                        self.following = False
                         break
                     continue
 
@@ -6,11 +6,17 @@ AI Team Chat - Terminal Interface
 
 import os
 import sys
-import json
-import datetime
-from typing import List, Dict, Optional
+import time
+import threading
+from typing import List, Dict
 from pathlib import Path
 
+# Shared Virtual Office modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'virtual-office'))
+from chat_log import ChatLog, render_markdown
+from log_follower import MarkdownChatFollower
+from office_writer import get_writer
+
 # ANSI color codes for terminal
 class Colors:
     CLAUDE = '\033[95m'    # Purple
@@ -25,9 +31,18 @@ class Colors:
 class TeamChat:
     def __init__(self):
         self.chat_file = Path(__file__).parent / 'agent-chat.md'
+        self.chat_log = ChatLog.for_markdown(self.chat_file)
+        self.writer = get_writer()
         self.messages = []
         self.current_user = 'User'
 
+        # Live follow: only bytes appended after startup are parsed
+        self.follower = MarkdownChatFollower(self.chat_file)
+        self.own_entries = []
+        self.following = False
+        self.follow_thread = None
+        self.prompt = ''
+
     def clear_screen(self):
         """Clear terminal screen"""
         os.system('cls' if os.name == 'nt' else 'clear')
@@ -44,41 +59,80 @@ class TeamChat:
         print("-" * 60)
         print()
 
-    def load_messages(self):
-        """Load messages from agent-chat.md"""
-        if not self.chat_file.exists():
-            return
+    def entry_to_message(self, entry: Dict) -> Dict:
+        """Convert a chat log entry to the header/content form used for display"""
+        lines = render_markdown(entry).strip().split('\n')
+        return {
+            'header': lines[0].lstrip('# '),
+            'content': '\n'.join(line for line in lines[1:] if line != '---')
+        }
+
+    def import_markdown(self):
+        """Bring entries written straight to agent-chat.md (PowerShell agents, other tools) into the log"""
+        try:
+            self.chat_log.import_markdown(self.chat_file)
+        except (OSError, ValueError) as e:
+            print(f"{Colors.SYSTEM}Could not import agent-chat.md: {e}{Colors.RESET}")
 
-        with open(self.chat_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            # Parse messages from markdown
-            # This is simplified - in production would parse more carefully
-            if '## 📝 Лог коммуникации' in content:
-                log_section = content.split('## 📝 Лог коммуникации')[1]
-                # Extract recent messages
-                entries = log_section.split('###')[1:4]  # Get last 3 entries
-                for entry in entries:
-                    lines = entry.strip().split('\n')
-                    if lines:
-                        self.messages.append({
-                            'header': lines[0],
-                            'content': '\n'.join(lines[1:])
-                        })
+    def load_messages(self, last_n: int = 10):
+        """Load recent messages from the chat log, including entries appended to agent-chat.md"""
+        self.import_markdown()
+        self.messages = [self.entry_to_message(entry) for entry in self.chat_log.last(last_n)]
 
     def save_message(self, author: str, message: str, status: str = "В процессе"):
         """Save message to agent-chat.md"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-
-        entry = f"""
-### {timestamp} [{author}] Сообщение из терминала
-**Статус**: {status}
-**Сообщение**: {message}
----
-"""
+        entry = self.chat_log.append({
+            "author": author,
+            "title": "Сообщение из терминала",
+            "status": status,
+            "message": message
+        })
+
+        # Append markdown view to file
+        markdown = render_markdown(entry)
+        self.writer.append_text(self.chat_file, markdown)
+
+        # Do not echo our own entry back when following
+        self.own_entries.append(markdown.strip())
+
+    def fetch_new_messages(self) -> List[Dict]:
+        """Read entries appended to agent-chat.md since the last check (by other terminals/agents)"""
+        new_messages = []
+        for msg in self.follower.poll():
+            if msg['raw'] in self.own_entries:
+                self.own_entries.remove(msg['raw'])
+                continue
+            new_messages.append({'header': msg['header'], 'content': msg['content']})
+
+        self.messages.extend(new_messages)
+        return new_messages
+
+    def follow_loop(self, interval: float = 0.5):
+        """Background loop: one stat per tick, prints new messages above the prompt"""
+        while self.following:
+            try:
+                new_messages = self.fetch_new_messages()
+            except Exception as e:
+                new_messages = []
+                print(f"\r{Colors.SYSTEM}Follow error: {e}{Colors.RESET}")
+            if new_messages:
+                print('\r\033[K', end='')
+                for msg in new_messages:
+                    self.print_message(msg)
+                print(self.prompt, end='', flush=True)
+            time.sleep(interval)
+
+    def toggle_follow(self):
+        """Start or stop streaming new messages in the background"""
+        if self.following:
+            self.following = False
+            print(f"{Colors.SYSTEM}Live follow stopped{Colors.RESET}")
+            return
 
-        # Append to file
-        with open(self.chat_file, 'a', encoding='utf-8') as f:
-            f.write(entry)
+        self.following = True
+        self.follow_thread = threading.Thread(target=self.follow_loop, daemon=True)
+        self.follow_thread.start()
+        print(f"{Colors.SUCCESS}Live follow started - new messages appear automatically{Colors.RESET}")
 
     def display_messages(self, last_n: int = 10):
         """Display recent messages"""
@@ -87,23 +141,27 @@ class TeamChat:
             return
 
         for msg in self.messages[-last_n:]:
-            # Determine color based on author
-            if '[Claude]' in msg['header']:
-                color = Colors.CLAUDE
-                icon = '🤖'
-            elif '[Cursor]' in msg['header']:
-                color = Colors.CURSOR
-                icon = '⚡'
-            elif '[User]' in msg['header']:
-                color = Colors.USER
-                icon = '👤'
-            else:
-                color = Colors.SYSTEM
-                icon = '📢'
+            self.print_message(msg)
+
+    def print_message(self, msg: Dict):
+        """Print one message"""
+        # Determine color based on author
+        if '[Claude]' in msg['header']:
+            color = Colors.CLAUDE
+            icon = '🤖'
+        elif '[Cursor]' in msg['header']:
+            color = Colors.CURSOR
+            icon = '⚡'
+        elif '[User]' in msg['header']:
+            color = Colors.USER
+            icon = '👤'
+        else:
+            color = Colors.SYSTEM
+            icon = '📢'
 
-            print(f"{color}{icon} {msg['header']}{Colors.RESET}")
-            print(f"{Colors.DIM}{msg['content']}{Colors.RESET}")
-            print()
+        print(f"{color}{icon} {msg['header']}{Colors.RESET}")
+        print(f"{Colors.DIM}{msg['content']}{Colors.RESET}")
+        print()
 
     def show_status(self):
         """Show current project status"""
@@ -141,7 +199,9 @@ class TeamChat:
         print(f"  {Colors.BOLD}/status{Colors.RESET}  - Show project status")
         print(f"  {Colors.BOLD}/tasks{Colors.RESET}   - Show current tasks")
         print(f"  {Colors.BOLD}/switch{Colors.RESET}  - Switch between User/Claude/Cursor")
-        print(f"  {Colors.BOLD}/reload{Colors.RESET}  - Reload messages from file")
+        print(f"  {Colors.BOLD}/reload{Colors.RESET}  - Load new messages from file")
+        print(f"  {Colors.BOLD}/follow{Colors.RESET}  - Toggle live follow of new messages")
+        print(f"  {Colors.BOLD}/history [N]{Colors.RESET} - Show page N of older messages (0 = newest)")
         print(f"  {Colors.BOLD}/exit{Colors.RESET}    - Exit chat")
         print(f"  {Colors.BOLD}@Claude{Colors.RESET}  - Mention Claude in message")
         print(f"  {Colors.BOLD}@Cursor{Colors.RESET}  - Mention Cursor in message")
@@ -166,10 +226,30 @@ class TeamChat:
 
         print(f"\n{colors[self.current_user]}{icons[self.current_user]} Switched to: {Colors.BOLD}{self.current_user}{Colors.RESET}\n")
 
+    def show_history(self, page: int = 0, page_size: int = 10):
+        """Show a page of chat history from the indexed log"""
+        self.import_markdown()
+        entries = self.chat_log.page(page, page_size)
+        if not entries:
+            print(f"{Colors.DIM}No messages on page {page}.{Colors.RESET}")
+            return
+
+        total_pages = (self.chat_log.count() + page_size - 1) // page_size
+        print(f"{Colors.BOLD}{Colors.SYSTEM}📜 History page {page}/{total_pages - 1}:{Colors.RESET}")
+        for entry in entries:
+            msg = self.entry_to_message(entry)
+            print(f"{Colors.BOLD}{msg['header']}{Colors.RESET}")
+            print(f"{Colors.DIM}{msg['content']}{Colors.RESET}")
+
     def process_command(self, command: str) -> bool:
         """Process chat commands. Returns True if should continue, False to exit"""
         command = command.lower().strip()
 
+        if command.startswith('/history'):
+            arg = command[len('/history'):].strip()
+            self.show_history(int(arg) if arg.isdigit() else 0)
+            return True
+
         if command == '/exit':
             print(f"{Colors.SUCCESS}Goodbye! 👋{Colors.RESET}")
             return False
@@ -184,8 +264,12 @@ class TeamChat:
         elif command == '/switch':
             self.switch_user()
         elif command == '/reload':
-            self.load_messages()
-            print(f"{Colors.SUCCESS}Messages reloaded!{Colors.RESET}")
+            new_messages = self.fetch_new_messages()
+            for msg in new_messages:
+                self.print_message(msg)
+            print(f"{Colors.SUCCESS}Messages reloaded! ({len(new_messages)} new){Colors.RESET}")
+        elif command == '/follow':
+            self.toggle_follow()
         else:
             print(f"{Colors.DIM}Unknown command. Type /help for available commands.{Colors.RESET}")
 
@@ -214,8 +298,8 @@ class TeamChat:
                     'Cursor': '⚡'
                 }
 
-                prompt = f"{colors[self.current_user]}{icons[self.current_user]} {self.current_user}> {Colors.RESET}"
-                message = input(prompt).strip()
+                self.prompt = f"{colors[self.current_user]}{icons[self.current_user]} {self.current_user}> {Colors.RESET}"
+                message = input(self.prompt).strip()
 
                 if not message:
                     continue
@@ -223,6 +307,7 @@ class TeamChat:
                 # Check if it's a command
                 if message.startswith('/'):
                     if not self.process_command(message):
+                        self.following = False
                         break
                     continue
 
@@ -51,6 +51,10 @@ function Send-AgentMessage {
     return $messageId
 }
 
+# Message files: "to" is the recipient agent. A message sent to several agents at once
+# (ceo_interface.py send_to_agents) is one shared file linked into every inbox: its "to"
+# is "*" and "recipients" lists the agents; the recipient is the inbox folder itself.
+
 # Function to check inbox
 function Check-Inbox {
     param(
@@ -85,7 +89,8 @@ function Check-Inbox {
             "low" { "⚪" }
         }
 
-        Write-Host "$statusIcon $priorityIcon [$($msg.timestamp)] From: $($msg.from)"
+        $toAll = if ($msg.recipients) { " (to: $($msg.recipients -join ', '))" } else { "" }
+        Write-Host "$statusIcon $priorityIcon [$($msg.timestamp)] From: $($msg.from)$toAll"
         Write-Host "   $($msg.message.Substring(0, [Math]::Min(80, $msg.message.Length)))..."
         Write-Host ""
     }
@@ -144,7 +149,11 @@ function Mark-AsRead {
     foreach ($msgFile in $messages) {
         $msg = Get-Content $msgFile.FullName | ConvertFrom-Json
         $msg.status = "read"
-        $msg | ConvertTo-Json | Out-File $msgFile.FullName -Encoding UTF8
+        # Broadcasts are hard links to one shared file: write a new file and rename it
+        # over this inbox's link so only this agent's copy changes
+        $tmpPath = "$($msgFile.FullName).tmp"
+        $msg | ConvertTo-Json | Out-File $tmpPath -Encoding UTF8
+        Move-Item -Path $tmpPath -Destination $msgFile.FullName -Force
         Write-Host "Message $MessageId marked as read" -ForegroundColor Green
     }
 }
@@ -8,7 +8,8 @@ param(
 )
 
 $metricsPath = "C:\www.spa.com\.ai-team\system\metrics.json"
-$statusPath = "C:\www.spa.com\.ai-team\system\status.json"
+$boardPath = "C:\www.spa.com\.ai-team\system\heartbeat.board"
+$countersPath = "C:\www.spa.com\.ai-team\system\counters"
 
 # Initialize metrics file if not exists
 if (!(Test-Path $metricsPath)) {
@@ -33,6 +34,9 @@ if (!(Test-Path $metricsPath)) {
 }
 
 # Function to update metrics
+# Increments go to a shard file of their own instead of rewriting metrics.json:
+# concurrent updaters never overwrite each other. Readers (monitor, CEO interface)
+# add the shards to metrics.json; counters.py compact folds them into counters\base.json.
 function Update-Metrics {
     param(
         [string]$AgentName,
@@ -40,80 +44,148 @@ function Update-Metrics {
         [int]$Value
     )
 
-    # Load current metrics
-    $metrics = Get-Content $metricsPath | ConvertFrom-Json
-
-    # Update specific metric
+    $increments = @()
     switch ($MetricAction) {
         "task_completed" {
-            $metrics.agents.$AgentName.tasks_completed += $Value
-            $metrics.totals.tasks_completed += $Value
+            $increments += ,@($AgentName, "tasks_completed")
+            $increments += ,@("", "tasks_completed")
         }
         "message_processed" {
-            $metrics.agents.$AgentName.messages_processed += $Value
-            $metrics.totals.messages_sent += $Value
+            $increments += ,@($AgentName, "messages_processed")
+            $increments += ,@("", "messages_sent")
         }
         "bug_found" {
-            if ($AgentName -eq "qa") {
-                $metrics.agents.qa.bugs_found += $Value
-            }
+            if ($AgentName -eq "qa") { $increments += ,@("qa", "bugs_found") }
         }
         "test_run" {
-            if ($AgentName -eq "qa") {
-                $metrics.agents.qa.tests_run += $Value
-            }
+            if ($AgentName -eq "qa") { $increments += ,@("qa", "tests_run") }
         }
         "deployment" {
-            if ($AgentName -eq "devops") {
-                $metrics.agents.devops.deployments += $Value
-            }
+            if ($AgentName -eq "devops") { $increments += ,@("devops", "deployments") }
         }
     }
 
-    # Update timestamp
-    $metrics.last_updated = Get-Date -Format "yyyy-MM-dd HH:mm:ss"
+    if ($increments.Count -eq 0) {
+        Write-Host "⚠️ Unknown metric action: $AgentName - $MetricAction" -ForegroundColor Yellow
+        return
+    }
+
+    if (!(Test-Path $countersPath)) {
+        New-Item -ItemType Directory -Path $countersPath -Force | Out-Null
+    }
+
+    # One line per increment: ["agent","metric",value]; agent "" = office totals
+    $lines = foreach ($increment in $increments) {
+        '["{0}","{1}",{2}]' -f $increment[0], $increment[1], $Value
+    }
 
-    # Save metrics
-    $metrics | ConvertTo-Json -Depth 3 | Out-File $metricsPath -Encoding UTF8
+    # Written under a temporary name, then renamed: the shard appears complete and sealed
+    $stem = "SHARD-{0:D19}-{1}" -f [DateTime]::UtcNow.Ticks, $PID
+    $tempFile = Join-Path $countersPath "$stem.tmp"
+    [System.IO.File]::WriteAllText($tempFile, (($lines -join "`n") + "`n"))
+    Move-Item -Path $tempFile -Destination (Join-Path $countersPath "$stem.done")
 
     Write-Host "📊 Metrics updated: $AgentName - $MetricAction (+$Value)" -ForegroundColor Green
 }
 
 # Function to update agent status
+# The agent's heartbeat goes into its own fixed slot of system\heartbeat.board
+# (layout in virtual-office\heartbeat.py) instead of rewriting status.json.
 function Update-Status {
     param(
-        [string]$AgentName
+        [string]$AgentName,
+        [string]$Status = "active"
     )
 
-    if (!(Test-Path $statusPath)) {
-        $initialStatus = @{
-            agents = @{}
+    $slots = 1024; $headerSize = 64; $slotSize = 80; $nameOffset = 24; $nameBytes = 48
+    $boardSize = $headerSize + $slots * $slotSize
+    $statuses = @("unknown", "active", "online", "busy", "idle", "away", "offline", "stopped")
+    $lockPath = "$boardPath.claim.lock"
+
+    $name = [System.Text.Encoding]::UTF8.GetBytes($AgentName)
+    if ($name.Length -gt $nameBytes) { $name = $name[0..($nameBytes - 1)] }
+    $code = [Math]::Max(0, [Array]::IndexOf($statuses, $Status))
+
+    $stream = [System.IO.File]::Open($boardPath, 'OpenOrCreate', 'ReadWrite', 'ReadWrite')
+    $lock = $null
+    try {
+        $reader = New-Object System.IO.BinaryReader($stream)
+        $writer = New-Object System.IO.BinaryWriter($stream)
+
+        # Slot of this agent (a new agent takes the first free one under the claim lock)
+        $index = -1
+        for ($attempt = 0; $attempt -lt 2 -and $index -lt 0; $attempt++) {
+            if ($attempt -eq 1) {
+                for ($wait = 0; $wait -lt 500 -and -not $lock; $wait++) {
+                    try { $lock = [System.IO.File]::Open($lockPath, 'CreateNew', 'Write', 'None') }
+                    catch { Start-Sleep -Milliseconds 10 }
+                }
+            }
+            if ($stream.Length -ne $boardSize) {
+                if (-not $lock) { continue }
+                $stream.SetLength(0)
+                $stream.SetLength($boardSize)
+                $stream.Position = 0
+                $writer.Write([System.Text.Encoding]::ASCII.GetBytes("VOHB"))
+                $writer.Write([byte]1); $writer.Write([byte[]](0, 0, 0))
+                $writer.Write([uint32]$slots); $writer.Write([uint32]0)
+            }
+            $stream.Position = 0
+            $board = $reader.ReadBytes($boardSize)
+            $free = -1
+            for ($i = 0; $i -lt $slots; $i++) {
+                $start = $headerSize + $i * $slotSize + $nameOffset
+                $length = [Array]::IndexOf($board, [byte]0, $start, $nameBytes)
+                if ($length -lt 0) { $length = $nameBytes } else { $length -= $start }
+                if ($length -eq 0) {
+                    if ($free -lt 0) { $free = $i }
+                } elseif ($length -eq $name.Length -and
+                          [System.Linq.Enumerable]::SequenceEqual([byte[]]$board[$start..($start + $length - 1)], [byte[]]$name)) {
+                    $index = $i
+                    break
+                }
+            }
+            if ($index -lt 0 -and $lock -and $free -ge 0) {
+                $index = $free
+                $stream.Position = $headerSize + $index * $slotSize + $nameOffset
+                $writer.Write([byte[]]$name)
+            }
+        }
+        if ($index -lt 0) {
+            Write-Host "⚠️ Heartbeat board is busy or full, status not updated" -ForegroundColor Yellow
+            return
         }
-        $initialStatus | ConvertTo-Json | Out-File $statusPath -Encoding UTF8
-    }
-
-    $status = Get-Content $statusPath | ConvertFrom-Json
-
-    # Create PSObject for proper JSON serialization
-    if (-not $status.agents) {
-        $status | Add-Member -NotePropertyName agents -NotePropertyValue ([PSCustomObject]@{})
-    }
-
-    # Update agent status
-    $agentStatus = @{
-        status = "active"
-        last_seen = Get-Date -Format "yyyy-MM-dd HH:mm:ss"
-        last_action = $Action
-    }
 
-    # Add or update agent in status
-    if ($status.agents.PSObject.Properties.Match($AgentName).Count) {
-        $status.agents.$AgentName = $agentStatus
-    } else {
-        $status.agents | Add-Member -NotePropertyName $AgentName -NotePropertyValue $agentStatus
+        # Seqlock (same order as heartbeat.py): odd sequence at the end of the slot first,
+        # then the fields, then the new even value at the start and last at the end.
+        # Readers copy the slot front to back, so a copy overlapping these writes
+        # always sees different sequences.
+        $offset = $headerSize + $index * $slotSize
+        $stream.Position = $offset
+        $seq = $reader.ReadUInt64() -bor 1
+        $oldCode = $reader.ReadByte()
+        $stream.Position = $offset + $slotSize - 8; $writer.Write([uint64]$seq); $writer.Flush()
+        $stream.Position = $offset + 8; $writer.Write([byte]$code)
+        $stream.Position = $offset + 12; $writer.Write([uint32]$PID)
+        $writer.Write([double]([DateTimeOffset]::UtcNow.ToUnixTimeMilliseconds() / 1000.0))
+        $writer.Flush()
+        $stream.Position = $offset; $writer.Write([uint64]($seq + 1)); $writer.Flush()
+        $stream.Position = $offset + $slotSize - 8; $writer.Write([uint64]($seq + 1))
+
+        if ($oldCode -ne $code) {
+            # Tells the monitor to redraw: a new agent or status
+            $stream.Position = 12
+            $generation = $reader.ReadUInt32()
+            $stream.Position = 12; $writer.Write([uint32](($generation + 1) % 4294967296))
+        }
+        $writer.Flush()
+    } finally {
+        $stream.Dispose()
+        if ($lock) {
+            $lock.Dispose()
+            Remove-Item $lockPath -ErrorAction SilentlyContinue
+        }
     }
-
-    $status | ConvertTo-Json -Depth 2 | Out-File $statusPath -Encoding UTF8
 }
 
 # Main execution
@@ -15,6 +15,19 @@ param(
 $tasksPath = "C:\www.spa.com\.ai-team\virtual-office\tasks"
 $chatPath = "C:\www.spa.com\.ai-team\chat.md"
 
+# Write a task file whole: new file next to it, then rename over the old one,
+# so readers never see half a task and the directory change is noticed
+function Save-TaskFile {
+    param(
+        $Task,
+        [string]$Path
+    )
+
+    $tmpPath = "$Path.tmp"
+    $Task | ConvertTo-Json -Depth 3 | Out-File $tmpPath -Encoding UTF8
+    Move-Item -Path $tmpPath -Destination $Path -Force
+}
+
 # Function to create new task
 function New-Task {
     param(
@@ -49,7 +62,7 @@ function New-Task {
     $fileName = "$taskId.json"
     $filePath = Join-Path $tasksPath $fileName
 
-    $task | ConvertTo-Json -Depth 3 | Out-File $filePath -Encoding UTF8
+    Save-TaskFile -Task $task -Path $filePath
 
     Write-Host "✅ Task created: $taskId" -ForegroundColor Green
     Write-Host "   Title: $Title" -ForegroundColor Gray
@@ -155,7 +168,7 @@ function Set-TaskAssignee {
     $task.status = "assigned"
     $task.updated_at = Get-Date -Format "yyyy-MM-dd HH:mm:ss"
 
-    $task | ConvertTo-Json -Depth 3 | Out-File $filePath -Encoding UTF8
+    Save-TaskFile -Task $task -Path $filePath
 
     Write-Host "✅ Task $TaskId assigned to $Assignee" -ForegroundColor Green
 
@@ -184,7 +197,7 @@ function Update-TaskStatus {
     $task.status = $Status
     $task.updated_at = Get-Date -Format "yyyy-MM-dd HH:mm:ss"
 
-    $task | ConvertTo-Json -Depth 3 | Out-File $filePath -Encoding UTF8
+    Save-TaskFile -Task $task -Path $filePath
 
     Write-Host "✅ Task $TaskId status updated: $oldStatus → $Status" -ForegroundColor Green
 
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async CEO Interface for Virtual Office
+asyncio API поверх CEOInterface: файловая работа в ограниченном пуле потоков
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from ceo_interface import CEOInterface
+
+
+class AsyncCEOInterface:
+    """Асинхронные аналоги операций CEOInterface
+
+    Блокирующие вызовы (файлы, SQLite) выполняются в пуле из max_workers потоков,
+    поэтому цикл событий чата или HTTP моста не останавливается. Рассылка пишет
+    ссылки по агентам параллельно, сводки синхронизируют каталоги параллельно.
+    """
+
+    def __init__(self, ceo: Optional[CEOInterface] = None, max_workers: int = 8):
+        self.ceo = ceo or CEOInterface()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ceo")
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def create_task(self, title: str, description: str, assignee: str = "",
+                          priority: str = "normal", deadline: str = "") -> str:
+        """Создать задачу"""
+        return await self._run(self.ceo.create_task, title, description, assignee, priority, deadline)
+
+    async def send_message(self, to_agent: str, message: str, priority: str = "normal"):
+        """Отправить сообщение агенту"""
+        await self._run(self.ceo.send_message, to_agent, message, priority)
+
+    async def send_to_agents(self, agents: List[str], message: str, priority: str = "normal",
+                             sender: str = "CEO") -> str:
+        """Одно сообщение нескольким агентам: сохранить один раз, ссылки - параллельно"""
+        agents = list(dict.fromkeys(agents))
+        msg = self.ceo.build_message(", ".join(agents), message, priority, sender)
+        payload, data = await self._run(self.ceo.fanout.store, msg["id"], msg)
+        targets = await asyncio.gather(*(
+            self._run(self.ceo.fanout.link, payload, data, agent) for agent in agents
+        ))
+        await self._run(self.ceo.inbox_store.put_many, msg, list(zip(agents, targets)))
+        return msg["id"]
+
+    async def broadcast_message(self, message: str) -> str:
+        """Сообщение всей команде"""
+        msg_id = await self.send_to_agents(self.ceo.inbox_store.agents, message)
+        await self._run(self.ceo.send_to_chat, f"[CEO]: @all {message}")
+        return msg_id
+
+    async def notify_mentions(self, agents: List[str], message: str, sender: str) -> Optional[str]:
+        """Уведомить упомянутых в чате агентов"""
+        if not agents:
+            return None
+        return await self.send_to_agents(agents, message, sender=sender)
+
+    async def sync_all(self):
+        """Синхронизировать индекс задач и все inbox параллельно"""
+        await self._run(self.ceo.writer.flush)
+        await asyncio.gather(
+            self._run(self.ceo.task_store.sync),
+            *(self._run(self.ceo.inbox_store.sync, agent) for agent in self.ceo.inbox_store.agents)
+        )
+
+    async def get_tasks_summary(self) -> Dict:
+        """Сводка по задачам"""
+        return await self._run(self.ceo.get_tasks_summary)
+
+    async def view_inbox_summary(self) -> Dict:
+        """Сводка по inbox (каталоги агентов обходятся параллельно)"""
+        await self._run(self.ceo.writer.flush)
+        await asyncio.gather(*(self._run(self.ceo.inbox_store.sync, agent)
+                               for agent in self.ceo.inbox_store.agents))
+        return await self._run(self.ceo.inbox_store.summary)
+
+    async def generate_daily_report(self) -> str:
+        """Ежедневный отчет (проход движка отчетов сам распределяется по процессам)"""
+        return await self._run(self.ceo.generate_daily_report)
+
+    async def close(self):
+        """Дождаться записей и остановить пул"""
+        await self._run(self.ceo.writer.flush)
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "AsyncCEOInterface":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
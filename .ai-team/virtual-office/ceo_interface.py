@@ -5,14 +5,25 @@ CEO Interface for Virtual Office
 Управление AI командой через Python интерфейс
 """
 
-import json
-import os
 import sys
 import subprocess
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from channel_store import ChannelCompactor
+from chat_log import ChatLog, render_markdown
+from counters import get_counter_store
+from doc_cache import get_document_cache
+from fanout import SHARED_TO, FanOut
+from ids import new_id, scan_since
+from inbox_store import InboxStore
+from office_writer import WriteError, get_writer
+from presence import PresenceLog
+from report_engine import ReportEngine
+from task_import import TaskImporter
+from task_store import TaskStore
+
 class CEOInterface:
     """CEO интерфейс для управления виртуальным офисом"""
 
@@ -24,6 +35,7 @@ class CEOInterface:
             self.inbox_dir = self.virtual_office / "inbox"
             self.reports_dir = self.virtual_office / "reports"
             self.chat_file = self.base_path / "chat.md"
+            self.chat_log = ChatLog.for_markdown(self.chat_file)
             self.agents_config = self.base_path / "system" / "agents.json"
 
             # Create directories if not exist
@@ -32,6 +44,31 @@ class CEOInterface:
             self.reports_dir.mkdir(parents=True, exist_ok=True)
             (self.base_path / "system").mkdir(parents=True, exist_ok=True)
 
+            # Indexed task store and inbox summary views
+            office_db = self.virtual_office / "system" / "office.db"
+            self.task_store = TaskStore(office_db, self.tasks_dir)
+            self.inbox_store = InboxStore(office_db, self.inbox_dir,
+                                          ["teamlead", "backend", "frontend", "qa", "devops"])
+
+            # Batched, atomic file writes (fire-and-forget unless durable=True)
+            self.writer = get_writer()
+
+            # Broadcasts: one stored message, hard links in each inbox
+            self.fanout = FanOut(self.virtual_office / "messages", self.inbox_dir)
+
+            # Parsed JSON shared with the monitor/chat in the same process
+            self.doc_cache = get_document_cache()
+
+            # Metric counters: appended to this process's shard, merged by readers
+            self.counters = get_counter_store(self.base_path / "system" / "counters")
+
+            # Reports: one parallel pass over tasks, inboxes, channels and metrics
+            self.report_engine = ReportEngine(self.virtual_office, self.inbox_store.agents,
+                                              metrics_files=[self.base_path / "system" / "metrics.json"],
+                                              checkpoint=self.virtual_office / "system" / "report.checkpoint",
+                                              counters=self.counters,
+                                              presence_log=PresenceLog(self.base_path / "system" / "presence.log"))
+
             # Load agents configuration
             self.agents = self.load_agents()
         except Exception as e:
@@ -41,37 +78,40 @@ class CEOInterface:
     def load_agents(self) -> Dict:
         """Загрузить конфигурацию агентов"""
         if self.agents_config.exists():
-            with open(self.agents_config, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self.doc_cache.load(self.agents_config)
         return {}
 
+    def build_task(self, title: str, description: str, assignee: str = "", priority: str = "normal",
+                   deadline: str = "", task_id: Optional[str] = None) -> Dict:
+        """Документ новой задачи (id и срок по умолчанию назначаются здесь)"""
+        if not deadline:
+            deadline = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+        return {
+            "task_id": task_id or new_id("TASK"),
+            "title": title,
+            "description": description,
+            "assignee": assignee,
+            "priority": priority,
+            "status": "assigned" if assignee else "new",
+            "deadline": deadline,
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat(),
+            "dependencies": [],
+            "comments": []
+        }
+
     def create_task(self, title: str, description: str, assignee: str = "",
                    priority: str = "normal", deadline: str = "") -> str:
         """Создать новую задачу"""
         try:
-            task_id = f"TASK-{datetime.now().strftime('%Y%m%d')}-{os.urandom(2).hex()}"
-
-            if not deadline:
-                deadline = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-
-            task = {
-                "task_id": task_id,
-                "title": title,
-                "description": description,
-                "assignee": assignee,
-                "priority": priority,
-                "status": "assigned" if assignee else "new",
-                "deadline": deadline,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),
-                "dependencies": [],
-                "comments": []
-            }
+            task = self.build_task(title, description, assignee, priority, deadline)
+            task_id = task["task_id"]
 
             # Save task
             task_file = self.tasks_dir / f"{task_id}.json"
-            with open(task_file, 'w', encoding='utf-8') as f:
-                json.dump(task, f, indent=2, ensure_ascii=False)
+            self.writer.put_json(task_file, task, on_commit=lambda: self.task_store.put(task, task_file))
+            self.counters.increment("tasks_created")
 
             # Notify in chat
             if assignee:
@@ -83,136 +123,175 @@ class CEOInterface:
             print(f"❌ Ошибка создания задачи: {e}")
             return ""
 
-    def send_message(self, to_agent: str, message: str, priority: str = "normal"):
-        """Отправить сообщение агенту"""
-        msg_id = f"MSG-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-        msg = {
-            "id": msg_id,
-            "from": "CEO",
-            "to": to_agent,
+    def import_tasks(self, source: str, fmt: Optional[str] = None, batch_size: int = 500,
+                     resume: Optional[str] = None) -> Dict:
+        """Массовый импорт задач из JSONL/CSV файла или stdin ('-'; возобновляемый только с resume)"""
+        stats = TaskImporter(self, batch_size).run(source, fmt, resume)
+        if stats["imported"]:
+            self.counters.increment("tasks_created", stats["imported"])
+            self.send_to_chat(f"[SYSTEM]: Imported {stats['total']} tasks from {source}")
+        print(f"✅ Импорт завершен: {stats['imported']} задач, пропущено {stats['invalid']}")
+        return stats
+
+    def build_message(self, to: str, message: str, priority: str = "normal", sender: str = "CEO") -> Dict:
+        """Новое сообщение inbox с уникальным id"""
+        return {
+            "id": new_id("MSG"),
+            "from": sender,
+            "to": to,
             "message": message,
             "priority": priority,
             "timestamp": datetime.now().isoformat(),
             "status": "unread"
         }
 
+    def send_message(self, to_agent: str, message: str, priority: str = "normal"):
+        """Отправить сообщение агенту"""
+        msg = self.build_message(to_agent, message, priority)
+        msg_id = msg["id"]
+
         # Save to agent's inbox
         inbox_path = self.inbox_dir / to_agent
         inbox_path.mkdir(parents=True, exist_ok=True)
 
         msg_file = inbox_path / f"{msg_id}.json"
-        with open(msg_file, 'w', encoding='utf-8') as f:
-            json.dump(msg, f, indent=2, ensure_ascii=False)
+        self.writer.put_json(msg_file, msg, on_commit=lambda: self.inbox_store.put(to_agent, msg, msg_file))
+        self.counters.increment("messages_sent")
 
         print(f"📤 Сообщение отправлено {to_agent}")
 
+    def mark_read(self, agent: str, msg_id: str) -> bool:
+        """Отметить сообщение в inbox агента как прочитанное (курсор агента и его копия файла)"""
+        self.inbox_store.sync(agent)
+        if not self.inbox_store.mark_read(agent, msg_id):
+            print(f"❌ Сообщение не найдено: {agent}/{msg_id}")
+            return False
+        return True
+
+    def mark_all_read(self, agent: str) -> int:
+        """Отметить все сообщения агента как прочитанные"""
+        marked = self.inbox_store.mark_all_read(agent)
+        print(f"📭 {agent}: прочитано {marked} сообщений")
+        return marked
+
+    def next_unread(self, agent: str) -> Optional[Dict]:
+        """Самое старое непрочитанное сообщение агента"""
+        self.inbox_store.sync(agent)
+        msg_id = self.inbox_store.next_unread(agent)
+        if msg_id is None:
+            return None
+        return self.doc_cache.load(self.inbox_dir / agent / f"{msg_id}.json")
+
+    def recent_messages(self, agent: str, minutes: int = 60) -> List[Dict]:
+        """Сообщения агента за последние minutes минут (по имени файла, без сортировки по mtime)"""
+        inbox_path = self.inbox_dir / agent
+        since = datetime.now() - timedelta(minutes=minutes)
+        messages = []
+        for msg_id in scan_since(inbox_path, "MSG", since):
+            try:
+                messages.append(self.doc_cache.load(inbox_path / f"{msg_id}.json"))
+            except (OSError, ValueError):
+                continue
+        return messages
+
+    def update_task_status(self, task_id: str, status: str) -> bool:
+        """Изменить статус задачи"""
+        self.task_store.sync()
+        task = self.task_store.get(task_id)
+        if task is None:
+            print(f"❌ Задача не найдена: {task_id}")
+            return False
+
+        old_status = task.get("status", "unknown")
+        task["status"] = status
+        task["updated_at"] = datetime.now().isoformat()
+
+        task_file = self.tasks_dir / f"{task_id}.json"
+        self.writer.put_json(task_file, task, on_commit=lambda: self.task_store.put(task, task_file))
+        if status == "completed" and old_status != "completed":
+            assignee = task.get("assignee") or ""
+            self.counters.increment_many([(assignee, "tasks_completed", 1), ("", "tasks_completed", 1)]
+                                         if assignee else [("", "tasks_completed", 1)])
+
+        self.send_to_chat(f"[SYSTEM]: Task {task_id} status changed to {status}")
+        print(f"✅ Статус задачи {task_id}: {old_status} → {status}")
+        return True
+
+    def rebuild_views(self):
+        """Пересчитать индексы и сводки из файлов (если разошлись с диском)"""
+        tasks = self.task_store.rebuild()
+        messages = self.inbox_store.rebuild()
+        pruned = self.fanout.prune()
+        self.report_engine.reset()
+        print(f"🔄 Сводки пересчитаны: {tasks} задач, {messages} сообщений, удалено рассылок: {pruned}")
+
+    def compact_channels(self, keep_days: int = 1) -> Dict[str, Dict[str, int]]:
+        """Сжать файлы каналов за прошедшие дни в дневные сегменты"""
+        results = ChannelCompactor(self.virtual_office / "channels", keep_days=keep_days).compact_all()
+        for channel, stats in results.items():
+            if stats["compacted"] or stats["removed"]:
+                print(f"🗜️ #{channel}: сжато {stats['compacted']}, удалено файлов {stats['removed']}")
+        return results
+
+    def send_to_agents(self, agents: List[str], message: str, priority: str = "normal",
+                       sender: str = "CEO") -> str:
+        """Отправить одно сообщение нескольким агентам (содержимое хранится один раз)
+
+        Все получатели видят один и тот же файл: to = SHARED_TO, список - в recipients.
+        """
+        msg = self.build_message(SHARED_TO, message, priority, sender)
+        msg["recipients"] = list(dict.fromkeys(agents))
+        delivered = self.fanout.send(msg["id"], msg, agents)
+        self.inbox_store.put_many(msg, delivered)
+        self.counters.increment("messages_sent")
+        return msg["id"]
+
     def broadcast_message(self, message: str):
         """Отправить сообщение всей команде"""
-        for agent in ["teamlead", "backend", "frontend", "qa", "devops"]:
-            self.send_message(agent, message)
+        self.send_to_agents(self.inbox_store.agents, message)
 
         self.send_to_chat(f"[CEO]: @all {message}")
         print(f"📢 Сообщение разослано всей команде")
 
     def send_to_chat(self, message: str):
         """Добавить сообщение в общий чат"""
-        timestamp = datetime.now().strftime("[%H:%M]")
-        with open(self.chat_file, 'a', encoding='utf-8') as f:
-            f.write(f"{timestamp} {message}\n")
+        entry = self.chat_log.append({"kind": "line", "author": "CEO", "message": message})
+
+        # Markdown view for the dashboards and PowerShell agents
+        self.writer.append_text(self.chat_file, render_markdown(entry))
 
     def get_tasks_summary(self) -> Dict:
         """Получить сводку по задачам"""
         if not self.tasks_dir.exists():
             return {}
 
-        tasks = []
-        for task_file in self.tasks_dir.glob("*.json"):
-            with open(task_file, 'r', encoding='utf-8') as f:
-                tasks.append(json.load(f))
-
-        summary = {
-            "total": len(tasks),
-            "by_status": {},
-            "by_assignee": {},
-            "by_priority": {}
-        }
-
-        for task in tasks:
-            # By status
-            status = task.get("status", "unknown")
-            summary["by_status"][status] = summary["by_status"].get(status, 0) + 1
-
-            # By assignee
-            assignee = task.get("assignee", "unassigned")
-            summary["by_assignee"][assignee] = summary["by_assignee"].get(assignee, 0) + 1
-
-            # By priority
-            priority = task.get("priority", "normal")
-            summary["by_priority"][priority] = summary["by_priority"].get(priority, 0) + 1
-
-        return summary
+        # Include our own queued writes
+        self.writer.flush()
+        self.task_store.sync()
+        return self.task_store.summary()
 
     def view_inbox_summary(self) -> Dict:
         """Просмотр сводки по inbox агентов"""
-        summary = {}
-
-        for agent in ["teamlead", "backend", "frontend", "qa", "devops"]:
-            inbox_path = self.inbox_dir / agent
-            if inbox_path.exists():
-                messages = list(inbox_path.glob("*.json"))
-                unread = 0
-
-                for msg_file in messages:
-                    with open(msg_file, 'r', encoding='utf-8') as f:
-                        msg = json.load(f)
-                        if msg.get("status") == "unread":
-                            unread += 1
-
-                summary[agent] = {
-                    "total": len(messages),
-                    "unread": unread
-                }
-            else:
-                summary[agent] = {"total": 0, "unread": 0}
-
-        return summary
-
-    def generate_daily_report(self) -> str:
-        """Генерация ежедневного отчета"""
-        report = []
-        report.append("=" * 50)
-        report.append(f"📊 DAILY REPORT - {datetime.now().strftime('%Y-%m-%d')}")
-        report.append("=" * 50)
+        self.writer.flush()
+        self.inbox_store.sync()
+        return self.inbox_store.summary()
 
-        # Tasks summary
-        tasks_summary = self.get_tasks_summary()
-        report.append("\n📋 ЗАДАЧИ:")
-        report.append(f"Всего: {tasks_summary.get('total', 0)}")
+    def generate_daily_report(self, full: bool = False) -> str:
+        """Генерация ежедневного отчета (текст и JSON за один проход)
 
-        if tasks_summary.get('by_status'):
-            report.append("\nПо статусу:")
-            for status, count in tasks_summary['by_status'].items():
-                report.append(f"  {status}: {count}")
-
-        if tasks_summary.get('by_assignee'):
-            report.append("\nПо исполнителям:")
-            for assignee, count in tasks_summary['by_assignee'].items():
-                report.append(f"  {assignee}: {count}")
-
-        # Inbox summary
-        inbox_summary = self.view_inbox_summary()
-        report.append("\n📬 СООБЩЕНИЯ:")
-        for agent, stats in inbox_summary.items():
-            if stats['unread'] > 0:
-                report.append(f"  {agent}: {stats['unread']} непрочитанных")
-
-        report_text = "\n".join(report)
+        Читаются только файлы, изменившиеся с прошлого отчета; full=True - полный пересчет.
+        """
+        # Include our own queued writes
+        self.writer.flush()
+        report = self.report_engine.run(full=full)
+        report_text = report.to_text()
 
         # Save report
-        report_file = self.reports_dir / f"report_{datetime.now().strftime('%Y%m%d')}.txt"
-        with open(report_file, 'w', encoding='utf-8') as f:
-            f.write(report_text)
+        stamp = report.generated_at.strftime('%Y%m%d')
+        self.writer.put_bytes(self.reports_dir / f"report_{stamp}.txt", report_text.encode("utf-8"))
+        self.writer.put_json(self.reports_dir / f"report_{stamp}.json", report.to_json())
+        self.writer.flush()
+        self.counters.increment("reports_generated")
 
         return report_text
 
@@ -234,73 +313,76 @@ class CEOInterface:
 
             choice = input("\nВыберите действие: ")
 
-            if choice == "1":
-                title = input("Название задачи: ")
-                description = input("Описание: ")
-                assignee = input("Исполнитель (teamlead/backend/frontend/qa/devops): ")
-                priority = input("Приоритет (low/normal/high/critical) [normal]: ") or "normal"
-                deadline = input("Дедлайн (YYYY-MM-DD) [завтра]: ")
-
-                self.create_task(title, description, assignee, priority, deadline)
-
-            elif choice == "2":
-                # Run PowerShell task manager
-                subprocess.run([
-                    "powershell", "-ExecutionPolicy", "Bypass",
-                    "-File", str(self.base_path / "scripts" / "task-manager.ps1"),
-                    "-Action", "list"
-                ])
-
-            elif choice == "3":
-                agent = input("Кому (teamlead/backend/frontend/qa/devops): ")
-                message = input("Сообщение: ")
-                priority = input("Приоритет (low/normal/high) [normal]: ") or "normal"
-
-                self.send_message(agent, message, priority)
-
-            elif choice == "4":
-                message = input("Сообщение всей команде: ")
-                self.broadcast_message(message)
-
-            elif choice == "5":
-                summary = self.get_tasks_summary()
-                print("\n📊 СВОДКА ПО ЗАДАЧАМ:")
-                print(f"Всего задач: {summary.get('total', 0)}")
-
-                if summary.get('by_status'):
-                    print("\nПо статусу:")
-                    for status, count in summary['by_status'].items():
-                        print(f"  {status}: {count}")
-
-                if summary.get('by_assignee'):
-                    print("\nПо исполнителям:")
-                    for assignee, count in summary['by_assignee'].items():
-                        print(f"  {assignee}: {count}")
-
-            elif choice == "6":
-                inbox_summary = self.view_inbox_summary()
-                print("\n📬 INBOX АГЕНТОВ:")
-                for agent, stats in inbox_summary.items():
-                    status = "🔴" if stats['unread'] > 0 else "🟢"
-                    print(f"{status} {agent}: {stats['total']} всего, {stats['unread']} непрочитанных")
-
-            elif choice == "7":
-                report = self.generate_daily_report()
-                print(report)
-                print("\n✅ Отчет сохранен в virtual-office/reports/")
-
-            elif choice == "8":
-                print("\nЗапуск AI команды...")
-                subprocess.run([
-                    str(self.base_path / "scripts" / "START-AI-TEAM-FINAL.bat")
-                ], shell=True)
-
-            elif choice == "0":
-                print("👋 До свидания!")
-                break
-
-            else:
-                print("❌ Неверный выбор")
+            try:
+                if choice == "1":
+                    title = input("Название задачи: ")
+                    description = input("Описание: ")
+                    assignee = input("Исполнитель (teamlead/backend/frontend/qa/devops): ")
+                    priority = input("Приоритет (low/normal/high/critical) [normal]: ") or "normal"
+                    deadline = input("Дедлайн (YYYY-MM-DD) [завтра]: ")
+
+                    self.create_task(title, description, assignee, priority, deadline)
+
+                elif choice == "2":
+                    # Run PowerShell task manager
+                    subprocess.run([
+                        "powershell", "-ExecutionPolicy", "Bypass",
+                        "-File", str(self.base_path / "scripts" / "task-manager.ps1"),
+                        "-Action", "list"
+                    ])
+
+                elif choice == "3":
+                    agent = input("Кому (teamlead/backend/frontend/qa/devops): ")
+                    message = input("Сообщение: ")
+                    priority = input("Приоритет (low/normal/high) [normal]: ") or "normal"
+
+                    self.send_message(agent, message, priority)
+
+                elif choice == "4":
+                    message = input("Сообщение всей команде: ")
+                    self.broadcast_message(message)
+
+                elif choice == "5":
+                    summary = self.get_tasks_summary()
+                    print("\n📊 СВОДКА ПО ЗАДАЧАМ:")
+                    print(f"Всего задач: {summary.get('total', 0)}")
+
+                    if summary.get('by_status'):
+                        print("\nПо статусу:")
+                        for status, count in summary['by_status'].items():
+                            print(f"  {status}: {count}")
+
+                    if summary.get('by_assignee'):
+                        print("\nПо исполнителям:")
+                        for assignee, count in summary['by_assignee'].items():
+                            print(f"  {assignee}: {count}")
+
+                elif choice == "6":
+                    inbox_summary = self.view_inbox_summary()
+                    print("\n📬 INBOX АГЕНТОВ:")
+                    for agent, stats in inbox_summary.items():
+                        status = "🔴" if stats['unread'] > 0 else "🟢"
+                        print(f"{status} {agent}: {stats['total']} всего, {stats['unread']} непрочитанных")
+
+                elif choice == "7":
+                    report = self.generate_daily_report()
+                    print(report)
+                    print("\n✅ Отчет сохранен в virtual-office/reports/")
+
+                elif choice == "8":
+                    print("\nЗапуск AI команды...")
+                    subprocess.run([
+                        str(self.base_path / "scripts" / "START-AI-TEAM-FINAL.bat")
+                    ], shell=True)
+
+                elif choice == "0":
+                    print("👋 До свидания!")
+                    break
+
+                else:
+                    print("❌ Неверный выбор")
+            except WriteError as e:
+                print(f"❌ Ошибка записи: {e}")
 
             input("\nНажмите Enter для продолжения...")
 
@@ -327,7 +409,41 @@ def main():
             ceo.broadcast_message(message)
 
         elif command == "report":
-            print(ceo.generate_daily_report())
+            print(ceo.generate_daily_report(full="--full" in sys.argv[2:]))
+
+        elif command == "status" and len(sys.argv) > 3:
+            ceo.update_task_status(sys.argv[2], sys.argv[3])
+
+        elif command == "read" and len(sys.argv) > 3:
+            ceo.mark_read(sys.argv[2], sys.argv[3])
+
+        elif command == "readall" and len(sys.argv) > 2:
+            ceo.mark_all_read(sys.argv[2])
+
+        elif command == "next" and len(sys.argv) > 2:
+            msg = ceo.next_unread(sys.argv[2])
+            if msg is None:
+                print("📭 Непрочитанных сообщений нет")
+            else:
+                print(f"{msg.get('id')} [{msg.get('priority')}] {msg.get('from')}: {msg.get('message')}")
+
+        elif command == "rebuild":
+            ceo.rebuild_views()
+
+        elif command == "compact":
+            ceo.compact_channels()
+
+        elif command == "import" and len(sys.argv) > 2:
+            args = sys.argv[3:]
+            fmt = args[args.index("--format") + 1] if "--format" in args else None
+            batch_size = int(args[args.index("--batch") + 1]) if "--batch" in args else 500
+            resume = args[args.index("--resume") + 1] if "--resume" in args else None
+            ceo.import_tasks(sys.argv[2], fmt, batch_size, resume)
+
+        elif command == "recent" and len(sys.argv) > 2:
+            minutes = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+            for msg in ceo.recent_messages(sys.argv[2], minutes):
+                print(f"{msg.get('id')} [{msg.get('status')}] {msg.get('from')}: {msg.get('message')}")
 
         else:
             print("Usage:")
@@ -335,10 +451,25 @@ def main():
             print("  python ceo_interface.py task <title> [assignee]")
             print("  python ceo_interface.py message <agent> <message>")
             print("  python ceo_interface.py broadcast <message>")
-            print("  python ceo_interface.py report")
+            print("  python ceo_interface.py report [--full]     - --full ignores the report checkpoint")
+            print("  python ceo_interface.py status <task_id> <status>")
+            print("  python ceo_interface.py read <agent> <msg_id>")
+            print("  python ceo_interface.py readall <agent>")
+            print("  python ceo_interface.py next <agent>           - Oldest unread message")
+            print("  python ceo_interface.py rebuild               - Recompute summaries from files")
+            print("  python ceo_interface.py compact               - Fold old channel files into day segments")
+            print("  python ceo_interface.py import <file.jsonl|file.csv|-> [--format jsonl|csv] [--batch N] [--resume NAME]")
+            print("  python ceo_interface.py recent <agent> [minutes]")
     else:
         # Интерактивный режим
         ceo.interactive_menu()
 
+    # Queued writes of one-shot commands: report failures before exiting
+    try:
+        ceo.writer.flush()
+    except WriteError as e:
+        print(f"❌ Ошибка записи: {e}")
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
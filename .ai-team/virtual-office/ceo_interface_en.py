@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
-import os
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 import time
 
+from chat_log import ChatLog, render_markdown
+from counters import get_counter_store
+from doc_cache import get_document_cache
+from ids import new_id
+from inbox_store import InboxStore
+from office_writer import WriteError, get_writer
+from presence import PresenceLog
+from report_engine import ReportEngine
+from task_store import TaskStore
+
 class CEOInterface:
     def __init__(self):
         try:
@@ -17,6 +25,7 @@ class CEOInterface:
             self.metrics_dir = self.base_path / "virtual-office" / "metrics"
             self.reports_dir = self.base_path / "virtual-office" / "reports"
             self.chat_file = self.base_path / "chat.md"
+            self.chat_log = ChatLog.for_markdown(self.chat_file)
 
             # Create directories if not exist
             self.tasks_dir.mkdir(parents=True, exist_ok=True)
@@ -24,6 +33,28 @@ class CEOInterface:
             self.metrics_dir.mkdir(parents=True, exist_ok=True)
             self.reports_dir.mkdir(parents=True, exist_ok=True)
 
+            # Parsed JSON shared with the monitor/chat in the same process
+            self.doc_cache = get_document_cache()
+
+            # Batched, atomic file writes
+            self.writer = get_writer()
+
+            # Sharded metric counters (merged on read)
+            self.counters = get_counter_store(self.base_path / "system" / "counters")
+
+            # Indexed task store and inbox summary views
+            office_db = self.base_path / "virtual-office" / "system" / "office.db"
+            self.task_store = TaskStore(office_db, self.tasks_dir)
+            self.inbox_store = InboxStore(office_db, self.inbox_dir,
+                                          ['teamlead', 'backend', 'frontend', 'qa', 'devops'])
+
+            # Reports: one parallel pass over tasks, inboxes, channels and metrics
+            self.report_engine = ReportEngine(self.base_path / "virtual-office", self.inbox_store.agents,
+                                              metrics_files=[self.base_path / "system" / "metrics.json"],
+                                              checkpoint=office_db.parent / "report.checkpoint",
+                                              counters=self.counters,
+                                              presence_log=PresenceLog(self.base_path / "system" / "presence.log"))
+
         except Exception as e:
             print(f"[ERROR] Initialization failed: {e}")
             sys.exit(1)
@@ -43,7 +74,7 @@ class CEOInterface:
             deadline = (datetime.now() + timedelta(days=7)).isoformat()
 
         task = {
-            "id": f"task_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "id": new_id("TASK"),
             "title": title,
             "description": description,
             "priority": priority,
@@ -56,15 +87,14 @@ class CEOInterface:
 
         # Save task
         task_file = self.tasks_dir / f"{task['id']}.json"
-        with open(task_file, 'w', encoding='utf-8') as f:
-            json.dump(task, f, indent=2, ensure_ascii=False)
+        self.writer.put_json(task_file, task, on_commit=lambda: self.task_store.put(task, task_file))
 
         # Put in assignee's inbox
         if assignee in ['teamlead', 'backend', 'frontend', 'qa', 'devops']:
             inbox_file = self.inbox_dir / assignee / f"{task['id']}.json"
             inbox_file.parent.mkdir(exist_ok=True)
-            with open(inbox_file, 'w', encoding='utf-8') as f:
-                json.dump(task, f, indent=2, ensure_ascii=False)
+            self.writer.put_json(inbox_file, task,
+                                 on_commit=lambda: self.inbox_store.put(assignee, task, inbox_file))
 
         print(f"\n[SUCCESS] Task created and sent to {assignee}!")
         print(f"Task ID: {task['id']}")
@@ -72,27 +102,19 @@ class CEOInterface:
     def view_tasks(self):
         """View all tasks"""
         print("\n=== ALL TASKS ===")
-        tasks = []
 
         if not self.tasks_dir.exists():
             print("No tasks found.")
             return
 
-        for task_file in self.tasks_dir.glob("*.json"):
-            try:
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    task = json.load(f)
-                    tasks.append(task)
-            except:
-                continue
+        # Sorted by creation date via index
+        self.task_store.sync()
+        tasks = self.task_store.find(order_by="created_at DESC")
 
         if not tasks:
             print("No tasks found.")
             return
 
-        # Sort by creation date
-        tasks.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-
         for task in tasks:
             print(f"\n[{task.get('status', 'unknown').upper()}] {task.get('title', 'No title')}")
             print(f"  ID: {task.get('id', 'unknown')}")
@@ -107,17 +129,15 @@ class CEOInterface:
         to_who = input("To (teamlead/backend/frontend/qa/devops/all): ").lower()
         message = input("Message: ")
 
-        timestamp = datetime.now().strftime("%H:%M")
-
         # Format message
         if to_who == "all":
-            chat_message = f"[{timestamp}] [{from_who.upper()}]: @all {message}\n"
+            chat_message = f"[{from_who.upper()}]: @all {message}"
         else:
-            chat_message = f"[{timestamp}] [{from_who.upper()}]: @{to_who} {message}\n"
+            chat_message = f"[{from_who.upper()}]: @{to_who} {message}"
 
-        # Append to chat
-        with open(self.chat_file, 'a', encoding='utf-8') as f:
-            f.write(chat_message)
+        # Append to chat log and its markdown view
+        entry = self.chat_log.append({"kind": "line", "author": from_who, "message": chat_message})
+        self.writer.append_text(self.chat_file, render_markdown(entry))
 
         print(f"\n[SUCCESS] Message sent to {to_who}!")
 
@@ -127,12 +147,16 @@ class CEOInterface:
 
         agents = ['teamlead', 'backend', 'frontend', 'qa', 'devops']
 
+        counters = self.counters.snapshot()
+
         for agent in agents:
             metric_file = self.metrics_dir / f"{agent}.json"
-            if metric_file.exists():
+            increments = {metric: value for (name, metric), value in counters.items() if name == agent}
+            if metric_file.exists() or increments:
                 try:
-                    with open(metric_file, 'r', encoding='utf-8') as f:
-                        metrics = json.load(f)
+                    metrics = dict(self.doc_cache.load(metric_file)) if metric_file.exists() else {}
+                    for metric, value in increments.items():
+                        metrics[metric] = metrics.get(metric, 0) + value
 
                     print(f"\n{agent.upper()}:")
                     print(f"  Tasks completed: {metrics.get('tasks_completed', 0)}")
@@ -152,40 +176,39 @@ class CEOInterface:
         """Generate a status report"""
         print("\n=== GENERATING REPORT ===")
 
+        # One pass over tasks, inboxes, channels and metrics
+        self.writer.flush()
+        result = self.report_engine.run()
+        by_status = result["tasks"]["by_status"]
+        completed = by_status.get("completed", 0)
+        in_progress = by_status.get("in_progress", 0)
+
         report = {
-            "date": datetime.now().isoformat(),
+            "date": result.generated_at.isoformat(),
             "generated_by": "CEO Interface",
-            "summary": {},
-            "tasks": {"total": 0, "completed": 0, "in_progress": 0, "pending": 0},
-            "team_status": {}
+            "summary": result.to_json(),
+            "tasks": {
+                "total": result["tasks"]["total"],
+                "completed": completed,
+                "in_progress": in_progress,
+                "pending": result["tasks"]["total"] - completed - in_progress,
+            },
+            "team_status": result["inbox"]
         }
 
-        # Count tasks
-        for task_file in self.tasks_dir.glob("*.json"):
-            try:
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    task = json.load(f)
-                    report["tasks"]["total"] += 1
-                    status = task.get("status", "pending")
-                    if status == "completed":
-                        report["tasks"]["completed"] += 1
-                    elif status == "in_progress":
-                        report["tasks"]["in_progress"] += 1
-                    else:
-                        report["tasks"]["pending"] += 1
-            except:
-                continue
-
         # Save report
-        report_file = self.reports_dir / f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(report_file, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        stamp = result.generated_at.strftime('%Y%m%d_%H%M%S')
+        report_file = self.reports_dir / f"report_{stamp}.json"
+        self.writer.put_json(report_file, report, codec="json-pretty")
+        self.writer.put_bytes(report_file.with_suffix(".txt"), result.to_text().encode("utf-8"))
+        self.writer.flush()
 
         print(f"\nReport Summary:")
         print(f"  Total tasks: {report['tasks']['total']}")
         print(f"  Completed: {report['tasks']['completed']}")
         print(f"  In progress: {report['tasks']['in_progress']}")
         print(f"  Pending: {report['tasks']['pending']}")
+        print(f"  Scanned {result.stats['records']} records in {result.stats['elapsed_ms']} ms")
         print(f"\nFull report saved to: {report_file.name}")
 
     def view_agent_status(self):
@@ -230,23 +253,26 @@ class CEOInterface:
 
             choice = input("\nSelect action: ")
 
-            if choice == "1":
-                self.create_task()
-            elif choice == "2":
-                self.view_tasks()
-            elif choice == "3":
-                self.send_message()
-            elif choice == "4":
-                self.view_metrics()
-            elif choice == "5":
-                self.generate_report()
-            elif choice == "6":
-                self.view_agent_status()
-            elif choice == "0":
-                print("\nExiting CEO Interface...")
-                break
-            else:
-                print("\n[ERROR] Invalid option. Please try again.")
+            try:
+                if choice == "1":
+                    self.create_task()
+                elif choice == "2":
+                    self.view_tasks()
+                elif choice == "3":
+                    self.send_message()
+                elif choice == "4":
+                    self.view_metrics()
+                elif choice == "5":
+                    self.generate_report()
+                elif choice == "6":
+                    self.view_agent_status()
+                elif choice == "0":
+                    print("\nExiting CEO Interface...")
+                    break
+                else:
+                    print("\n[ERROR] Invalid option. Please try again.")
+            except WriteError as e:
+                print(f"\n[ERROR] Write failed: {e}")
 
             input("\nPress Enter to continue...")
 
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Channel Index for Virtual Office
+Индекс истории канала по времени и авторам: выборки поиском, а не обходом
+"""
+
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from channel_store import SEGMENT_SUFFIX, SEGMENTS_DIR, ChannelMessage
+from codec import decode
+
+# 2025-09-17_09-14-27-frontend.json: time and author without opening the file
+NAME_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})-(.+)\.json$")
+
+Key = Tuple[str, str]  # (timestamp "YYYY-MM-DD HH:MM:SS", file name)
+
+
+class Location(NamedTuple):
+    """Где лежит сообщение: отдельный файл (offset None) или строка сегмента"""
+    path: str
+    offset: Optional[int]
+    author: str
+
+
+def normalize_timestamp(value: Any) -> str:
+    """'2025-09-17T09:14:27.123' / '2025-09-17 09:14' -> '2025-09-17 09:14:27' (пусто - не разобрано)"""
+    text = str(value or "").strip().replace("T", " ")[:19]
+    if len(text) == 16:
+        text += ":00"
+    return text if re.match(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$", text) else ""
+
+
+def doc_timestamp(doc: Any, name: str) -> str:
+    """Время сообщения из документа (timestamp или date + time, как у standup)"""
+    doc = doc if isinstance(doc, dict) else {}
+    timestamp = normalize_timestamp(doc.get("timestamp"))
+    if not timestamp and doc.get("date"):
+        timestamp = normalize_timestamp(f"{doc['date']} {doc.get('time') or '00:00'}")
+    return timestamp or f"{name[:10]} 00:00:00"
+
+
+def doc_author(doc: Any) -> str:
+    doc = doc if isinstance(doc, dict) else {}
+    return str(doc.get("agent") or doc.get("from") or "unknown").lower()
+
+
+def name_key(name: str) -> Optional[Tuple[str, str]]:
+    """(время, автор) из имени файла, None - имя не по шаблону"""
+    match = NAME_RE.match(name)
+    if not match:
+        return None
+    day, hh, mm, ss, author = match.groups()
+    return f"{day} {hh}:{mm}:{ss}", author.lower()
+
+
+class ChannelIndex:
+    """Отсортированный по времени индекс канала и списки сообщений каждого автора
+
+    Ключ сообщения - (время, имя файла); для файлов вида ДАТА_ЧЧ-ММ-СС-автор.json
+    время и автор берутся из имени без чтения файла. Сегменты (channel_store)
+    читаются с последнего прочитанного смещения, для каждой строки запоминается
+    смещение - документ потом читается одним seek. refresh() обновляет индекс,
+    только если изменился каталог канала или размер сегментов.
+    """
+
+    def __init__(self, channel_dir: Path):
+        self.channel_dir = Path(channel_dir)
+        self.segments_dir = self.channel_dir / SEGMENTS_DIR
+        self.lock = threading.RLock()
+        self.keys: List[Key] = []
+        self.by_author: Dict[str, List[Key]] = {}
+        self.locations: Dict[str, Tuple[Key, Location]] = {}
+        self.fresh: Set[str] = set()
+        self.segment_offsets: Dict[str, int] = {}
+        self.signature = None
+
+    # --- maintenance --------------------------------------------------------
+
+    def _signature(self) -> Optional[Tuple]:
+        try:
+            own = (self.channel_dir.stat().st_mtime_ns,)
+        except OSError:
+            return None
+        try:
+            with os.scandir(self.segments_dir) as entries:
+                own += tuple(sorted((entry.name, entry.stat().st_size) for entry in entries
+                                    if entry.name.endswith(SEGMENT_SUFFIX)))
+        except OSError:
+            pass
+        return own
+
+    def _add(self, name: str, timestamp: str, location: Location) -> bool:
+        key = (timestamp, name)
+        known = self.locations.get(name)
+        if known is not None:
+            if known[0] == key:
+                self.locations[name] = (key, location)  # moved into a segment
+                return False
+            self._remove(name)
+        self.locations[name] = (key, location)
+        insort(self.keys, key)  # usually appends: new messages are the newest
+        insort(self.by_author.setdefault(location.author, []), key)
+        return True
+
+    def _remove(self, name: str):
+        key, location = self.locations.pop(name)
+        for keys in (self.keys, self.by_author.get(location.author, [])):
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def _read_segments(self) -> int:
+        added = 0
+        try:
+            names = sorted(name for name in os.listdir(self.segments_dir) if name.endswith(SEGMENT_SUFFIX))
+        except OSError:
+            return 0
+        for segment_name in names:
+            path = str(self.segments_dir / segment_name)
+            offset = self.segment_offsets.get(segment_name, 0)
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    while True:
+                        line = f.readline()
+                        if not line.endswith(b"\n"):
+                            break  # incomplete tail: re-read once the line is finished
+                        line_offset, offset = offset, offset + len(line)
+                        try:
+                            entry = decode(line)
+                            name, doc = entry["file"], entry["doc"]
+                        except (ValueError, KeyError, TypeError):
+                            continue
+                        timestamp, author = name_key(name) or (doc_timestamp(doc, name), doc_author(doc))
+                        added += self._add(name, timestamp, Location(path, line_offset, author))
+            except OSError:
+                continue
+            self.segment_offsets[segment_name] = offset
+        return added
+
+    def _read_fresh(self) -> Tuple[int, bool]:
+        added = 0
+        incomplete = False
+        try:
+            with os.scandir(self.channel_dir) as entries:
+                names = {entry.name for entry in entries if entry.name.endswith(".json") and entry.is_file()}
+        except OSError:
+            names = set()
+
+        for name in self.fresh - names:
+            known = self.locations.get(name)
+            if known is not None and known[1].offset is None:
+                self._remove(name)  # deleted, not compacted
+        for name in names - self.fresh:
+            if name in self.locations:
+                continue  # already in a segment, file not removed yet
+            path = str(self.channel_dir / name)
+            parsed = name_key(name)
+            if parsed is None:
+                try:
+                    with open(path, 'rb') as f:
+                        doc = decode(f.read())
+                except (OSError, ValueError):
+                    incomplete = True  # still being written
+                    continue
+                parsed = doc_timestamp(doc, name), doc_author(doc)
+            added += self._add(name, parsed[0], Location(path, None, parsed[1]))
+        self.fresh = {name for name in names if name in self.locations}
+        return added, incomplete
+
+    def refresh(self) -> int:
+        """Подхватить новые сообщения, вернуть число добавленных"""
+        with self.lock:
+            signature = self._signature()
+            if signature is not None and signature == self.signature:
+                return 0
+            # Segments first: a file that was just compacted keeps its segment location
+            added = self._read_segments()
+            fresh_added, incomplete = self._read_fresh()
+            # Files still being written do not change the directory mtime: retry next call
+            self.signature = None if incomplete else signature
+            return added + fresh_added
+
+    # --- queries ------------------------------------------------------------
+
+    def _load(self, name: str) -> Optional[ChannelMessage]:
+        entry = self.locations.get(name)
+        if entry is None:
+            return None
+        (timestamp, _), location = entry
+        try:
+            with open(location.path, 'rb') as f:
+                if location.offset is None:
+                    doc = decode(f.read())
+                else:
+                    f.seek(location.offset)
+                    doc = decode(f.readline())["doc"]
+        except FileNotFoundError:
+            # Compacted since the last refresh
+            self.signature = None
+            self.refresh()
+            moved = self.locations.get(name)
+            if moved is None or moved[1] == location:
+                return None
+            return self._load(name)
+        except (OSError, ValueError, KeyError):
+            return None
+        return ChannelMessage(name, timestamp[:10], doc, location.offset is not None)
+
+    def _select(self, keys: List[Key], since: str, until: str) -> List[Key]:
+        lo = bisect_left(keys, (since, "")) if since else 0
+        hi = bisect_right(keys, (until, "\uffff")) if until else len(keys)
+        return keys[lo:hi]
+
+    def query(self, since: str = "", until: str = "", author: Optional[str] = None,
+              limit: Optional[int] = None) -> List[ChannelMessage]:
+        """Сообщения за [since, until] (строки 'YYYY-MM-DD HH:MM:SS' или их префиксы), по времени
+
+        author - только сообщения автора; limit - последние limit сообщений диапазона.
+        """
+        with self.lock:
+            self.refresh()
+            keys = self.keys if author is None else self.by_author.get(author.lower(), [])
+            selected = self._select(keys, since, until)
+            if limit is not None:
+                selected = selected[-limit:] if limit > 0 else []
+            messages = [self._load(name) for _, name in selected]
+        return [msg for msg in messages if msg is not None]
+
+    def latest(self, count: int, author: Optional[str] = None) -> List[ChannelMessage]:
+        """Последние count сообщений (по времени)"""
+        return self.query(author=author, limit=count)
+
+    def authors(self) -> Dict[str, int]:
+        """Число сообщений по авторам"""
+        with self.lock:
+            self.refresh()
+            return {author: len(keys) for author, keys in sorted(self.by_author.items()) if keys}
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.keys)
+
+
+_indexes: Dict[str, ChannelIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_channel_index(channel_dir: Path) -> ChannelIndex:
+    """Общий на процесс индекс канала"""
+    key = os.path.abspath(channel_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ChannelIndex(Path(channel_dir))
+        return index
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Channel Store for Virtual Office
+Сжатие файлов каналов в дневные JSONL сегменты и чтение истории канала одним потоком
+"""
+
+import os
+import re
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from codec import decode, encode
+
+SEGMENTS_DIR = "segments"
+SEGMENT_SUFFIX = ".jsonl"
+LOCK_NAME = ".compact.lock"
+STALE_LOCK_SECONDS = 600
+
+# general: 2025-09-17_09-14-27-frontend.json, standup: 2025-09-17-backend-standup.json
+DAY_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})")
+
+
+class ChannelMessage(NamedTuple):
+    """Сообщение канала: имя исходного файла, день, документ, где хранится"""
+    name: str
+    day: str
+    doc: Any
+    compacted: bool
+
+
+def message_day(name: str) -> Optional[str]:
+    """День сообщения по имени файла (None - имя не по шаблону)"""
+    match = DAY_RE.match(name)
+    return match.group(1) if match else None
+
+
+def read_segment(path: Path) -> Iterator[Tuple[str, Any]]:
+    """(имя файла, документ) из сегмента по порядку
+
+    Строка, оборванная при сбое во время дописывания, пропускается.
+    """
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = decode(line)
+                    yield entry["file"], entry["doc"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        return
+
+
+def _is_open(doc: Any) -> bool:
+    # channels/help requests stay as files while open: agents look for them by *.json
+    return isinstance(doc, dict) and doc.get("status") == "open"
+
+
+class ChannelReader:
+    """История канала: сегменты и еще не сжатые файлы как один упорядоченный поток
+
+    Порядок - по дням, внутри дня по имени файла (имя начинается со времени).
+    В памяти один день. Файл, уже дописанный в сегмент, но еще не удаленный
+    (сжатие идет прямо сейчас или файл был занят), выдается один раз.
+    """
+
+    def __init__(self, channel_dir: Path):
+        self.channel_dir = Path(channel_dir)
+        self.segments_dir = self.channel_dir / SEGMENTS_DIR
+
+    def _fresh_files(self) -> Dict[str, List[str]]:
+        by_day: Dict[str, List[str]] = {}
+        try:
+            with os.scandir(self.channel_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        day = message_day(entry.name) or ""
+                        by_day.setdefault(day, []).append(entry.name)
+        except OSError:
+            pass
+        return by_day
+
+    def _segment_days(self) -> List[str]:
+        try:
+            return [name[:-len(SEGMENT_SUFFIX)] for name in os.listdir(self.segments_dir)
+                    if name.endswith(SEGMENT_SUFFIX)]
+        except OSError:
+            return []
+
+    def days(self) -> List[str]:
+        """Дни, за которые в канале есть сообщения"""
+        return sorted(set(self._segment_days()) | set(self._fresh_files()))
+
+    def iter_day(self, day: str, fresh: Optional[List[str]] = None) -> Iterator[ChannelMessage]:
+        """Сообщения одного дня по порядку"""
+        if fresh is None:
+            fresh = self._fresh_files().get(day, [])
+        messages: Dict[str, ChannelMessage] = {}
+        for name, doc in read_segment(self.segments_dir / f"{day}{SEGMENT_SUFFIX}"):
+            messages[name] = ChannelMessage(name, day, doc, True)
+        for name in fresh:
+            if name in messages:
+                continue
+            try:
+                with open(self.channel_dir / name, 'rb') as f:
+                    doc = decode(f.read())
+            except (OSError, ValueError):
+                continue  # compacted away or still being written
+            messages[name] = ChannelMessage(name, day, doc, False)
+        for name in sorted(messages):
+            yield messages[name]
+
+    def iter_messages(self, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[ChannelMessage]:
+        """Все сообщения за дни since..until (YYYY-MM-DD, включительно) по порядку"""
+        fresh = self._fresh_files()
+        for day in sorted(set(self._segment_days()) | set(fresh)):
+            if (since and day < since) or (until and day > until):
+                continue
+            yield from self.iter_day(day, fresh.get(day, []))
+
+
+class ChannelCompactor:
+    """Сжатие файлов прошедших дней в сегменты channels/<канал>/segments/<день>.jsonl
+
+    Безопасно при одновременной записи агентами: берутся только файлы дней старше
+    keep_days и не моложе min_age секунд; файл удаляется только после того, как его
+    строка записана в сегмент и сброшена на диск. После сбоя уже дописанные файлы
+    не дублируются, а удаляются при следующем запуске. Нечитаемые и открытые
+    (status == "open") файлы остаются на месте.
+    """
+
+    def __init__(self, channels_dir: Path, keep_days: int = 1, min_age: float = 300,
+                 keep: Callable[[Any], bool] = _is_open):
+        self.channels_dir = Path(channels_dir)
+        self.keep_days = keep_days
+        self.min_age = min_age
+        self.keep = keep
+
+    def channels(self) -> List[str]:
+        try:
+            return sorted(entry.name for entry in os.scandir(self.channels_dir) if entry.is_dir())
+        except OSError:
+            return []
+
+    def _acquire(self, segments_dir: Path) -> Optional[Path]:
+        lock = segments_dir / LOCK_NAME
+        for _ in range(2):
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return lock
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime < STALE_LOCK_SECONDS:
+                        return None
+                    lock.unlink()  # left by a crashed compactor
+                except OSError:
+                    return None
+        return None
+
+    def _candidates(self, channel_dir: Path) -> Dict[str, List[str]]:
+        cutoff_day = (date.today() - timedelta(days=self.keep_days - 1)).isoformat()
+        cutoff_time = time.time() - self.min_age
+        by_day: Dict[str, List[str]] = {}
+        with os.scandir(channel_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                day = message_day(entry.name)
+                if day is None or day >= cutoff_day:
+                    continue
+                try:
+                    if entry.stat().st_mtime > cutoff_time:
+                        continue
+                except OSError:
+                    continue
+                by_day.setdefault(day, []).append(entry.name)
+        return by_day
+
+    def _compact_day(self, channel_dir: Path, segment: Path, names: List[str]) -> Dict[str, int]:
+        stats = {"compacted": 0, "kept": 0, "removed": 0}
+        done: Set[str] = {name for name, _ in read_segment(segment)}
+
+        lines = []
+        for name in sorted(names):
+            if name in done:
+                continue
+            try:
+                with open(channel_dir / name, 'rb') as f:
+                    doc = decode(f.read())
+            except (OSError, ValueError):
+                stats["kept"] += 1
+                continue
+            if self.keep(doc):
+                stats["kept"] += 1
+                continue
+            lines.append(encode({"file": name, "doc": doc}) + b"\n")
+            done.add(name)
+
+        if lines:
+            with open(segment, 'ab') as f:
+                # A torn last line from a crash must not swallow the next entry
+                if f.tell() > 0:
+                    with open(segment, 'rb') as tail:
+                        tail.seek(-1, os.SEEK_END)
+                        if tail.read(1) != b"\n":
+                            f.write(b"\n")
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            stats["compacted"] = len(lines)
+
+        # Only files already in the segment; includes leftovers from an interrupted run
+        for name in names:
+            if name in done:
+                try:
+                    os.unlink(channel_dir / name)
+                    stats["removed"] += 1
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    pass  # busy (Windows): the reader skips it, retried next run
+        return stats
+
+    def compact_channel(self, channel: str) -> Dict[str, int]:
+        """Сжать один канал, вернуть счетчики"""
+        channel_dir = self.channels_dir / channel
+        segments_dir = channel_dir / SEGMENTS_DIR
+        totals = {"compacted": 0, "kept": 0, "removed": 0, "days": 0}
+        candidates = self._candidates(channel_dir)
+        if not candidates:
+            return totals
+
+        segments_dir.mkdir(exist_ok=True)
+        lock = self._acquire(segments_dir)
+        if lock is None:
+            print(f"⏳ Канал {channel} уже сжимается другим процессом")
+            return totals
+        try:
+            for day, names in sorted(candidates.items()):
+                stats = self._compact_day(channel_dir, segments_dir / f"{day}{SEGMENT_SUFFIX}", names)
+                for key, value in stats.items():
+                    totals[key] += value
+                totals["days"] += 1
+        finally:
+            try:
+                lock.unlink()
+            except OSError:
+                pass
+        return totals
+
+    def compact_all(self) -> Dict[str, Dict[str, int]]:
+        """Сжать все каналы"""
+        return {channel: self.compact_channel(channel) for channel in self.channels()}
+
+
+def main():
+    channels_dir = Path(r"C:\www.spa.com\.ai-team") / "virtual-office" / "channels"
+    args = sys.argv[1:]
+
+    if args and args[0] == "compact":
+        keep_days = int(args[args.index("--keep-days") + 1]) if "--keep-days" in args else 1
+        compactor = ChannelCompactor(channels_dir, keep_days=keep_days)
+        for channel, stats in compactor.compact_all().items():
+            print(f"🗜️ #{channel}: сжато {stats['compacted']}, удалено файлов {stats['removed']}, "
+                  f"оставлено {stats['kept']}, дней {stats['days']}")
+
+    elif len(args) >= 2 and args[0] == "cat":
+        since = args[2] if len(args) > 2 else None
+        for msg in ChannelReader(channels_dir / args[1]).iter_messages(since=since):
+            doc = msg.doc if isinstance(msg.doc, dict) else {}
+            print(f"{msg.name}: [{doc.get('agent', '?')}] {doc.get('message', '')}")
+
+    else:
+        print("Usage:")
+        print("  python channel_store.py compact [--keep-days N]   - Fold old channel files into day segments")
+        print("  python channel_store.py cat <channel> [YYYY-MM-DD] - Print channel history")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chat Log for Virtual Office
+Сегментированный журнал чата с индексом смещений (chat.md / agent-chat.md)
+"""
+
+import json
+import os
+import re
+import struct
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from log_follower import LINE_ENTRY
+
+# Sidecar index record: entry timestamp (microseconds since epoch), byte offset in segment
+INDEX_RECORD = struct.Struct("<qQ")
+DEFAULT_ROTATE_BYTES = 4 * 1024 * 1024
+MARKDOWN_STATE = "markdown.offset"
+SECTION_HEADER = re.compile(r"^### (\d{4}-\d{2}-\d{2} \d{2}:\d{2})")
+
+
+@contextmanager
+def file_lock(lock_path: Path):
+    """Межпроцессная блокировка на lock-файле (msvcrt на Windows, fcntl в остальных ОС)"""
+    with open(lock_path, 'a+b') as f:
+        if sys.platform == "win32":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _to_us(ts: datetime) -> int:
+    return int(ts.timestamp() * 1_000_000)
+
+
+class ChatLog:
+    """Журнал чата: JSONL сегменты с ротацией по дню/размеру и индексом .idx рядом
+
+    Каждая запись - одна строка JSON; в .idx на каждую запись 16 байт (время, смещение),
+    поэтому последние N, страница K и диапазон времени читают только нужные строки.
+    Записи добавляются в порядке времени: ts (по умолчанию - момент добавления)
+    берется под блокировкой и не раньше последней записи. Перед первой записью
+    экземпляр доиндексирует строки, оставшиеся без .idx после сбоя писателя.
+    """
+
+    def __init__(self, root: Path, rotate_bytes: int = DEFAULT_ROTATE_BYTES):
+        self.root = Path(root)
+        self.rotate_bytes = rotate_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.root / ".lock"
+        self.repaired = False
+
+    @classmethod
+    def for_markdown(cls, md_file: Path, **kwargs) -> "ChatLog":
+        """Журнал рядом с markdown файлом: chat.md -> chat-log/"""
+        md_file = Path(md_file)
+        return cls(md_file.parent / f"{md_file.stem}-log", **kwargs)
+
+    # --- segments -----------------------------------------------------------
+
+    def segments(self) -> List[Path]:
+        """Сегменты в хронологическом порядке (имена YYYYMMDD-NNNN.jsonl)"""
+        return sorted(self.root.glob("*.jsonl"))
+
+    @staticmethod
+    def _index_path(segment: Path) -> Path:
+        return segment.with_suffix(".idx")
+
+    def _segment_for(self, ts: datetime) -> Path:
+        day = ts.strftime("%Y%m%d")
+        segments = self.segments()
+        if segments:
+            current = segments[-1]
+            current_day, _, number = current.stem.partition("-")
+            if current_day == day:
+                if current.stat().st_size < self.rotate_bytes:
+                    return current
+                return self.root / f"{day}-{int(number) + 1:04d}.jsonl"
+        return self.root / f"{day}-0000.jsonl"
+
+    def _index_count(self, segment: Path) -> int:
+        try:
+            return self._index_path(segment).stat().st_size // INDEX_RECORD.size
+        except OSError:
+            return 0
+
+    def _read_index(self, segment: Path, start: int, stop: int) -> List[Tuple[int, int]]:
+        if stop <= start:
+            return []
+        with open(self._index_path(segment), 'rb') as f:
+            f.seek(start * INDEX_RECORD.size)
+            data = f.read((stop - start) * INDEX_RECORD.size)
+        return [INDEX_RECORD.unpack_from(data, i) for i in range(0, len(data), INDEX_RECORD.size)]
+
+    def _last_us(self) -> int:
+        for segment in reversed(self.segments()):
+            count = self._index_count(segment)
+            if count:
+                return self._read_index(segment, count - 1, count)[0][0]
+        return 0
+
+    def _read_entries(self, segment: Path, records: List[Tuple[int, int]]) -> List[Dict]:
+        entries = []
+        if not records:
+            return entries
+        with open(segment, 'rb') as f:
+            for _, offset in records:
+                f.seek(offset)
+                entries.append(json.loads(f.readline()))
+        return entries
+
+    def repair(self) -> int:
+        """Доиндексировать строки сегментов, которых нет в .idx (после сбоя писателя)"""
+        with file_lock(self.lock_path):
+            return self._repair()
+
+    def _repair(self) -> int:
+        # Caller holds file_lock
+        added = 0
+        for segment in self.segments():
+            count = self._index_count(segment)
+            offset = 0
+            if count:
+                _, last_offset = self._read_index(segment, count - 1, count)[0]
+                with open(segment, 'rb') as f:
+                    f.seek(last_offset)
+                    f.readline()
+                    offset = f.tell()
+            with open(segment, 'rb') as f, open(self._index_path(segment), 'ab') as idx:
+                f.seek(offset)
+                for line in iter(f.readline, b""):
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        ts = datetime.fromisoformat(json.loads(line)["ts"])
+                    except (ValueError, KeyError, TypeError):
+                        # Torn line of a crashed writer followed by a later entry
+                        offset += len(line)
+                        continue
+                    idx.write(INDEX_RECORD.pack(_to_us(ts), offset))
+                    offset += len(line)
+                    added += 1
+        self.repaired = True
+        return added
+
+    # --- write --------------------------------------------------------------
+
+    def append(self, entry: Dict) -> Dict:
+        """Добавить запись (поле ts проставляется, если не задано; не раньше последней записи)"""
+        entry = dict(entry)
+        with file_lock(self.lock_path):
+            if not self.repaired:
+                self._repair()
+            ts = datetime.fromisoformat(entry["ts"]) if "ts" in entry else datetime.now()
+            # Another writer may have appended between our clock read and the lock
+            ts = max(ts, datetime.fromtimestamp(self._last_us() / 1_000_000))
+            entry["ts"] = ts.isoformat()
+            self._write(entry, ts)
+        return entry
+
+    def _write(self, entry: Dict, ts: datetime):
+        line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        segment = self._segment_for(ts)
+        with open(segment, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(line)
+        with open(self._index_path(segment), 'ab') as idx:
+            idx.write(INDEX_RECORD.pack(_to_us(ts), offset))
+
+    def import_markdown(self, md_file: Path) -> int:
+        """Дописать в журнал записи markdown-файла, сделанные в обход журнала
+
+        PowerShell-агенты и другие инструменты дописывают agent-chat.md напрямую.
+        Прочитанная часть файла отмечается в <журнал>/markdown.offset; записи,
+        markdown-вид которых уже есть в журнале (их добавил append), не дублируются.
+        Импортированная запись хранит исходный текст (kind "markdown"); ее ts не
+        раньше последней записи журнала, чтобы индекс оставался упорядоченным.
+        """
+        md_file = Path(md_file)
+        state_path = self.root / MARKDOWN_STATE
+        with file_lock(self.lock_path):
+            if not self.repaired:
+                self._repair()
+            try:
+                st = md_file.stat()
+            except OSError:
+                return 0
+            try:
+                state = json.loads(state_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                state = {}
+            offset = state.get("offset", 0)
+            if (state.get("dev"), state.get("ino")) != (st.st_dev, st.st_ino) or st.st_size < offset:
+                offset = 0  # first import, replaced or truncated file
+            if st.st_size == offset:
+                return 0
+
+            with open(md_file, 'rb') as f:
+                f.seek(offset)
+                data = f.read(st.st_size - offset)
+            entries, consumed = _parse_markdown(data)
+
+            imported = 0
+            if entries:
+                known = self._rendered(offset, state.get("imported_at"))
+                last_us = self._last_us()
+                now = datetime.now()
+                for raw, ts in entries:
+                    if raw.strip() in known:
+                        continue
+                    # Never in the future (a [HH:MM] line from yesterday) and never before the last entry
+                    ts = max(min(ts or now, now), datetime.fromtimestamp(last_us / 1_000_000))
+                    self._write({"kind": "markdown", "ts": ts.isoformat(), "raw": raw}, ts)
+                    last_us = _to_us(ts)
+                    imported += 1
+
+            state = {"dev": st.st_dev, "ino": st.st_ino, "offset": offset + consumed,
+                     "imported_at": datetime.now().isoformat()}
+            tmp = state_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp, state_path)
+        return imported
+
+    def _rendered(self, offset: int, imported_at: Optional[str] = None) -> Set[str]:
+        """Markdown-вид записей журнала, которые могли попасть в файл после offset"""
+        if offset == 0 or imported_at is None:
+            entries = self.iter_all()
+        else:
+            since = datetime.fromisoformat(imported_at) - timedelta(minutes=5)
+            entries = self.between(since, datetime.now() + timedelta(days=1))
+        return {render_markdown(entry).strip() for entry in entries if entry.get("kind") != "markdown"}
+
+    # --- read ---------------------------------------------------------------
+
+    def count(self) -> int:
+        """Общее число записей (по размерам индексов, без чтения данных)"""
+        return sum(self._index_count(segment) for segment in self.segments())
+
+    def page(self, page: int = 0, page_size: int = 20) -> List[Dict]:
+        """Страница прокрутки: 0 - самые новые; записи в хронологическом порядке"""
+        skip = page * page_size
+        want = page_size
+        chunks = []
+        for segment in reversed(self.segments()):
+            if want <= 0:
+                break
+            count = self._index_count(segment)
+            if skip >= count:
+                skip -= count
+                continue
+            stop = count - skip
+            start = max(0, stop - want)
+            chunks.append(self._read_entries(segment, self._read_index(segment, start, stop)))
+            want -= stop - start
+            skip = 0
+
+        entries = []
+        for chunk in reversed(chunks):
+            entries.extend(chunk)
+        return entries
+
+    def last(self, n: int = 10) -> List[Dict]:
+        """Последние n записей"""
+        return self.page(0, n)
+
+    def _bisect(self, segment: Path, count: int, ts_us: int) -> int:
+        # Binary search over index records, O(log n) reads of 16 bytes
+        lo, hi = 0, count
+        with open(self._index_path(segment), 'rb') as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(mid * INDEX_RECORD.size)
+                if INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))[0] < ts_us:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return lo
+
+    def between(self, since: datetime, until: datetime) -> List[Dict]:
+        """Записи с since <= ts < until"""
+        since_us, until_us = _to_us(since), _to_us(until)
+        entries = []
+        for segment in self.segments():
+            count = self._index_count(segment)
+            if not count:
+                continue
+            first_us = self._read_index(segment, 0, 1)[0][0]
+            last_us = self._read_index(segment, count - 1, count)[0][0]
+            if last_us < since_us or first_us >= until_us:
+                continue
+            start = self._bisect(segment, count, since_us)
+            stop = self._bisect(segment, count, until_us)
+            entries.extend(self._read_entries(segment, self._read_index(segment, start, stop)))
+        return entries
+
+    def iter_all(self) -> Iterator[Dict]:
+        """Все записи по порядку (для экспорта)"""
+        for segment in self.segments():
+            with open(segment, 'rb') as f:
+                for line in f:
+                    if line.endswith(b"\n"):
+                        yield json.loads(line)
+
+
+def render_markdown(entry: Dict) -> str:
+    """Markdown представление записи в формате chat.md / agent-chat.md"""
+    ts = datetime.fromisoformat(entry["ts"])
+    if entry.get("kind") == "markdown":
+        raw = entry["raw"]
+        return f"\n{raw}\n" if raw.startswith("### ") else f"{raw}\n"
+    if entry.get("kind") == "line":
+        return f"{ts.strftime('[%H:%M]')} {entry['message']}\n"
+    return (
+        f"\n### {ts.strftime('%Y-%m-%d %H:%M')} [{entry.get('author', '')}] {entry.get('title', '')}\n"
+        f"**Статус**: {entry.get('status', '')}\n"
+        f"**Сообщение**: {entry.get('message', '')}\n"
+        f"---\n"
+    )
+
+
+def _parse_markdown(data: bytes) -> Tuple[List[Tuple[str, Optional[datetime]]], int]:
+    """Записи '### ... ---' и '[HH:MM] текст' из байт markdown-файла
+
+    Возвращает [(текст записи, время или None)] и число разобранных байт:
+    незавершенная последняя секция (без '---' и следующего заголовка) и
+    оборванная строка остаются на следующий раз.
+    """
+    entries: List[Tuple[str, Optional[datetime]]] = []
+    pending: List[str] = []
+    pending_start = 0
+    consumed = 0
+    position = 0
+    today = datetime.now()
+
+    def section_entry(lines: List[str]) -> Tuple[str, Optional[datetime]]:
+        match = SECTION_HEADER.match(lines[0])
+        ts = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M") if match else None
+        while len(lines) > 1 and not lines[-1].strip():
+            lines = lines[:-1]
+        return "\n".join(lines), ts
+
+    for raw_line in data.splitlines(keepends=True):
+        start, position = position, position + len(raw_line)
+        if not raw_line.endswith(b"\n"):
+            break
+        line = raw_line.decode("utf-8-sig", errors="replace").rstrip("\r\n")
+        if line.startswith("### "):
+            if pending:
+                entries.append(section_entry(pending))
+            pending, pending_start = [line], start
+            consumed = start
+        elif pending:
+            pending.append(line)
+            if line.strip() == "---":
+                entries.append(section_entry(pending))
+                pending = []
+                consumed = position
+        elif LINE_ENTRY.match(line):
+            hour, minute = int(line[1:3]), int(line[4:6])
+            entries.append((line, today.replace(hour=hour, minute=minute, second=0, microsecond=0)))
+            consumed = position
+        else:
+            consumed = position  # headings, blank lines and other text between entries
+    if pending:
+        consumed = pending_start
+    return entries, consumed
+
+
+def main():
+    """Вывести журнал в markdown: chat_log.py <log_dir> [last N | page K [size]]"""
+    if len(sys.argv) < 2:
+        print("Usage: python chat_log.py <log_dir> [last N | page K [size]]")
+        return
+
+    log = ChatLog(Path(sys.argv[1]))
+    args = sys.argv[2:]
+    if args[:1] == ["page"] and len(args) > 1:
+        entries = log.page(int(args[1]), int(args[2]) if len(args) > 2 else 20)
+    elif args[:1] == ["last"] and len(args) > 1:
+        entries = log.last(int(args[1]))
+    else:
+        entries = log.iter_all()
+
+    for entry in entries:
+        sys.stdout.write(render_markdown(entry))
+
+
+if __name__ == "__main__":
+    main()
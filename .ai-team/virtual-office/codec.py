@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Record Codecs for Virtual Office
+Форматы сериализации записей офиса: JSON (с отступами и компактный) и двоичный
+"""
+
+import json
+import marshal
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Union
+
+# Binary records start with a NUL byte, which never starts a JSON text
+MAGIC = b"\x00VO"
+
+
+class Codec:
+    """Кодек: encode(документ) -> bytes, decode(bytes) -> документ"""
+    name = ""
+    binary_id = None  # byte after MAGIC for binary codecs
+
+    def encode(self, document: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class PrettyJsonCodec(Codec):
+    """Прежний формат: JSON с отступами (удобно читать глазами)"""
+    name = "json-pretty"
+
+    def encode(self, document: Any) -> bytes:
+        return json.dumps(document, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data.decode("utf-8-sig"))
+
+
+class CompactJsonCodec(PrettyJsonCodec):
+    """JSON без пробелов: читается PowerShell агентами (ConvertFrom-Json) как и раньше"""
+    name = "json"
+
+    def encode(self, document: Any) -> bytes:
+        return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class BinaryCodec(Codec):
+    """Двоичный формат на marshal (только stdlib) для данных, которые читает только Python
+
+    Заголовок: MAGIC, id кодека, версия marshal. Поддерживаются типы JSON (dict, list,
+    str, int, float, bool, None); marshal не защищен от подделанных данных, поэтому
+    формат только для собственных файлов и базы офиса.
+    """
+    name = "binary"
+    binary_id = 1
+    version = 4
+
+    def encode(self, document: Any) -> bytes:
+        return MAGIC + bytes((self.binary_id, self.version)) + marshal.dumps(document, self.version)
+
+    def decode(self, data: bytes) -> Any:
+        if len(data) < len(MAGIC) + 2:
+            raise ValueError("bad binary record: truncated header")
+        if data[len(MAGIC) + 1] > marshal.version:
+            raise ValueError(f"binary record version {data[len(MAGIC) + 1]} is newer than marshal {marshal.version}")
+        try:
+            return marshal.loads(data[len(MAGIC) + 2:])
+        except (EOFError, TypeError) as e:
+            # Truncated or corrupt record: same error type as a broken JSON file
+            raise ValueError(f"bad binary record: {e}") from None
+
+
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in (PrettyJsonCodec(), CompactJsonCodec(), BinaryCodec())}
+BINARY_CODECS: Dict[int, Codec] = {codec.binary_id: codec for codec in CODECS.values() if codec.binary_id}
+
+# Files are read by the PowerShell agents and dashboards: keep them JSON
+DEFAULT_CODEC = "json"
+
+
+def get_codec(name: str = DEFAULT_CODEC) -> Codec:
+    """Кодек по имени: json, json-pretty, binary"""
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"unknown codec: {name}") from None
+
+
+def encode(document: Any, codec: str = DEFAULT_CODEC) -> bytes:
+    """Сериализовать документ выбранным кодеком"""
+    return get_codec(codec).encode(document)
+
+
+def decode(data: Union[bytes, str]) -> Any:
+    """Разобрать запись любого формата: двоичный по маркеру, иначе JSON (старые записи тоже)"""
+    if isinstance(data, str):
+        return json.loads(data)
+    if data[:len(MAGIC)] == MAGIC:
+        if len(data) == len(MAGIC):
+            raise ValueError("bad binary record: truncated header")
+        codec = BINARY_CODECS.get(data[len(MAGIC)])
+        if codec is None:
+            raise ValueError(f"unknown binary codec id {data[len(MAGIC)]}")
+        return codec.decode(data)
+    return json.loads(data.decode("utf-8-sig"))
+
+
+def sample_records() -> Dict[str, Any]:
+    """Типичные задача и сообщение inbox (форма как у CEOInterface)"""
+    now = datetime(2025, 8, 1, 12, 30).isoformat()
+    return {
+        "task": {
+            "task_id": "TASK-01K1JZ5Q0R7D6W3N8B2C4V5X6Y",
+            "title": "Реализовать календарь бронирования",
+            "description": "Компонент выбора даты и времени для записи к мастеру",
+            "assignee": "frontend",
+            "priority": "high",
+            "status": "assigned",
+            "deadline": "2025-08-02",
+            "created_at": now,
+            "updated_at": now,
+            "dependencies": [],
+            "comments": []
+        },
+        "message": {
+            "id": "MSG-01K1JZ5Q0R7D6W3N8B2C4V5X6Z",
+            "from": "CEO",
+            "to": "backend",
+            "message": "Проверьте API фильтров поиска",
+            "priority": "normal",
+            "timestamp": now,
+            "status": "unread"
+        },
+    }
+
+
+def benchmark(count: int = 20000) -> List[Dict[str, Any]]:
+    """Байт на запись и скорость декодирования для каждого кодека и формы записи"""
+    results = []
+    for shape, record in sample_records().items():
+        for name, codec in CODECS.items():
+            data = codec.encode(record)
+            assert decode(data) == record
+
+            started = time.perf_counter()
+            for _ in range(count):
+                decode(data)
+            elapsed = time.perf_counter() - started
+
+            results.append({
+                "shape": shape,
+                "codec": name,
+                "bytes": len(data),
+                "decode_per_sec": count / elapsed if elapsed else float("inf"),
+            })
+    return results
+
+
+def main():
+    """Бенчмарк кодеков: codec.py [records]"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'shape':<8} {'codec':<12} {'bytes/record':>12} {'decode/s':>12}")
+    for row in benchmark(count):
+        print(f"{row['shape']:<8} {row['codec']:<12} {row['bytes']:>12} {row['decode_per_sec']:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
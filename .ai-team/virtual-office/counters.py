@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sharded Counters for Virtual Office
+Счетчики метрик без общей блокировки: каждый писатель дописывает свой шард, читатели складывают
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from codec import decode, encode
+from ids import new_id
+from office_writer import atomic_write
+
+BASE_NAME = "base.json"
+LOCK_NAME = ".compact.lock"
+OPEN_SUFFIX = ".log"        # shard still being appended to by its writer
+SEALED_SUFFIX = ".done"     # writer finished: safe to delete once folded into the base
+STALE_LOCK_SECONDS = 600
+STALE_SHARD_SECONDS = 24 * 3600
+SEALED_GRACE_SECONDS = 60
+SHARD_MAX_BYTES = 1 << 20
+
+CounterKey = Tuple[str, str]  # (agent, metric); agent "" - office totals
+
+
+def _shard_stem(name: str) -> Optional[str]:
+    for suffix in (OPEN_SUFFIX, SEALED_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return None
+
+
+def _read_lines(path: Path, offset: int) -> Tuple[list, int]:
+    """Полные строки шарда после offset и новое смещение (оборванный хвост не читается)"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    entries = []
+    for line in data[:end].splitlines():
+        try:
+            agent, metric, delta = decode(line)
+        except (ValueError, TypeError):
+            continue
+        if isinstance(delta, (int, float)) and not isinstance(delta, bool):
+            entries.append(((str(agent or ""), str(metric)), delta))
+    return entries, offset + end
+
+
+class _Shard:
+    """Шард одного потока: файл, открытый на дозапись, пишет только владелец"""
+
+    def __init__(self, directory: Path):
+        self.stem = f"{new_id('SHARD')}-{os.getpid()}"
+        self.path = directory / f"{self.stem}{OPEN_SUFFIX}"
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0))
+        self.size = 0
+        self.sealed = False
+
+    def alive(self) -> bool:
+        # Sealed by the compactor after a long idle period: start a new shard
+        return not self.sealed and self.path.exists()
+
+    def write(self, data: bytes):
+        os.write(self.fd, data)
+        self.size += len(data)
+
+    def seal(self):
+        if self.sealed:
+            return
+        self.sealed = True
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        try:
+            os.replace(self.path, self.path.with_name(f"{self.stem}{SEALED_SUFFIX}"))
+        except OSError:
+            pass
+
+
+class CounterStore:
+    """Накопительные счетчики агентов и офиса в каталоге шардов
+
+    increment() дописывает одну строку [агент, метрика, прирост] в шард своего потока:
+    у шарда один писатель, поэтому ни блокировок, ни чтения-изменения-записи общего
+    файла, ни потерянных обновлений. Значение счетчика = base.json + все строки шардов
+    после смещений, учтенных в base.json. compact() под файловой блокировкой переносит
+    прочитанное в base.json и удаляет запечатанные шарды; читатели при этом не
+    блокируются и не видят двойного счета.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.base_path = self.directory / BASE_NAME
+        self.local = threading.local()
+        self.shards = []
+        self.shards_lock = threading.Lock()
+
+        # Reader state: merged values and how far each shard has been read
+        self.lock = threading.Lock()
+        self.base_signature = None
+        self.values: Dict[CounterKey, Any] = {}
+        self.offsets: Dict[str, int] = {}
+
+    # --- writers ------------------------------------------------------------
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self.local, "shard", None)
+        if shard is not None and shard.size < SHARD_MAX_BYTES and shard.alive():
+            return shard
+        if shard is not None:
+            shard.seal()
+        fresh = self.local.shard = _Shard(self.directory)
+        with self.shards_lock:
+            self.shards = [s for s in self.shards if s is not shard] + [fresh]
+        return fresh
+
+    def increment(self, metric: str, delta: float = 1, agent: str = ""):
+        """Прибавить delta к счетчику metric агента (agent "" - общий итог офиса)"""
+        self._shard().write(encode([agent, metric, delta]) + b"\n")
+
+    def increment_many(self, items: Iterable[Tuple[str, str, float]]):
+        """Несколько приростов (агент, метрика, прирост) одной записью"""
+        data = b"".join(encode([agent, metric, delta]) + b"\n" for agent, metric, delta in items)
+        if data:
+            self._shard().write(data)
+
+    def close(self):
+        """Запечатать шарды этого процесса (компактор затем удалит их)"""
+        with self.shards_lock:
+            shards, self.shards = self.shards, []
+        for shard in shards:
+            shard.seal()
+        self.local = threading.local()
+
+    # --- readers ------------------------------------------------------------
+
+    def _load_base(self) -> Tuple[Dict[CounterKey, Any], Dict[str, int], Optional[Tuple]]:
+        try:
+            with open(self.base_path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                base = decode(f.read())
+        except FileNotFoundError:
+            return {}, {}, None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ошибка чтения базы счетчиков: {e}")
+            return {}, {}, None
+        values = {(agent, metric): value for agent, metric, value in base.get("values", [])}
+        return values, dict(base.get("offsets", {})), (st.st_mtime_ns, st.st_size)
+
+    def _shard_files(self) -> Dict[str, Path]:
+        files = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    stem = _shard_stem(entry.name)
+                    if stem is not None:
+                        files[stem] = Path(entry.path)
+        except OSError:
+            pass
+        return files
+
+    def _fold_shards(self, values: Dict[CounterKey, Any], offsets: Dict[str, int],
+                     files: Dict[str, Path]):
+        for stem, path in sorted(files.items()):
+            entries = None
+            # The writer may seal (rename) the shard between listing and opening
+            for candidate in (path, path.with_name(f"{stem}{SEALED_SUFFIX}")):
+                try:
+                    entries, offsets[stem] = _read_lines(candidate, offsets.get(stem, 0))
+                    break
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    break
+            for key, delta in entries or ():
+                values[key] = values.get(key, 0) + delta
+
+    def _base_signature(self) -> Optional[Tuple]:
+        try:
+            st = self.base_path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def snapshot(self) -> Dict[CounterKey, Any]:
+        """Текущие значения всех счетчиков {(агент, метрика): значение}
+
+        Повторный вызов читает только новые строки шардов.
+        """
+        with self.lock:
+            for _ in range(3):
+                if self._base_signature() != self.base_signature:
+                    self.values, self.offsets, self.base_signature = self._load_base()
+                # Base first, then the shard list: a shard deleted by compaction is already in the base
+                self._fold_shards(self.values, self.offsets, self._shard_files())
+                if self._base_signature() == self.base_signature:
+                    break  # no compaction in between
+            return dict(self.values)
+
+    def apply(self, metrics: Dict) -> Dict:
+        """Копия документа metrics.json с прибавленными счетчиками (agents.<агент> и totals)"""
+        merged = dict(metrics)
+        merged["agents"] = {agent: dict(values or {}) for agent, values in (metrics.get("agents") or {}).items()}
+        merged["totals"] = dict(metrics.get("totals") or {})
+        for (agent, metric), value in self.snapshot().items():
+            target = merged["agents"].setdefault(agent, {}) if agent else merged["totals"]
+            current = target.get(metric, 0)
+            target[metric] = (current if isinstance(current, (int, float)) else 0) + value
+        return merged
+
+    # --- compaction ---------------------------------------------------------
+
+    def _acquire(self) -> Optional[Path]:
+        lock = self.directory / LOCK_NAME
+        for _ in range(2):
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return lock
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime < STALE_LOCK_SECONDS:
+                        return None
+                    lock.unlink()  # left by a crashed compactor
+                except OSError:
+                    return None
+        return None
+
+    def compact(self) -> Dict[str, int]:
+        """Перенести строки шардов в base.json и удалить отработанные шарды
+
+        Запечатанный шард удаляется, когда все его строки уже в base.json и он не
+        менялся SEALED_GRACE_SECONDS. Открытый шард, не менявшийся сутки (писатель
+        умер или простаивает), запечатывается переименованием - писатель это видит
+        и заводит новый шард. Смещение удаленного шарда остается в base.json до
+        следующего сжатия, чтобы читатель, еще видящий файл, не посчитал его дважды.
+        """
+        stats = {"shards": 0, "folded": 0, "sealed": 0, "removed": 0}
+        lock = self._acquire()
+        if lock is None:
+            print("⏳ Счетчики уже сжимаются другим процессом")
+            return stats
+        try:
+            values, offsets, _ = self._load_base()
+            files = self._shard_files()
+            # Offsets of shards removed by the previous compaction are no longer needed
+            offsets = {stem: offset for stem, offset in offsets.items() if stem in files}
+            before = dict(offsets)
+            self._fold_shards(values, offsets, files)
+            stats["shards"] = len(files)
+            stats["folded"] = sum(1 for stem in files if offsets.get(stem, 0) != before.get(stem, 0))
+
+            atomic_write(self.base_path, encode({
+                "values": [[agent, metric, value] for (agent, metric), value in sorted(values.items())],
+                "offsets": offsets,
+                "compacted_at": time.time(),
+            }), fsync=True)
+
+            now = time.time()
+            for stem, path in files.items():
+                sealed = path.with_name(f"{stem}{SEALED_SUFFIX}")
+                try:
+                    if path != sealed and path.exists():
+                        if path.stat().st_mtime < now - STALE_SHARD_SECONDS:
+                            os.replace(path, sealed)
+                            stats["sealed"] += 1
+                        continue
+                    st = sealed.stat()
+                    folded = st.st_size <= offsets.get(stem, 0)
+                    # A torn tail left by a crash is never completed: dropped with a stale shard
+                    if (folded and st.st_mtime < now - SEALED_GRACE_SECONDS) or st.st_mtime < now - STALE_SHARD_SECONDS:
+                        sealed.unlink()
+                        stats["removed"] += 1
+                except OSError:
+                    continue  # busy (Windows) or already gone: retried next run
+        finally:
+            try:
+                lock.unlink()
+            except OSError:
+                pass
+        return stats
+
+
+_stores: Dict[str, CounterStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_counter_store(directory: Path) -> CounterStore:
+    """Общее на процесс хранилище счетчиков"""
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = CounterStore(Path(directory))
+            # Sealed shards can be removed by the next compaction
+            atexit.register(store.close)
+        return store
+
+
+def main():
+    directory = Path(r"C:\www.spa.com\.ai-team") / "system" / "counters"
+    args = sys.argv[1:]
+    store = get_counter_store(directory)
+
+    if len(args) >= 2 and args[0] == "add":
+        agent = args[2] if len(args) > 2 else ""
+        delta = float(args[3]) if len(args) > 3 else 1
+        store.increment(args[1], int(delta) if delta.is_integer() else delta, agent)
+
+    elif args and args[0] == "compact":
+        stats = store.compact()
+        print(f"🗜️ Шардов: {stats['shards']}, перенесено: {stats['folded']}, "
+              f"запечатано: {stats['sealed']}, удалено: {stats['removed']}")
+
+    elif args and args[0] == "show":
+        for (agent, metric), value in sorted(store.snapshot().items()):
+            print(f"{agent or 'totals':<12} {metric:<20} {value}")
+
+    else:
+        print("Usage:")
+        print("  python counters.py add <metric> [agent] [delta] - Increment a counter")
+        print("  python counters.py show                         - Print merged counters")
+        print("  python counters.py compact                      - Fold shards into the base")
+
+
+if __name__ == "__main__":
+    main()
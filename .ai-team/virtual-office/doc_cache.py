@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Document Cache for Virtual Office
+Общий кэш разобранных JSON документов с LRU вытеснением
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from codec import decode
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class DocumentCache:
+    """Кэш разобранных документов по сигнатуре файла (inode, mtime, size)
+
+    Пока сигнатура не изменилась, возвращается уже разобранный документ (один stat вместо
+    open + decode). Объем ограничен суммарным размером файлов, вытесняются давно неиспользуемые.
+    Возвращаемые объекты общие - вызывающий код не должен их изменять (копируйте перед правкой).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = 100_000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Tuple[int, int, int], Any, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def load(self, path: Path, stat_result: Optional[os.stat_result] = None) -> Any:
+        """Прочитать документ (JSON или двоичный), из кэша если файл не менялся (ошибки как у open/json.load)"""
+        key = os.fspath(path)
+        st = stat_result if stat_result is not None else os.stat(key)
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] == signature:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        with open(key, 'rb') as f:
+            document = decode(f.read())
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if st.st_size <= self.max_bytes:
+                self.entries[key] = (signature, document, st.st_size)
+                self.bytes += st.st_size
+                self._evict()
+        return document
+
+    def _evict(self):
+        while self.entries and (self.bytes > self.max_bytes or len(self.entries) > self.max_entries):
+            _, (_, _, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def invalidate(self, path: Path):
+        """Удалить файл из кэша (после собственной перезаписи)"""
+        with self.lock:
+            old = self.entries.pop(os.fspath(path), None)
+            if old is not None:
+                self.bytes -= old[2]
+
+    def clear(self):
+        """Очистить кэш и счетчики"""
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий/промахов и заполненность"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_shared_cache = DocumentCache()
+
+
+def get_document_cache() -> DocumentCache:
+    """Общий на процесс кэш (монитор, CEO интерфейс и чат используют один экземпляр)"""
+    return _shared_cache
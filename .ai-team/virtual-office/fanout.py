@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Message Fan-out for Virtual Office
+Рассылка одного сообщения многим получателям без копирования содержимого
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from codec import encode
+from office_writer import atomic_write
+
+# "to" of a shared payload: the recipient is the inbox folder, the list is in "recipients"
+SHARED_TO = "*"
+
+
+class FanOut:
+    """Один файл сообщения в store_dir и жесткие ссылки на него в inbox/<agent>/
+
+    Агенты читают inbox/<agent>/*.json как обычные файлы, поэтому ссылка выглядит для них
+    как собственная копия. Содержимое сериализуется и пишется один раз; на получателя -
+    только запись каталога. Если файловая система не поддерживает жесткие ссылки,
+    получателю пишутся те же байты (без повторной сериализации).
+    Статус прочтения у каждого получателя свой - в курсоре inbox (ReadCursor) и в его копии
+    файла. Копию получателя можно только заменить целиком (atomic_write в InboxStore,
+    Move-Item в message-router.ps1): запись поверх ссылки изменила бы сообщение у всех.
+    По той же причине поле to у всех копий общее (SHARED_TO), а получатели перечислены
+    в поле recipients.
+    """
+
+    def __init__(self, store_dir: Path, inbox_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.inbox_dir = Path(inbox_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.known_dirs: Set[Path] = set()
+
+    def _ensure_dir(self, path: Path):
+        if path not in self.known_dirs:
+            path.mkdir(parents=True, exist_ok=True)
+            self.known_dirs.add(path)
+
+    def store(self, msg_id: str, msg: Dict) -> Tuple[Path, bytes]:
+        """Сохранить сообщение один раз, вернуть (файл, байты) для link()"""
+        data = encode(msg)
+        payload = self.store_dir / f"{msg_id}.json"
+        # New inode every time: never rewrite a payload that inboxes already link to
+        atomic_write(payload, data)
+        return payload, data
+
+    def link(self, payload: Path, data: bytes, agent: str) -> Path:
+        """Положить ссылку на сохраненное сообщение в inbox агента"""
+        inbox_path = self.inbox_dir / agent
+        self._ensure_dir(inbox_path)
+        target = inbox_path / payload.name
+        try:
+            os.link(payload, target)
+        except FileExistsError:
+            os.unlink(target)
+            os.link(payload, target)
+        except OSError:
+            # No hard links here (e.g. FAT, network share) - same bytes, no re-serialisation
+            atomic_write(target, data)
+        return target
+
+    def send(self, msg_id: str, msg: Dict, recipients: List[str]) -> List[Tuple[str, Path]]:
+        """Сохранить сообщение один раз и разослать ссылки, вернуть [(agent, файл в inbox)]"""
+        payload, data = self.store(msg_id, msg)
+        return [(agent, self.link(payload, data, agent)) for agent in dict.fromkeys(recipients)]
+
+    def prune(self) -> int:
+        """Удалить сообщения, на которые не осталось ссылок ни в одном inbox/outbox"""
+        removed = 0
+        with os.scandir(self.store_dir) as entries:
+            for entry in entries:
+                # DirEntry.stat() reports st_nlink = 0 on Windows: ask the file itself
+                if entry.name.endswith(".json") and os.stat(entry.path).st_nlink == 1:
+                    os.unlink(entry.path)
+                    removed += 1
+        return removed
+
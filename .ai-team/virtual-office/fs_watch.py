@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+File System Watcher for Virtual Office
+Уведомления об изменениях файлов: inotify (Linux) или опрос stat (везде)
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_MASK_ADD = 0x20000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+# Files kept open for appending never send IN_CLOSE_WRITE: watch their writes too
+CONTENTS_MASK = WATCH_MASK | IN_MODIFY
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """Базовый наблюдатель: каталоги (опционально с подкаталогами) и отдельные файлы"""
+
+    def watch_dir(self, path: Path, recursive: bool = False, contents: bool = False):
+        """contents=True - замечать и дозапись в файлы каталога, открытые без закрытия"""
+        raise NotImplementedError
+
+    def watch_file(self, path: Path):
+        raise NotImplementedError
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Дождаться изменений, вернуть измененные пути (пустое множество - таймаут)"""
+        raise NotImplementedError
+
+    def wait_batch(self, timeout: Optional[float] = None, debounce: float = 0.05,
+                   max_delay: float = 0.5) -> Set[Path]:
+        """Дождаться изменений и собрать пачку событий (debounce), чтобы не перерисовывать на каждое"""
+        changed = self.wait(timeout)
+        if not changed:
+            return changed
+
+        deadline = time.monotonic() + max_delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = self.wait(min(debounce, remaining))
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(FileWatcher):
+    """Наблюдатель на inotify: без опроса, задержка определяется только debounce"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # wd -> (path, recursive, explicit); non-explicit watches exist only for files/pending dirs
+        self.dirs: Dict[int, Tuple[Path, bool, bool]] = {}
+        self.files: Set[Path] = set()
+        self.pending_dirs: Set[Tuple[Path, bool]] = set()
+        self.contents: Set[Path] = set()
+
+    @staticmethod
+    def available() -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        try:
+            return hasattr(ctypes.CDLL(libc_name), "inotify_init1")
+        except OSError:
+            return False
+
+    def _add_watch(self, path: Path, recursive: bool = False, explicit: bool = True,
+                   contents: bool = False) -> bool:
+        # IN_MASK_ADD: watching the same directory again never drops IN_MODIFY
+        mask = (CONTENTS_MASK if contents else WATCH_MASK) | IN_MASK_ADD
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            return False
+        if contents:
+            self.contents.add(path)  # subdirectories created later inherit it
+        # inotify returns the same wd for an already watched directory
+        _, was_recursive, was_explicit = self.dirs.get(wd, (path, False, False))
+        self.dirs[wd] = (path, recursive or was_recursive, explicit or was_explicit)
+        if recursive:
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            self._add_watch(Path(entry.path), recursive, contents=contents)
+            except OSError:
+                pass
+        return True
+
+    def watch_dir(self, path: Path, recursive: bool = False, contents: bool = False):
+        path = Path(path)
+        if contents:
+            self.contents.add(path)
+        if not self._add_watch(path, recursive, contents=contents):
+            # Directory does not exist yet - add it once its parent reports it
+            self.pending_dirs.add((path, recursive))
+            self._add_watch(path.parent, explicit=False)
+
+    def watch_file(self, path: Path):
+        path = Path(path)
+        self.files.add(path)
+        self._add_watch(path.parent, explicit=False)
+
+    def _retry_pending(self) -> Set[Path]:
+        added = set()
+        for path, recursive in list(self.pending_dirs):
+            if self._add_watch(path, recursive, contents=path in self.contents):
+                self.pending_dirs.discard((path, recursive))
+                added.add(path)
+        return added
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Kernel queue overflowed - report every watched path
+                changed.update(path for path, _, explicit in self.dirs.values() if explicit)
+                changed.update(self.files)
+                continue
+            if mask & IN_IGNORED:
+                path, recursive, explicit = self.dirs.pop(wd, (None, False, False))
+                if path is not None and explicit:
+                    self.pending_dirs.add((path, recursive))
+                continue
+            if wd not in self.dirs:
+                continue
+
+            directory, recursive, explicit = self.dirs[wd]
+            path = directory / os.fsdecode(name) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and recursive:
+                self._add_watch(path, recursive, contents=directory in self.contents)
+
+            # Directories watched only on behalf of a file report that file only
+            if explicit or path in self.files:
+                changed.add(path)
+
+        changed |= self._retry_pending()
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(FileWatcher):
+    """Переносимый наблюдатель: сравнивает mtime каталогов и отслеживаемых файлов
+
+    Один stat на каталог/файл за такт; новые, удаленные и переименованные файлы
+    меняют mtime каталога, поэтому содержимое каталогов не перечисляется -
+    кроме каталогов с contents=True, где дозапись в файл mtime каталога не меняет.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.dirs: Dict[Path, bool] = {}
+        self.contents: Set[Path] = set()
+        self.files: Set[Path] = set()
+        self.signatures: Dict[Path, Optional[Tuple[int, int]]] = {}
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    @staticmethod
+    def _scan_dir(path: Path, dirs: bool, files: bool) -> Set[Path]:
+        found = set()
+        try:
+            with os.scandir(path) as entries:
+                for e in entries:
+                    if (dirs and e.is_dir()) or (files and e.is_file()):
+                        found.add(Path(e.path))
+        except OSError:
+            pass
+        return found
+
+    def _targets(self) -> Set[Path]:
+        targets = set(self.files)
+        for path, recursive in self.dirs.items():
+            targets.add(path)
+            contents = path in self.contents
+            if recursive:
+                subdirs = self._scan_dir(path, dirs=True, files=False)
+                targets |= subdirs
+                if contents:
+                    for subdir in subdirs:
+                        targets |= self._scan_dir(subdir, dirs=False, files=True)
+            if contents:
+                targets |= self._scan_dir(path, dirs=False, files=True)
+        return targets
+
+    def watch_dir(self, path: Path, recursive: bool = False, contents: bool = False):
+        path = Path(path)
+        self.dirs[path] = recursive
+        if contents:
+            self.contents.add(path)
+        for target in self._targets():
+            self.signatures.setdefault(target, self._signature(target))
+
+    def watch_file(self, path: Path):
+        path = Path(path)
+        self.files.add(path)
+        self.signatures[path] = self._signature(path)
+
+    def _scan(self) -> Set[Path]:
+        changed = set()
+        targets = self._targets()
+        for target in targets:
+            signature = self._signature(target)
+            if self.signatures.get(target, signature) != signature or target not in self.signatures:
+                changed.add(target)
+            self.signatures[target] = signature
+        for gone in set(self.signatures) - targets:
+            del self.signatures[gone]
+            changed.add(gone)
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self._scan()
+            if changed:
+                return changed
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return set()
+                time.sleep(min(self.interval, remaining))
+            else:
+                time.sleep(self.interval)
+
+
+def create_watcher(poll_interval: float = 0.1) -> FileWatcher:
+    """inotify, если доступен, иначе опрос stat"""
+    if InotifyWatcher.available():
+        try:
+            return InotifyWatcher()
+        except OSError:
+            pass
+    return PollingWatcher(poll_interval)
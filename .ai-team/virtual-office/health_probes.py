@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Health Probes for Virtual Office
+Неблокирующие проверки сервисов с кэшированием результатов и историей задержек
+"""
+
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+
+class ProbeResult(NamedTuple):
+    """Результат одной проверки"""
+    name: str
+    ok: bool
+    latency_ms: float
+    detail: str
+    checked_at: float
+
+
+class HealthProbe:
+    """Базовая проверка: check() возвращает (ok, detail) или бросает исключение"""
+
+    def __init__(self, name: str, timeout: float = 1.0):
+        self.name = name
+        self.timeout = timeout
+
+    def check(self) -> tuple:
+        raise NotImplementedError
+
+    def run(self) -> ProbeResult:
+        started = time.perf_counter()
+        try:
+            ok, detail = self.check()
+        except Exception as e:
+            ok, detail = False, str(e) or e.__class__.__name__
+        latency_ms = (time.perf_counter() - started) * 1000
+        return ProbeResult(self.name, ok, latency_ms, detail, time.time())
+
+
+class TcpProbe(HealthProbe):
+    """TCP connect в процессе (вместо powershell Test-NetConnection)"""
+
+    def __init__(self, name: str, host: str, port: int, timeout: float = 1.0):
+        super().__init__(name, timeout)
+        self.host = host
+        self.port = port
+
+    def check(self) -> tuple:
+        with socket.create_connection((self.host, self.port), timeout=self.timeout):
+            return True, f"{self.host}:{self.port} open"
+
+
+class HealthProber:
+    """Запускает проверки в пуле потоков и отдает последние результаты без ожидания
+
+    results() никогда не блокируется: устаревшие (старше ttl) проверки ставятся в очередь,
+    а вызывающий получает предыдущий результат (или None, если проверка еще не завершалась).
+    """
+
+    def __init__(self, probes: List[HealthProbe], ttl: float = 10.0, history_size: int = 100,
+                 max_workers: int = 4):
+        self.probes = {probe.name: probe for probe in probes}
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="probe")
+        self.lock = threading.Lock()
+        self.latest: Dict[str, ProbeResult] = {}
+        self.history: Dict[str, Deque[ProbeResult]] = {
+            name: deque(maxlen=history_size) for name in self.probes
+        }
+        self.in_flight: Dict[str, bool] = {}
+        # Incremented whenever a probe flips between ok and failed
+        self.version = 0
+
+    def _run(self, probe: HealthProbe):
+        result = probe.run()
+        with self.lock:
+            previous = self.latest.get(probe.name)
+            if previous is None or previous.ok != result.ok:
+                self.version += 1
+            self.latest[probe.name] = result
+            self.history[probe.name].append(result)
+            self.in_flight[probe.name] = False
+
+    def refresh(self, force: bool = False):
+        """Запланировать устаревшие проверки (force - все), не дожидаясь их"""
+        now = time.time()
+        with self.lock:
+            due = [
+                probe for name, probe in self.probes.items()
+                if not self.in_flight.get(name) and (
+                    force or name not in self.latest or now - self.latest[name].checked_at >= self.ttl)
+            ]
+            for probe in due:
+                self.in_flight[probe.name] = True
+        for probe in due:
+            self.executor.submit(self._run, probe)
+
+    def results(self) -> Dict[str, Optional[ProbeResult]]:
+        """Последние результаты по всем проверкам (None - еще не проверялось)"""
+        self.refresh()
+        with self.lock:
+            return {name: self.latest.get(name) for name in self.probes}
+
+    def latency_stats(self, name: str) -> Dict[str, float]:
+        """Статистика задержек по истории проверки"""
+        with self.lock:
+            latencies = sorted(r.latency_ms for r in self.history.get(name, ()))
+        if not latencies:
+            return {"count": 0}
+        return {
+            "count": len(latencies),
+            "min": latencies[0],
+            "avg": sum(latencies) / len(latencies),
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max": latencies[-1],
+        }
+
+    def close(self):
+        """Остановить пул (незавершенные проверки отменяются)"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Heartbeat Board for Virtual Office
+Доска пульса агентов: отображаемый в память файл со слотом фиксированного размера на агента
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+MAGIC = b"VOHB"
+VERSION = 1
+SLOTS = 1024
+NAME_BYTES = 48
+LOCK_NAME = ".claim.lock"
+STALE_LOCK_SECONDS = 30
+
+HEADER = struct.Struct("<4sBxxxII")     # magic, version, slots, generation (bumped on claims/status changes)
+HEADER_SIZE = 64
+# seq (odd while the owner writes), status code, pid, last seen (unix time), name, seq again
+SLOT = struct.Struct(f"<QBxxxId{NAME_BYTES}sQ")
+SEQ = struct.Struct("<Q")
+BODY = struct.Struct(f"<BxxxId{NAME_BYTES}s")   # slot fields between the two seq copies
+SEQ_END = SEQ.size + BODY.size
+FILE_SIZE = HEADER_SIZE + SLOTS * SLOT.size
+
+STATUSES = ("unknown", "active", "online", "busy", "idle", "away", "offline", "stopped")
+
+
+class Heartbeat(NamedTuple):
+    """Последний пульс агента"""
+    agent: str
+    status: str
+    last_seen: float
+    seq: int
+    pid: int
+
+    @property
+    def last_seen_at(self) -> datetime:
+        return datetime.fromtimestamp(self.last_seen)
+
+
+def status_code(status: str) -> int:
+    try:
+        return STATUSES.index(status)
+    except ValueError:
+        return 0
+
+
+class HeartbeatBoard:
+    """Слоты фиксированного размера в одном mmap-файле, по слоту на экземпляр агента
+
+    Писатель меняет только свой слот: seq в конце слота становится нечетным, поля
+    записываются, затем новый четный seq пишется в начало слота и последним - в конец.
+    Читатель копирует слот от начала к концу, поэтому копия, задевшая запись, видит
+    разные seq. Вся доска копируется одним срезом, берутся слоты с совпадающими
+    четными seq, остальные перечитываются;
+    JSON не разбирается. Слот закрепляется за именем один раз (под файловой
+    блокировкой), дальше пульс - несколько записей в память без блокировок.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.slots: Dict[str, int] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0))
+        try:
+            if os.fstat(fd).st_size != FILE_SIZE:
+                self._initialize(fd)
+            self.map = mmap.mmap(fd, FILE_SIZE)
+        finally:
+            os.close(fd)
+        magic, version, slots, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or slots != SLOTS:
+            print(f"⚠️ Доска пульса {self.path.name} другого формата, слоты очищены")
+            self.map[:] = bytes(FILE_SIZE)
+            HEADER.pack_into(self.map, 0, MAGIC, VERSION, SLOTS, 0)
+
+    def _initialize(self, fd: int):
+        lock = self._acquire()
+        try:
+            # Another process may have created it while we waited
+            if os.fstat(fd).st_size != FILE_SIZE:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, FILE_SIZE)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, HEADER.pack(MAGIC, VERSION, SLOTS, 0))
+        finally:
+            self._release(lock)
+
+    def close(self):
+        with self.lock:
+            self.map.close()
+
+    # --- claims -------------------------------------------------------------
+
+    def _acquire(self) -> Optional[Path]:
+        lock = self.path.with_name(self.path.name + LOCK_NAME)
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return lock
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime > STALE_LOCK_SECONDS:
+                        lock.unlink()  # left by a crashed writer
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    return None  # a stuck holder must not stop heartbeats
+                time.sleep(0.01)
+
+    def _release(self, lock: Optional[Path]):
+        if lock is not None:
+            try:
+                lock.unlink()
+            except OSError:
+                pass
+
+    def _offset(self, index: int) -> int:
+        return HEADER_SIZE + index * SLOT.size
+
+    def _slot_name(self, index: int) -> bytes:
+        start = self._offset(index) + SLOT.size - 8 - NAME_BYTES
+        return self.map[start:start + NAME_BYTES].rstrip(b"\0")
+
+    def _bump_generation(self):
+        magic, version, slots, generation = HEADER.unpack_from(self.map, 0)
+        HEADER.pack_into(self.map, 0, magic, version, slots, (generation + 1) & 0xFFFFFFFF)
+
+    def _claim(self, agent: str) -> int:
+        """Слот агента: найти по имени или занять свободный (поиск свободного от crc32 имени)"""
+        name = agent.encode("utf-8")[:NAME_BYTES]
+        index = self.slots.get(agent)
+        if index is not None and self._slot_name(index) == name:
+            return index
+        if not name:
+            raise ValueError("empty agent name")
+        start = zlib.crc32(name) % SLOTS
+        lock = self._acquire()
+        try:
+            # Claimed by another writer (e.g. metrics-updater.ps1 takes the first free slot)
+            names = [slot[4].rstrip(b"\0") for slot in SLOT.iter_unpack(self.map[HEADER_SIZE:FILE_SIZE])]
+            if name in names:
+                self.slots[agent] = names.index(name)
+                return self.slots[agent]
+            for probe in range(SLOTS):
+                index = (start + probe) % SLOTS
+                current = self._slot_name(index)
+                if current == name:
+                    break
+                if not current:
+                    SLOT.pack_into(self.map, self._offset(index), 0, 0, 0, 0.0, name, 0)
+                    self._bump_generation()
+                    break
+            else:
+                raise RuntimeError(f"heartbeat board {self.path} is full ({SLOTS} slots)")
+        finally:
+            self._release(lock)
+        self.slots[agent] = index
+        return index
+
+    # --- writers ------------------------------------------------------------
+
+    def _write(self, index: int, code: int, pid: int, last_seen: float):
+        offset = self._offset(index)
+        seq, old_code, _, _, name, _ = SLOT.unpack_from(self.map, offset)
+        seq |= 1
+        # Readers copy front to back: odd end first, start last, so a copy that
+        # overlaps this write always sees seq != seq_end
+        SEQ.pack_into(self.map, offset + SEQ_END, seq)
+        BODY.pack_into(self.map, offset + SEQ.size, code, pid, last_seen, name)
+        SEQ.pack_into(self.map, offset, seq + 1)
+        SEQ.pack_into(self.map, offset + SEQ_END, seq + 1)
+        if code != old_code:
+            self._bump_generation()
+
+    def beat(self, agent: str, status: str = "active", now: Optional[float] = None):
+        """Пульс агента: статус и время в его слот"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self._write(self._claim(agent), status_code(status), os.getpid(), now)
+
+    def stop(self, agent: str):
+        """Отметить агента остановленным (слот остается за именем)"""
+        with self.lock:
+            index = self._claim(agent)
+            _, _, pid, last_seen, _, _ = SLOT.unpack_from(self.map, self._offset(index))
+            self._write(index, status_code("stopped"), pid, last_seen)
+
+    # --- readers ------------------------------------------------------------
+
+    @property
+    def generation(self) -> int:
+        """Меняется при занятии слота и смене статуса (не на каждый пульс)"""
+        return HEADER.unpack_from(self.map, 0)[3]
+
+    def read_all(self) -> Dict[str, Heartbeat]:
+        """Все занятые слоты {агент: Heartbeat}: одна копия доски, без разбора JSON"""
+        data = self.map[HEADER_SIZE:FILE_SIZE]
+        beats = {}
+        for index, slot in enumerate(SLOT.iter_unpack(data)):
+            seq, code, pid, last_seen, name, seq_end = slot
+            if not name.strip(b"\0"):
+                continue
+            if seq != seq_end or seq & 1:
+                # Caught mid-write: re-read just this slot
+                for _ in range(100):
+                    seq, code, pid, last_seen, name, seq_end = SLOT.unpack_from(self.map, self._offset(index))
+                    if seq == seq_end and not seq & 1:
+                        break
+                else:
+                    continue
+            if not seq:
+                continue  # claimed, no beat yet
+            agent = name.rstrip(b"\0").decode("utf-8", "replace")
+            status = STATUSES[code] if code < len(STATUSES) else "unknown"
+            beats[agent] = Heartbeat(agent, status, last_seen, seq // 2, pid)
+        return beats
+
+
+_boards: Dict[str, HeartbeatBoard] = {}
+_boards_lock = threading.Lock()
+
+
+def get_heartbeat_board(path: Path) -> HeartbeatBoard:
+    """Общая на процесс доска пульса"""
+    key = os.path.abspath(path)
+    with _boards_lock:
+        board = _boards.get(key)
+        if board is None:
+            board = _boards[key] = HeartbeatBoard(Path(path))
+        return board
+
+
+def main():
+    path = Path(r"C:\www.spa.com\.ai-team") / "system" / "heartbeat.board"
+    args = sys.argv[1:]
+    board = get_heartbeat_board(path)
+
+    if len(args) >= 2 and args[0] == "beat":
+        board.beat(args[1], args[2] if len(args) > 2 else "active")
+
+    elif args and args[0] == "show":
+        now = time.time()
+        for agent, beat in sorted(board.read_all().items()):
+            print(f"{agent:<20} {beat.status:<8} {now - beat.last_seen:>8.1f}s ago  seq {beat.seq}  pid {beat.pid}")
+
+    else:
+        print("Usage:")
+        print("  python heartbeat.py beat <agent> [status] - Record a heartbeat")
+        print("  python heartbeat.py show                  - Print all agents' last heartbeat")
+
+
+if __name__ == "__main__":
+    main()
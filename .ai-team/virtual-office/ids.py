@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ID Generator for Virtual Office
+Уникальные, сортируемые по времени идентификаторы задач и сообщений (в стиле ULID)
+"""
+
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+# Crockford base32: no I, L, O, U; sorts the same as the numbers it encodes
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+TIME_CHARS = 10       # 48-bit millisecond timestamp
+NODE_BITS = 32        # per-process component
+SEQ_BITS = 48         # monotonic counter within a millisecond
+ID_CHARS = 26         # 130 bits: 48 time + 32 node + 48 seq (+2 leading zero bits)
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def _decode(text: str) -> int:
+    value = 0
+    for char in text.upper():
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+class IdGenerator:
+    """Генератор идентификаторов PREFIX-<26 символов>
+
+    Первые 10 символов - время в миллисекундах, поэтому строковый порядок совпадает
+    с порядком создания. Компонент узла случаен для каждого процесса (пересоздается
+    после fork), счетчик внутри миллисекунды монотонен - повторов нет ни в одном
+    процессе, ни между процессами. Если часы пошли назад, используется последнее время.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.node = 0
+        self.last_ms = 0
+        self.seq = 0
+
+    def _reseed(self):
+        self.pid = os.getpid()
+        self.node = int.from_bytes(os.urandom(4), "big")
+        self.last_ms = 0
+
+    def next(self, prefix: str = "") -> str:
+        """Новый идентификатор (prefix отделяется дефисом)"""
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reseed()
+
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self.last_ms:
+                self.last_ms = now_ms
+                # Random start leaves room for ~2^47 ids in the same millisecond
+                self.seq = random.getrandbits(SEQ_BITS - 1)
+            else:
+                self.seq += 1
+                if self.seq >> SEQ_BITS:
+                    self.last_ms += 1
+                    self.seq = 0
+
+            value = (self.node << SEQ_BITS) | self.seq
+            ulid = _encode(self.last_ms, TIME_CHARS) + _encode(value, ID_CHARS - TIME_CHARS)
+        return f"{prefix}-{ulid}" if prefix else ulid
+
+
+_generator = IdGenerator()
+
+
+def new_id(prefix: str = "") -> str:
+    """Идентификатор из общего на процесс генератора: new_id("MSG") -> MSG-01J..."""
+    return _generator.next(prefix)
+
+
+def id_time(record_id: str) -> datetime:
+    """Время создания, закодированное в идентификаторе"""
+    ulid = record_id.rpartition("-")[2]
+    return datetime.fromtimestamp(_decode(ulid[:TIME_CHARS]) / 1000)
+
+
+def lower_bound(prefix: str, since: datetime) -> str:
+    """Наименьший возможный идентификатор с временем >= since (для сравнения строк)"""
+    ulid = _encode(int(since.timestamp() * 1000), TIME_CHARS) + "0" * (ID_CHARS - TIME_CHARS)
+    return f"{prefix}-{ulid}" if prefix else ulid
+
+
+def is_new_id(record_id: str, prefix: str = "") -> bool:
+    """Идентификатор в формате генератора (старые MSG-YYYYmmddHHMMSS и т.п. - нет)"""
+    head, _, ulid = record_id.rpartition("-")
+    return head == prefix and len(ulid) == ID_CHARS and all(c in ALPHABET for c in ulid)
+
+
+def ulid_part(record_id: str) -> Optional[str]:
+    """Часть идентификатора с временем и счетчиком (без префикса), None - старый формат"""
+    ulid = record_id.rpartition("-")[2]
+    if len(ulid) == ID_CHARS and all(c in ALPHABET for c in ulid):
+        return ulid
+    return None
+
+
+def scan_since(directory: Path, prefix: str, since: Optional[datetime] = None,
+               suffix: str = ".json") -> List[str]:
+    """Идентификаторы файлов каталога новее since в порядке создания
+
+    Только имена из каталога: без stat и без чтения файлов. Файлы со старыми
+    идентификаторами пропускаются.
+    """
+    bound = lower_bound(prefix, since) if since is not None else ""
+    ids = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(suffix):
+                    continue
+                record_id = entry.name[:-len(suffix)]
+                if record_id >= bound and is_new_id(record_id, prefix):
+                    ids.append(record_id)
+    except OSError:
+        return []
+    ids.sort()
+    return ids
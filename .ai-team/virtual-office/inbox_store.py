@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inbox Store for Virtual Office
+Индекс inbox агентов с материализованными счетчиками total/unread
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from codec import decode, encode
+from ids import lower_bound, ulid_part
+from office_writer import atomic_write
+from task_store import DIR_SETTLE_NS, connect
+
+# Messages older than this are assumed indexed: a newer one may still sit in the
+# group-commit queue or come from another machine with a slightly slow clock
+CURSOR_LAG_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inbox_messages (
+    agent     TEXT NOT NULL,
+    msg_id    TEXT NOT NULL,
+    status    TEXT,
+    timestamp TEXT,
+    mtime_ns  INTEGER,
+    size      INTEGER,
+    PRIMARY KEY (agent, msg_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_inbox_unread    ON inbox_messages(agent, status, timestamp);
+CREATE INDEX IF NOT EXISTS idx_inbox_timestamp ON inbox_messages(agent, timestamp);
+
+-- Materialized per-agent counters
+CREATE TABLE IF NOT EXISTS inbox_counts (
+    agent  TEXT PRIMARY KEY,
+    total  INTEGER NOT NULL,
+    unread INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_inbox_counts_insert AFTER INSERT ON inbox_messages BEGIN
+    INSERT INTO inbox_counts VALUES (NEW.agent, 1, NEW.status IS 'unread')
+    ON CONFLICT(agent) DO UPDATE SET total = total + 1, unread = unread + (NEW.status IS 'unread');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_inbox_counts_delete AFTER DELETE ON inbox_messages BEGIN
+    UPDATE inbox_counts SET total = total - 1, unread = unread - (OLD.status IS 'unread')
+    WHERE agent = OLD.agent;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_inbox_counts_update AFTER UPDATE OF status ON inbox_messages BEGIN
+    UPDATE inbox_counts SET unread = unread - (OLD.status IS 'unread') + (NEW.status IS 'unread')
+    WHERE agent = NEW.agent;
+END;
+"""
+
+
+class ReadCursor:
+    """Состояние прочтения inbox агента: файл inbox/<agent>.read_cursor рядом с каталогом
+
+    Все сообщения с новыми идентификаторами (ids.new_id) не новее cursor прочитаны;
+    прочитанные сообщения выше курсора и сообщения со старыми именами хранятся в
+    множестве read. Курсор сдвигается только по непрерывному префиксу прочитанных
+    и не ближе CURSOR_LAG_SECONDS к текущему времени (см. advance). Статус в файле
+    сообщения InboxStore тоже обновляет (его читают PowerShell-скрипты), но заменой
+    файла, поэтому разосланное жесткими ссылками сообщение у каждого агента
+    читается отдельно.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.signature = None
+        self.cursor = ""
+        self.read: Set[str] = set()
+
+    def refresh(self):
+        """Перечитать файл, если его изменил другой процесс (один stat)"""
+        try:
+            st = self.path.stat()
+        except OSError:
+            self.signature, self.cursor, self.read = None, "", set()
+            return
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature == self.signature:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                state = decode(f.read())
+        except (OSError, ValueError):
+            return
+        self.signature = signature
+        self.cursor = state.get("cursor", "")
+        self.read = set(state.get("read", []))
+
+    def save(self):
+        atomic_write(self.path, encode({"cursor": self.cursor, "read": sorted(self.read)}))
+        st = self.path.stat()
+        self.signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def is_read(self, msg_id: str) -> bool:
+        ulid = ulid_part(msg_id)
+        return (ulid is not None and ulid <= self.cursor) or msg_id in self.read
+
+    def advance(self, msg_ids: List[str], oldest_unread: Optional[str] = None,
+                now: Optional[datetime] = None):
+        """Отметить сообщения прочитанными и перенести в курсор то, что можно
+
+        Курсор встает на самое новое прочитанное сообщение, которое старше
+        oldest_unread (ULID самого старого непрочитанного в индексе) и старше
+        CURSOR_LAG_SECONDS: сообщение, которое появится в индексе позже, не
+        окажется под курсором непрочитанным.
+        """
+        self.read.update(msg_ids)
+        bound = lower_bound("", (now or datetime.now()) - timedelta(seconds=CURSOR_LAG_SECONDS))
+        covered = [ulid for ulid in map(ulid_part, self.read)
+                   if ulid is not None and ulid < bound and (oldest_unread is None or ulid < oldest_unread)]
+        if covered:
+            self.cursor = max(self.cursor, max(covered))
+        # Entries now covered by the cursor are redundant
+        self.read = {msg_id for msg_id in self.read if (ulid_part(msg_id) or "~") > self.cursor}
+        self.save()
+
+
+class InboxStore:
+    """Индекс сообщений inbox/<agent>/*.json и сводка total/unread, обновляемая на запись"""
+
+    def __init__(self, db_path: Path, inbox_dir: Path, agents: List[str]):
+        self.db_path = Path(db_path)
+        self.inbox_dir = Path(inbox_dir)
+        self.agents = list(agents)
+
+        self.lock = threading.RLock()
+        self.cursors: Dict[str, ReadCursor] = {}
+        self.dir_marks: Dict[str, int] = {}  # agent -> inbox directory mtime at the last full listing
+        self.conn = connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        """Закрыть соединение с базой"""
+        with self.lock:
+            self.conn.close()
+
+    def cursor(self, agent: str) -> ReadCursor:
+        """Курсор прочтения агента (перечитывается, если файл изменился)"""
+        with self.lock:
+            cursor = self.cursors.get(agent)
+            if cursor is None:
+                cursor = self.cursors[agent] = ReadCursor(self.inbox_dir / f"{agent}.read_cursor")
+            cursor.refresh()
+            return cursor
+
+    def _upsert(self, agent: str, msg_id: str, msg, mtime_ns: int, size: int, cursor: ReadCursor):
+        status = msg.get("status") if isinstance(msg, dict) else None
+        if status == "unread" and cursor.is_read(msg_id):
+            status = "read"
+        timestamp = msg.get("timestamp") if isinstance(msg, dict) else None
+        self.conn.execute(
+            "INSERT INTO inbox_messages (agent, msg_id, status, timestamp, mtime_ns, size)"
+            " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(agent, msg_id) DO UPDATE SET"
+            " status = excluded.status, timestamp = excluded.timestamp,"
+            " mtime_ns = excluded.mtime_ns, size = excluded.size",
+            (agent, msg_id, status, timestamp, mtime_ns, size)
+        )
+
+    def put(self, agent: str, msg: Dict, msg_file: Path):
+        """Записать сообщение в индекс сразу после сохранения файла"""
+        msg_file = Path(msg_file)
+        try:
+            st = msg_file.stat()
+            mtime_ns, size = st.st_mtime_ns, st.st_size
+        except OSError:
+            mtime_ns, size = 0, 0
+
+        with self.lock:
+            self._upsert(agent, msg_file.stem, msg, mtime_ns, size, self.cursor(agent))
+            self.conn.commit()
+
+    def put_many(self, msg: Dict, delivered: List[Tuple[str, Path]]):
+        """Записать одно сообщение, разосланное нескольким агентам, одной транзакцией"""
+        with self.lock:
+            for agent, msg_file in delivered:
+                try:
+                    st = Path(msg_file).stat()
+                    mtime_ns, size = st.st_mtime_ns, st.st_size
+                except OSError:
+                    mtime_ns, size = 0, 0
+                self._upsert(agent, Path(msg_file).stem, msg, mtime_ns, size, self.cursor(agent))
+            self.conn.commit()
+
+    def set_status(self, agent: str, msg_id: str, status: str, msg_file: Optional[Path] = None) -> bool:
+        """Сменить статус сообщения (например unread -> read), False - сообщение не в индексе"""
+        mtime_ns, size = None, None
+        if msg_file is not None:
+            try:
+                st = Path(msg_file).stat()
+                mtime_ns, size = st.st_mtime_ns, st.st_size
+            except OSError:
+                pass
+
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE inbox_messages SET status = ?, mtime_ns = IFNULL(?, mtime_ns), size = IFNULL(?, size)"
+                " WHERE agent = ? AND msg_id = ?",
+                (status, mtime_ns, size, agent, msg_id)
+            )
+            self.conn.commit()
+            return cur.rowcount > 0
+
+    def _oldest_unread(self, agent: str) -> Optional[str]:
+        ulids = [ulid for ulid in (ulid_part(row["msg_id"]) for row in self.conn.execute(
+            "SELECT msg_id FROM inbox_messages WHERE agent = ? AND status = 'unread'", (agent,)
+        )) if ulid is not None]
+        return min(ulids) if ulids else None
+
+    def _write_status(self, agent: str, msg_id: str, status: str):
+        """Записать статус в файл сообщения (Check-Inbox и Monitor-Inboxes читают его оттуда)
+
+        Файл заменяется целиком: копия рассылки - жесткая ссылка на общий файл, и замена
+        отвязывает от него только этого агента. Коммит - за вызывающим.
+        """
+        msg_file = self.inbox_dir / agent / f"{msg_id}.json"
+        try:
+            with open(msg_file, 'rb') as f:
+                msg = decode(f.read())
+            if not isinstance(msg, dict) or msg.get("status") == status:
+                return
+            msg["status"] = status
+            atomic_write(msg_file, encode(msg))
+            st = msg_file.stat()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Статус {agent}/{msg_id} не записан в файл: {e}")
+            return
+        # Our own rewrite must not look like an outside change on the next sync
+        self.conn.execute(
+            "UPDATE inbox_messages SET mtime_ns = ?, size = ? WHERE agent = ? AND msg_id = ?",
+            (st.st_mtime_ns, st.st_size, agent, msg_id)
+        )
+
+    def mark_read(self, agent: str, msg_id: str) -> bool:
+        """Отметить сообщение прочитанным (курсор агента и файл сообщения), False - сообщения
+        нет в индексе (тогда ничего не меняется)"""
+        self.sync(agent)
+        with self.lock:
+            if not self.set_status(agent, msg_id, "read"):
+                return False
+            cursor = self.cursor(agent)
+            if not cursor.is_read(msg_id):
+                cursor.advance([msg_id], self._oldest_unread(agent))
+            self._write_status(agent, msg_id, "read")
+            self.conn.commit()
+            return True
+
+    def mark_all_read(self, agent: str) -> int:
+        """Отметить все сообщения агента прочитанными: O(непрочитанных), сдвигает курсор"""
+        self.sync(agent)
+        with self.lock:
+            unread = [
+                row["msg_id"] for row in self.conn.execute(
+                    "SELECT msg_id FROM inbox_messages WHERE agent = ? AND status = 'unread'", (agent,)
+                )
+            ]
+            if not unread:
+                return 0
+            self.conn.execute(
+                "UPDATE inbox_messages SET status = 'read' WHERE agent = ? AND status = 'unread'", (agent,)
+            )
+            self.conn.commit()
+            self.cursor(agent).advance(unread)
+            for msg_id in unread:
+                self._write_status(agent, msg_id, "read")
+            self.conn.commit()
+            return len(unread)
+
+    def next_unread(self, agent: str) -> Optional[str]:
+        """Самое старое непрочитанное сообщение агента (по индексу, без обхода каталога)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT msg_id FROM inbox_messages WHERE agent = ? AND status = 'unread'"
+                " ORDER BY timestamp, msg_id LIMIT 1", (agent,)
+            ).fetchone()
+        return row["msg_id"] if row is not None else None
+
+    def unread_count(self, agent: str) -> int:
+        """Число непрочитанных из материализованного счетчика"""
+        with self.lock:
+            row = self.conn.execute("SELECT unread FROM inbox_counts WHERE agent = ?", (agent,)).fetchone()
+        return row["unread"] if row is not None else 0
+
+    def latest_timestamp(self, agent: str) -> Optional[str]:
+        """Время самого нового сообщения агента"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MAX(timestamp) AS ts FROM inbox_messages WHERE agent = ?", (agent,)
+            ).fetchone()
+        return row["ts"]
+
+    def get(self, agent: str, msg_id: str) -> Optional[Dict]:
+        """Индексная запись сообщения: status, timestamp"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, timestamp FROM inbox_messages WHERE agent = ? AND msg_id = ?",
+                (agent, msg_id)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def sync(self, agent: Optional[str] = None, force: bool = False) -> int:
+        """Синхронизировать индекс с файлами inbox (перечитываются файлы с новыми mtime/size)"""
+        reparsed = 0
+        for name in ([agent] if agent else self.agents):
+            reparsed += self._sync_agent(name, force)
+        return reparsed
+
+    def _sync_agent(self, agent: str, force: bool) -> int:
+        # The directory is listed only when its mtime moved (a message was added, removed
+        # or replaced by rename); files are stat'ed only if new or still unread, since
+        # only those get rewritten in place (Out-File over inbox\<agent>\<id>.json).
+        # Read history is not touched, so a large inbox syncs as fast as an empty one.
+        inbox_path = self.inbox_dir / agent
+        try:
+            dir_mtime = inbox_path.stat().st_mtime_ns
+        except OSError:
+            dir_mtime = None
+
+        with self.lock:
+            known = {
+                r["msg_id"]: (r["status"], (r["mtime_ns"], r["size"]))
+                for r in self.conn.execute(
+                    "SELECT msg_id, status, mtime_ns, size FROM inbox_messages WHERE agent = ?", (agent,)
+                )
+            }
+            listed = force or self.dir_marks.get(agent) != dir_mtime
+
+        # Directory scan and parsing run without the lock, so agents can be synced in parallel
+        names = set(known)
+        if listed:
+            names = set()
+            if dir_mtime is not None:
+                with os.scandir(inbox_path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".json") and entry.is_file():
+                            names.add(entry.name[:-5])
+
+        changed = []
+        for msg_id in names:
+            status, signature = known.get(msg_id, (None, None))
+            if not force and signature is not None and status != "unread":
+                continue
+            try:
+                st = os.stat(inbox_path / f"{msg_id}.json")
+            except OSError:
+                continue
+            if not force and signature == (st.st_mtime_ns, st.st_size):
+                continue
+            try:
+                with open(inbox_path / f"{msg_id}.json", 'rb') as f:
+                    msg = decode(f.read())
+            except (OSError, ValueError):
+                # Half-written message - retry on next sync
+                continue
+            changed.append((msg_id, msg, (st.st_mtime_ns, st.st_size)))
+
+        with self.lock:
+            cursor = self.cursor(agent)
+            for msg_id, msg, signature in changed:
+                self._upsert(agent, msg_id, msg, *signature, cursor)
+
+            removed = [(agent, msg_id) for msg_id in known if msg_id not in names]
+            if removed:
+                self.conn.executemany(
+                    "DELETE FROM inbox_messages WHERE agent = ? AND msg_id = ?", removed
+                )
+            self.conn.commit()
+
+            # A directory changed within the last mtime tick may change again unseen
+            if listed and dir_mtime is not None and time.time_ns() - dir_mtime > DIR_SETTLE_NS:
+                self.dir_marks[agent] = dir_mtime
+            elif listed:
+                self.dir_marks.pop(agent, None)
+            return len(changed)
+
+    def rebuild(self) -> int:
+        """Пересобрать индекс и счетчики inbox с нуля из файлов"""
+        with self.lock:
+            self.conn.execute("DELETE FROM inbox_messages")
+            reparsed = self.sync(force=True)
+
+            self.conn.execute("DELETE FROM inbox_counts")
+            self.conn.execute(
+                "INSERT INTO inbox_counts SELECT agent, COUNT(*), SUM(status IS 'unread')"
+                " FROM inbox_messages GROUP BY agent"
+            )
+            self.conn.commit()
+            return reparsed
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Сводка {agent: {total, unread}} из материализованных счетчиков"""
+        summary = {agent: {"total": 0, "unread": 0} for agent in self.agents}
+        with self.lock:
+            for row in self.conn.execute("SELECT agent, total, unread FROM inbox_counts"):
+                if row["agent"] in summary:
+                    summary[row["agent"]] = {"total": row["total"], "unread": row["unread"]}
+        return summary
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Log Follower for Virtual Office
+Чтение только дописанных байт файла (tail -F) с контрольной точкой смещения
+"""
+
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+LINE_ENTRY = re.compile(r"^\[\d{2}:\d{2}\] ")
+
+
+class Checkpoint(NamedTuple):
+    """Позиция чтения: идентичность файла (dev, inode) и смещение в байтах"""
+    dev: int
+    ino: int
+    offset: int
+
+
+class FileFollower:
+    """Следит за файлом, возвращая только новые полные строки
+
+    Один stat за вызов poll(), если файл не рос. Подмена файла (другой inode) -
+    чтение нового файла с начала; усечение (размер меньше смещения) - тоже с начала.
+    """
+
+    def __init__(self, path: Path, from_end: bool = True):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.checkpoint: Optional[Checkpoint] = None
+        if from_end:
+            try:
+                st = self.path.stat()
+                self.checkpoint = Checkpoint(st.st_dev, st.st_ino, st.st_size)
+            except OSError:
+                pass
+
+    def poll(self) -> str:
+        """Новые полные строки с момента прошлого вызова ('' - ничего нового)"""
+        with self.lock:
+            try:
+                st = self.path.stat()
+            except OSError:
+                return ""
+
+            cp = self.checkpoint
+            if cp is None or (cp.dev, cp.ino) != (st.st_dev, st.st_ino) or st.st_size < cp.offset:
+                # First read, rotated or truncated file
+                cp = Checkpoint(st.st_dev, st.st_ino, 0)
+            if st.st_size == cp.offset:
+                self.checkpoint = cp
+                return ""
+
+            with open(self.path, 'rb') as f:
+                f.seek(cp.offset)
+                data = f.read(st.st_size - cp.offset)
+
+            # Keep an unfinished last line for the next poll
+            end = data.rfind(b"\n") + 1
+            self.checkpoint = Checkpoint(cp.dev, cp.ino, cp.offset + end)
+            return data[:end].decode("utf-8-sig", errors="replace")
+
+
+class MarkdownChatFollower:
+    """Разбор дописанных записей chat.md / agent-chat.md
+
+    Записи - секции '### заголовок ... ---' или строки '[HH:MM] текст'.
+    Секция без завершающего '---' ждет следующего заголовка.
+    """
+
+    def __init__(self, path: Path, from_end: bool = True):
+        self.follower = FileFollower(path, from_end)
+        self.lock = threading.Lock()
+        self.pending: Optional[List[str]] = None
+
+    @property
+    def checkpoint(self) -> Optional[Checkpoint]:
+        return self.follower.checkpoint
+
+    def _section(self, lines: List[str]) -> Dict:
+        return {
+            'header': lines[0][4:].strip(),
+            'content': '\n'.join(line for line in lines[1:] if line.strip() and line.strip() != '---'),
+            'raw': '\n'.join(lines)
+        }
+
+    def poll(self) -> List[Dict]:
+        """Новые записи: {'header', 'content', 'raw'}"""
+        with self.lock:
+            text = self.follower.poll()
+            if not text:
+                return []
+
+            entries = []
+            for line in text.split('\n')[:-1]:
+                line = line.rstrip('\r')
+                if line.startswith('### '):
+                    if self.pending:
+                        entries.append(self._section(self.pending))
+                    self.pending = [line]
+                elif self.pending is not None:
+                    self.pending.append(line)
+                    if line.strip() == '---':
+                        entries.append(self._section(self.pending))
+                        self.pending = None
+                elif LINE_ENTRY.match(line):
+                    entries.append({'header': line[:7], 'content': line[8:], 'raw': line})
+            return entries
@@ -5,13 +5,56 @@ Virtual Office Monitor
 Система мониторинга активности AI агентов
 """
 
-import json
-import os
+import asyncio
+import sys
+import threading
 import time
-import subprocess
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from counters import get_counter_store
+from doc_cache import get_document_cache
+from fs_watch import create_watcher
+from health_probes import HealthProber, TcpProbe
+from heartbeat import get_heartbeat_board
+from inbox_store import InboxStore
+from office_server import DEFAULT_HOST, DEFAULT_PORT, OfficeState, OfficeStateServer
+from office_writer import WriteError, get_writer
+from presence import PresenceEngine, PresenceEvent, PresenceLog
+from screen import ScreenRenderer
+from task_store import TaskStore
+from timeseries import TimeSeriesStore, metric_counters, sparkline
+
+class AgentSnapshot(NamedTuple):
+    """Состояние одного агента в кадре"""
+    name: str
+    status: str
+    inbox: int
+    outbox: int
+    tasks_assigned: int
+    last_message: Optional[str]
+    completed_per_hour: float
+    trend: str
+
+
+class OfficeFrame(NamedTuple):
+    """Неизменяемый снимок офиса: все данные одного кадра дашборда собраны за один проход"""
+    taken_at: datetime
+    presence: Mapping[str, str]
+    agents: Tuple[AgentSnapshot, ...]
+    metrics: Mapping
+    tasks_total: int
+    unread_total: int
+    snapshot_ms: float
+    files_parsed: int
+    transitions: Tuple[PresenceEvent, ...]
+    completed_hourly: Tuple[float, ...]
+    chat_latency: Mapping
+    doc_cache: Mapping
+    last_write_bytes: int
+
 
 class VirtualOfficeMonitor:
     """Мониторинг виртуального офиса"""
@@ -22,6 +65,39 @@ class VirtualOfficeMonitor:
         self.system_path = self.base_path / "system"
         self.metrics_file = self.system_path / "metrics.json"
         self.status_file = self.system_path / "status.json"
+        office_db = self.virtual_office / "system" / "office.db"
+        self.task_store = TaskStore(office_db, self.virtual_office / "tasks")
+        self.inbox_store = InboxStore(office_db, self.virtual_office / "inbox",
+                                      ["teamlead", "backend", "frontend", "qa", "devops"])
+
+        # Parsed JSON shared with CEOInterface/chat in the same process
+        self.doc_cache = get_document_cache()
+        self.writer = get_writer()
+
+        # Background service checks; the dashboard only reads cached results
+        self.health_prober = HealthProber([TcpProbe("chat_server", "localhost", 8082)], ttl=10)
+
+        # Agent heartbeats: one fixed slot per agent in a memory-mapped file
+        self.heartbeats = get_heartbeat_board(self.system_path / "heartbeat.board")
+
+        # online/idle/offline changes only on timers; transitions go to system/presence.log
+        self.presence = PresenceEngine(PresenceLog(self.system_path / "presence.log"))
+
+        # Counter increments from agents and CLIs, one append-only shard per writer
+        self.counters = get_counter_store(self.system_path / "counters")
+        self.last_compaction = 0.0
+
+        # Metric history (fixed-size ring files); the monitor is the sampler
+        self.timeseries = TimeSeriesStore(self.system_path / "timeseries")
+
+        # Differential terminal output: only changed cells are written, at most 4 frames/s
+        self.screen = ScreenRenderer(max_fps=4)
+
+        # Set to end watch() (serve mode runs it in a background thread)
+        self.stopping = threading.Event()
+
+        # Cached per-agent activity, recomputed only for agents whose files changed
+        self.agent_activity: Dict[str, Dict] = {}
 
         # Initialize metrics
         self.init_metrics()
@@ -46,43 +122,60 @@ class VirtualOfficeMonitor:
                 "last_updated": datetime.now().isoformat()
             }
             self.save_metrics(metrics)
+            try:
+                self.writer.flush()
+            except WriteError as e:
+                print(f"❌ Ошибка сохранения метрик: {e}")
 
     def save_metrics(self, metrics: Dict):
         """Сохранить метрики"""
         try:
             self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.metrics_file, 'w', encoding='utf-8') as f:
-                json.dump(metrics, f, indent=2, ensure_ascii=False)
+            self.writer.put_json(self.metrics_file, metrics)
         except Exception as e:
             print(f"❌ Ошибка сохранения метрик: {e}")
 
     def load_metrics(self) -> Dict:
-        """Загрузить метрики"""
+        """Загрузить метрики (metrics.json плюс шардированные счетчики)"""
+        metrics = {}
         try:
             if self.metrics_file.exists():
-                with open(self.metrics_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                metrics = self.doc_cache.load(self.metrics_file)
         except Exception as e:
             print(f"⚠️ Ошибка загрузки метрик: {e}")
-        return {}
+        try:
+            return self.counters.apply(metrics)
+        except Exception as e:
+            print(f"⚠️ Ошибка чтения счетчиков: {e}")
+            return metrics
+
+    def compact_counters(self, interval: float = 300):
+        """Свернуть шарды счетчиков не чаще раза в interval секунд"""
+        if time.monotonic() - self.last_compaction < interval:
+            return
+        self.last_compaction = time.monotonic()
+        try:
+            self.counters.compact()
+        except Exception as e:
+            print(f"⚠️ Ошибка сжатия счетчиков: {e}")
 
     def update_agent_status(self, agent: str, status: str):
-        """Обновить статус агента"""
-        statuses = {}
-        if self.status_file.exists():
-            with open(self.status_file, 'r', encoding='utf-8') as f:
-                statuses = json.load(f)
+        """Обновить статус агента (только его слот на доске пульса)"""
+        self.heartbeats.beat(agent, status)
 
-        if "agents" not in statuses:
-            statuses["agents"] = {}
-
-        statuses["agents"][agent] = {
-            "status": status,
-            "last_seen": datetime.now().isoformat()
-        }
-
-        with open(self.status_file, 'w', encoding='utf-8') as f:
-            json.dump(statuses, f, indent=2, ensure_ascii=False)
+    def last_seen(self) -> Dict[str, float]:
+        """Время последнего пульса агентов (unix time): доска пульса и старые записи status.json"""
+        seen = {}
+        # Writers that still rewrite status.json
+        if self.status_file.exists():
+            try:
+                for agent, info in self.doc_cache.load(self.status_file).get("agents", {}).items():
+                    seen[agent] = datetime.fromisoformat(info["last_seen"]).timestamp()
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"⚠️ Ошибка чтения status.json: {e}")
+        for agent, beat in self.heartbeats.read_all().items():
+            seen[agent] = max(seen.get(agent, 0.0), beat.last_seen)
+        return seen
 
     def get_agent_activity(self, agent: str) -> Dict:
         """Получить активность агента"""
@@ -93,37 +186,86 @@ class VirtualOfficeMonitor:
             "last_message": None
         }
 
-        # Check inbox
-        inbox_path = self.virtual_office / "inbox" / agent
-        if inbox_path.exists():
-            messages = list(inbox_path.glob("*.json"))
-            activity["inbox"] = len(messages)
-
-            # Get last message
-            if messages:
-                latest = max(messages, key=lambda p: p.stat().st_mtime)
-                with open(latest, 'r', encoding='utf-8') as f:
-                    msg = json.load(f)
-                    activity["last_message"] = msg.get("timestamp")
+        # Check inbox: counts and newest message come from the index (synced once per frame)
+        activity["inbox"] = self.inbox_store.summary().get(agent, {}).get("total", 0)
+        activity["last_message"] = self.inbox_store.latest_timestamp(agent)
 
         # Check outbox
         outbox_path = self.virtual_office / "outbox" / agent
         if outbox_path.exists():
             activity["outbox"] = len(list(outbox_path.glob("*.json")))
 
-        # Check assigned tasks
-        tasks_path = self.virtual_office / "tasks"
-        if tasks_path.exists():
-            for task_file in tasks_path.glob("*.json"):
-                with open(task_file, 'r', encoding='utf-8') as f:
-                    task = json.load(f)
-                    if task.get("assignee") == agent:
-                        activity["tasks_assigned"] += 1
+        # Check assigned tasks (index lookup, store is synced once per frame)
+        activity["tasks_assigned"] = self.task_store.count(assignee=agent)
 
         return activity
 
-    def get_system_health(self) -> Dict:
+    def take_snapshot(self, dirty_agents: Optional[Set[str]] = None, tasks_changed: bool = True) -> OfficeFrame:
+        """Собрать кадр: доска пульса, inbox/outbox, задачи и метрики читаются один раз
+
+        dirty_agents=None синхронизирует и пересчитывает всех агентов, иначе только
+        перечисленных; индекс задач синхронизируется только при tasks_changed.
+        """
+        started = time.perf_counter()
+        misses_before = self.doc_cache.stats()["misses"]
+        now = datetime.now()
+
+        self.presence.observe_all(self.last_seen(), now.timestamp())
+        presence = self.presence.presence()
+
+        if dirty_agents is None or tasks_changed:
+            self.task_store.sync()
+        for agent in (self.inbox_store.agents if dirty_agents is None else sorted(dirty_agents)):
+            self.inbox_store.sync(agent)
+        tasks_total = self.task_store.summary()["total"]
+        unread_total = sum(stats["unread"] for stats in self.inbox_store.summary().values())
+
+        # Counter deltas since the previous frame go into the history
+        metrics = self.load_metrics()
+        self.timeseries.record_counters(metric_counters(metrics), now.timestamp())
+
+        agents = []
+        for agent in ["teamlead", "backend", "frontend", "qa", "devops"]:
+            if dirty_agents is None or agent in dirty_agents or agent not in self.agent_activity:
+                self.agent_activity[agent] = self.get_agent_activity(agent)
+            elif tasks_changed:
+                self.agent_activity[agent]["tasks_assigned"] = self.task_store.count(assignee=agent)
+            activity = self.agent_activity[agent]
+            completed = self.timeseries.get("tasks_completed", agent)
+
+            agents.append(AgentSnapshot(
+                name=agent,
+                status=presence.get(agent, "offline"),
+                inbox=activity["inbox"],
+                outbox=activity["outbox"],
+                tasks_assigned=activity["tasks_assigned"],
+                last_message=activity["last_message"],
+                completed_per_hour=completed.total(3600, now.timestamp()),
+                trend=sparkline(completed.buckets("1h", 12, now.timestamp()))
+            ))
+
+        cache = self.doc_cache.stats()
+        return OfficeFrame(
+            taken_at=now,
+            presence=MappingProxyType(presence),
+            agents=tuple(agents),
+            metrics=MappingProxyType(metrics),
+            tasks_total=tasks_total,
+            unread_total=unread_total,
+            snapshot_ms=(time.perf_counter() - started) * 1000,
+            files_parsed=cache["misses"] - misses_before,
+            transitions=tuple(self.presence.recent[-3:]),
+            completed_hourly=tuple(self.timeseries.get("tasks_completed").buckets("1h", 24, now.timestamp())),
+            chat_latency=MappingProxyType(self.health_prober.latency_stats("chat_server")),
+            doc_cache=MappingProxyType(cache),
+            last_write_bytes=self.screen.last_bytes
+        )
+
+    def get_system_health(self, frame: Optional[OfficeFrame] = None) -> Dict:
         """Получить состояние системы"""
+        if frame is None:
+            frame = self.take_snapshot()
+
         health = {
             "status": "healthy",
             "issues": [],
@@ -131,28 +273,15 @@ class VirtualOfficeMonitor:
             "total_agents": 5
         }
 
-        # Check chat server
-        try:
-            response = subprocess.run(
-                ["powershell", "-Command", "Test-NetConnection -ComputerName localhost -Port 8082"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if "TcpTestSucceeded : True" not in response.stdout:
-                health["issues"].append("Chat server not responding on port 8082")
-                health["status"] = "degraded"
-        except:
-            health["issues"].append("Cannot check chat server status")
+        # Check chat server (cached probe result, never waits)
+        chat_server = self.health_prober.results()["chat_server"]
+        health["chat_server"] = chat_server
+        if chat_server is not None and not chat_server.ok:
+            health["issues"].append("Chat server not responding on port 8082")
+            health["status"] = "degraded"
 
         # Check agent status
-        if self.status_file.exists():
-            with open(self.status_file, 'r', encoding='utf-8') as f:
-                statuses = json.load(f)
-                for agent, info in statuses.get("agents", {}).items():
-                    last_seen = datetime.fromisoformat(info["last_seen"])
-                    if (datetime.now() - last_seen).seconds < 300:  # 5 minutes
-                        health["agents_online"] += 1
+        health["agents_online"] = sum(1 for status in frame.presence.values() if status == "online")
 
         if health["agents_online"] < 3:
             health["issues"].append(f"Only {health['agents_online']}/5 agents online")
@@ -160,96 +289,248 @@ class VirtualOfficeMonitor:
 
         return health
 
-    def display_dashboard(self):
-        """Отобразить дашборд"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+    def display_dashboard(self, dirty_agents: Optional[Set[str]] = None, tasks_changed: bool = True,
+                          show: Optional[Callable[[OfficeFrame, Dict], None]] = None):
+        """Отобразить дашборд (см. take_snapshot); show заменяет вывод в терминал"""
+        frame = self.take_snapshot(dirty_agents, tasks_changed)
+        health = self.get_system_health(frame)
+        (show or self.render)(frame, health)
+
+    def state_document(self, frame: OfficeFrame, health: Dict) -> Dict:
+        """Кадр для зрителей serve-режима (JSON); без времени кадра и задержек проб,
+        чтобы неизменившийся офис давал тот же документ и тот же ETag"""
+        chat_server = health.get("chat_server")
+        return {
+            "status": health["status"],
+            "issues": list(health["issues"]),
+            "agents_online": health["agents_online"],
+            "total_agents": health["total_agents"],
+            "chat_server": None if chat_server is None else {"ok": chat_server.ok, "detail": chat_server.detail},
+            "tasks_total": frame.tasks_total,
+            "unread_total": frame.unread_total,
+            "agents": [{
+                "name": agent.name,
+                "status": agent.status,
+                "inbox": agent.inbox,
+                "outbox": agent.outbox,
+                "tasks_assigned": agent.tasks_assigned,
+                "last_message": agent.last_message,
+                "completed_per_hour": agent.completed_per_hour,
+            } for agent in frame.agents],
+            "totals": dict(frame.metrics.get("totals", {})),
+            "transitions": [event._asdict() for event in frame.transitions],
+        }
+
+    def render(self, frame: OfficeFrame, health: Dict):
+        """Вывести кадр; читает только frame и health, без обращения к диску и хранилищам
 
-        print("=" * 80)
-        print(" " * 25 + "🏢 VIRTUAL OFFICE MONITOR")
-        print("=" * 80)
-        print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print()
+        Строки кадра уходят в ScreenRenderer: в терминал пишутся только
+        изменившиеся ячейки, экран не очищается.
+        """
+        started = time.perf_counter()
+        lines: List[str] = []
+        out = lines.append
+
+        out("=" * 80)
+        out(" " * 25 + "🏢 VIRTUAL OFFICE MONITOR")
+        out("=" * 80)
+        out(f"Time: {frame.taken_at.strftime('%Y-%m-%d %H:%M:%S')}")
+        out(f"Tasks: {frame.tasks_total}  |  Unread messages: {frame.unread_total}")
+        out("")
 
         # System health
-        health = self.get_system_health()
         health_icon = "🟢" if health["status"] == "healthy" else "🟡" if health["status"] == "degraded" else "🔴"
-        print(f"{health_icon} System Status: {health['status'].upper()}")
-        print(f"   Agents Online: {health['agents_online']}/{health['total_agents']}")
+        out(f"{health_icon} System Status: {health['status'].upper()}")
+        out(f"   Agents Online: {health['agents_online']}/{health['total_agents']}")
+        chat_server = health.get("chat_server")
+        if chat_server is None:
+            out("   Chat Server: checking...")
+        else:
+            latency = frame.chat_latency
+            out(f"   Chat Server: {'up' if chat_server.ok else 'down'} "
+                f"({chat_server.latency_ms:.1f} ms, avg {latency['avg']:.1f} ms over {latency['count']})")
         if health["issues"]:
-            print("   Issues:")
+            out("   Issues:")
             for issue in health["issues"]:
-                print(f"     ⚠️  {issue}")
-        print()
+                out(f"     ⚠️  {issue}")
+        out("")
 
         # Agents activity
-        print("👥 AGENTS ACTIVITY:")
-        print("-" * 80)
-        print(f"{'Agent':<12} {'Status':<10} {'Inbox':<8} {'Tasks':<8} {'Last Activity':<20}")
-        print("-" * 80)
-
-        agents = ["teamlead", "backend", "frontend", "qa", "devops"]
-        for agent in agents:
-            activity = self.get_agent_activity(agent)
-
-            # Get status
-            status = "offline"
-            status_icon = "⚫"
-            if self.status_file.exists():
-                with open(self.status_file, 'r', encoding='utf-8') as f:
-                    statuses = json.load(f)
-                    agent_info = statuses.get("agents", {}).get(agent, {})
-                    if agent_info:
-                        last_seen = datetime.fromisoformat(agent_info["last_seen"])
-                        if (datetime.now() - last_seen).seconds < 300:
-                            status = "online"
-                            status_icon = "🟢"
-                        elif (datetime.now() - last_seen).seconds < 900:
-                            status = "idle"
-                            status_icon = "🟡"
+        out("👥 AGENTS ACTIVITY:")
+        out("-" * 80)
+        out(f"{'Agent':<12} {'Status':<10} {'Inbox':<8} {'Tasks':<8} {'Done/h':<8} {'12h':<13} Last Activity")
+        out("-" * 80)
 
+        status_icons = {"online": "🟢", "idle": "🟡", "offline": "⚫"}
+        for agent in frame.agents:
             last_activity = ""
-            if activity["last_message"]:
+            if agent.last_message:
                 try:
-                    last_time = datetime.fromisoformat(activity["last_message"])
+                    last_time = datetime.fromisoformat(agent.last_message)
                     last_activity = last_time.strftime("%H:%M:%S")
                 except:
                     last_activity = "unknown"
 
-            print(f"{agent:<12} {status_icon} {status:<8} {activity['inbox']:<8} {activity['tasks_assigned']:<8} {last_activity:<20}")
+            # The status icon is two columns wide: icon, space and status fill the 10 of the header
+            out(f"{agent.name:<12} {status_icons[agent.status]} {agent.status:<7} {agent.inbox:<8} {agent.tasks_assigned:<8} "
+                f"{agent.completed_per_hour:<8g} {agent.trend:<13} {last_activity}")
+        for event in reversed(frame.transitions):
+            out(f"   ↳ {event.describe()}")
 
-        print()
+        out("")
 
         # Metrics summary
-        metrics = self.load_metrics()
-        if metrics:
-            print("📊 METRICS SUMMARY:")
-            print("-" * 80)
-            totals = metrics.get("totals", {})
-            print(f"Tasks Created: {totals.get('tasks_created', 0)}")
-            print(f"Tasks Completed: {totals.get('tasks_completed', 0)}")
-            print(f"Messages Sent: {totals.get('messages_sent', 0)}")
-            print(f"Reports Generated: {totals.get('reports_generated', 0)}")
-
-        print()
-        print("=" * 80)
-        print("Press Ctrl+C to exit...")
-
-    def run(self):
+        if frame.metrics:
+            out("📊 METRICS SUMMARY:")
+            out("-" * 80)
+            totals = frame.metrics.get("totals", {})
+            out(f"Tasks Created: {totals.get('tasks_created', 0)}")
+            out(f"Tasks Completed: {totals.get('tasks_completed', 0)}")
+            out(f"Messages Sent: {totals.get('messages_sent', 0)}")
+            out(f"Reports Generated: {totals.get('reports_generated', 0)}")
+            hourly = frame.completed_hourly
+            out(f"Completed last hour: {hourly[-1]:g}  24h: {sparkline(hourly)}")
+
+        cache = frame.doc_cache
+        render_ms = (time.perf_counter() - started) * 1000
+        out("")
+        out("=" * 80)
+        # Presence comes from one copy of the heartbeat board, no JSON
+        out(f"Frame: snapshot {frame.snapshot_ms:.1f} ms, render {render_ms:.1f} ms, "
+            f"{frame.files_parsed} parsed, {len(frame.presence)} heartbeats, wrote {frame.last_write_bytes} B")
+        out(f"Doc cache: {cache['hits']} hits / {cache['misses']} misses, {cache['entries']} docs")
+        out("Press Ctrl+C to exit...")
+        self.screen.render(lines)
+
+    def classify_changes(self, changed: Set[Path]) -> tuple:
+        """Разобрать измененные пути: (агенты с изменившимся inbox/outbox, изменились ли задачи)"""
+        agents = {"teamlead", "backend", "frontend", "qa", "devops"}
+        dirty_agents = set()
+        tasks_changed = False
+
+        for path in changed:
+            for box in ("inbox", "outbox"):
+                box_path = self.virtual_office / box
+                if path == box_path:
+                    dirty_agents |= agents
+                elif box_path in path.parents:
+                    # inbox/<agent>/... or the agent's read cursor inbox/<agent>.read_cursor
+                    agent = path.relative_to(box_path).parts[0].split(".")[0]
+                    if agent in agents:
+                        dirty_agents.add(agent)
+            tasks_path = self.virtual_office / "tasks"
+            if path == tasks_path or tasks_path in path.parents:
+                tasks_changed = True
+
+        return dirty_agents, tasks_changed
+
+    def watch(self, debounce: float = 0.05, idle_refresh: float = 60,
+              show: Optional[Callable[[OfficeFrame, Dict], None]] = None):
+        """Режим наблюдения: перерисовка только при изменении файлов офиса (до stopping)"""
+        watcher = create_watcher()
+        # Inbox messages and tasks are also rewritten in place (Out-File, older scripts),
+        # which leaves the directory mtime alone: watch the files themselves
+        watcher.watch_dir(self.virtual_office / "inbox", recursive=True, contents=True)
+        watcher.watch_dir(self.virtual_office / "outbox", recursive=True)
+        watcher.watch_dir(self.virtual_office / "tasks", contents=True)
+        watcher.watch_file(self.status_file)
+        watcher.watch_file(self.metrics_file)
+        # Counter shards are appended to while open: watch writes, not just closes
+        watcher.watch_dir(self.system_path / "counters", contents=True)
+
+        try:
+            self.display_dashboard(show=show)
+            last_redraw = time.monotonic()
+            probe_version = self.health_prober.version
+            board_generation = self.heartbeats.generation
+            while not self.stopping.is_set():
+                timeout = min(idle_refresh, self.health_prober.ttl)
+                pending = self.screen.due_in()
+                if pending is not None:
+                    timeout = min(timeout, pending)  # a frame held back by the frame budget
+                changed = watcher.wait_batch(timeout=timeout, debounce=debounce)
+                # Redraw on file changes, on probe state flips, on a new agent or status
+                # on the heartbeat board, on a presence transition (due timers fire in
+                # advance()), and on idle refresh (keeps the clock current)
+                if (not changed and self.health_prober.version == probe_version
+                        and self.heartbeats.generation == board_generation
+                        and not self.presence.advance()
+                        and time.monotonic() - last_redraw < idle_refresh):
+                    self.health_prober.refresh()
+                    self.screen.flush()
+                    continue
+                dirty_agents, tasks_changed = self.classify_changes(changed)
+                self.display_dashboard(dirty_agents, tasks_changed, show)
+                self.compact_counters()
+                last_redraw = time.monotonic()
+                probe_version = self.health_prober.version
+                board_generation = self.heartbeats.generation
+        finally:
+            watcher.close()
+
+    def run(self, watch: bool = True):
         """Запуск мониторинга"""
         print("Starting Virtual Office Monitor...")
         print("Press Ctrl+C to stop")
 
+        stopped = False
         try:
-            while True:
-                self.display_dashboard()
-                time.sleep(5)  # Update every 5 seconds
+            if watch:
+                self.watch()
+            else:
+                while True:
+                    self.display_dashboard()
+                    self.compact_counters()
+                    time.sleep(5)  # Update every 5 seconds
         except KeyboardInterrupt:
+            stopped = True
+        finally:
+            self.screen.close()
+            self.health_prober.close()
+            self.timeseries.close()
+        if stopped:
             print("\n👋 Monitor stopped")
 
+    def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """Режим сервиса: один сканер в фоне, состояние зрителям по HTTP
+
+        Сканер - тот же watch(), но кадр публикуется в OfficeState вместо
+        терминала; HTML-дашборды, окна монитора и /office читают /state или
+        /metrics и не сканируют файлы сами.
+        """
+        state = OfficeState()
+        scanner = threading.Thread(
+            target=self.watch, name="office-scanner", daemon=True,
+            kwargs={"show": lambda frame, health: state.publish(self.state_document(frame, health))})
+        server = OfficeStateServer(state, host, port)
+
+        print(f"🌐 Office state on http://{host}:{port}/state (JSON) and /metrics (Prometheus)")
+        print("Press Ctrl+C to stop")
+        scanner.start()
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            print(f"\n👋 Server stopped ({server.requests} requests, {server.not_modified} not modified)")
+        except OSError as e:
+            print(f"❌ Не удалось открыть порт {port}: {e}")
+        finally:
+            self.stopping.set()
+            scanner.join(timeout=2)  # daemon: a scan in progress does not hold up the exit
+            self.health_prober.close()
+            if not scanner.is_alive():
+                self.timeseries.close()
+
 def main():
     """Главная функция"""
     monitor = VirtualOfficeMonitor()
-    monitor.run()
+    args = sys.argv[1:]
+    if args and args[0] == "serve":
+        # serve [--port N]: headless scanner with the HTTP state endpoint
+        port = int(args[args.index("--port") + 1]) if "--port" in args[:-1] else DEFAULT_PORT
+        monitor.serve(port=port)
+    else:
+        # --poll: old behaviour, full redraw every 5 seconds
+        monitor.run(watch="--poll" not in args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Office State Server for Virtual Office
+Состояние офиса из одного сканера для любого числа зрителей: JSON и Prometheus по HTTP на localhost
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from codec import decode, encode
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8090
+KEEPALIVE_SECONDS = 30
+MAX_REQUEST_BYTES = 16 * 1024
+
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+JSON_TYPE = "application/json; charset=utf-8"
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def prometheus_text(document: Dict) -> str:
+    """Документ состояния в текстовом формате Prometheus"""
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict, float]]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            rendered = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{rendered}}} {_number(value)}" if rendered else f"{name} {_number(value)}")
+
+    agents = document.get("agents", [])
+    chat_server = document.get("chat_server")
+    metric("office_state_version", "counter", "Office state changes seen by the scanner",
+           [({}, document.get("version", 0))])
+    metric("office_updated_timestamp_seconds", "gauge", "When the office state last changed",
+           [({}, document.get("updated_at_unix", 0))])
+    metric("office_healthy", "gauge", "1 if the office status is healthy",
+           [({}, 1 if document.get("status") == "healthy" else 0)])
+    metric("office_agents_online", "gauge", "Agents with a heartbeat in the last 5 minutes",
+           [({}, document.get("agents_online", 0))])
+    metric("office_tasks", "gauge", "Tasks in the office", [({}, document.get("tasks_total", 0))])
+    metric("office_unread_messages", "gauge", "Unread inbox messages", [({}, document.get("unread_total", 0))])
+    if chat_server is not None:
+        metric("office_chat_server_up", "gauge", "1 if the chat server accepts connections",
+               [({}, 1 if chat_server.get("ok") else 0)])
+    metric("office_agent_status", "gauge", "Presence of each agent (1 for the current state)",
+           [({"agent": agent["name"], "status": agent["status"]}, 1) for agent in agents])
+    metric("office_agent_inbox", "gauge", "Messages in the agent inbox",
+           [({"agent": agent["name"]}, agent["inbox"]) for agent in agents])
+    metric("office_agent_outbox", "gauge", "Messages in the agent outbox",
+           [({"agent": agent["name"]}, agent["outbox"]) for agent in agents])
+    metric("office_agent_tasks_assigned", "gauge", "Tasks assigned to the agent",
+           [({"agent": agent["name"]}, agent["tasks_assigned"]) for agent in agents])
+    metric("office_agent_completed_last_hour", "gauge", "Tasks the agent completed in the last hour",
+           [({"agent": agent["name"]}, agent["completed_per_hour"]) for agent in agents])
+    metric("office_metric_total", "counter", "Office totals from metrics.json and counters",
+           [({"metric": name}, value) for name, value in sorted(document.get("totals", {}).items())
+            if isinstance(value, (int, float)) and not isinstance(value, bool)])
+    return "\n".join(lines) + "\n"
+
+
+class Representation:
+    """Готовое тело ответа и его ETag (считаются один раз на изменение состояния)"""
+
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+class OfficeState:
+    """Последнее опубликованное состояние офиса
+
+    Сканер вызывает publish() после каждого кадра; если содержимое не
+    изменилось, ничего не пересобирается и ETag остается прежним, так что
+    зрители с If-None-Match получают 304 без тела.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.content: Optional[Dict] = None
+        self.version = 0
+        self.scanned_at = 0.0
+        self.scans = 0
+        self.representations: Dict[str, Representation] = {}
+
+    def publish(self, content: Dict, now: Optional[float] = None) -> bool:
+        """Новое состояние от сканера; True, если оно отличается от предыдущего"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.scanned_at = now
+            self.scans += 1
+            if content == self.content:
+                return False
+            self.content = content
+            self.version += 1
+            document = dict(content, version=self.version,
+                            updated_at=datetime.fromtimestamp(now).isoformat(), updated_at_unix=now)
+            self.representations = {
+                "json": Representation(encode(document), JSON_TYPE),
+                "prometheus": Representation(prometheus_text(document).encode("utf-8"), PROMETHEUS_TYPE),
+            }
+            return True
+
+    def get(self, kind: str) -> Optional[Representation]:
+        with self.lock:
+            return self.representations.get(kind)
+
+    def health(self) -> Dict:
+        with self.lock:
+            return {"version": self.version, "scans": self.scans,
+                    "scan_age_seconds": round(time.time() - self.scanned_at, 3) if self.scans else None}
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    for tag in header.split(","):
+        tag = tag.strip()
+        # Weak comparison: W/"x" matches "x"
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+class OfficeStateServer:
+    """HTTP/1.1 сервер состояния на asyncio (только GET/HEAD, keep-alive)
+
+    /state    - JSON документ состояния
+    /metrics  - текстовый формат Prometheus
+    /healthz  - возраст последнего скана
+    Тела ответов берутся готовыми из OfficeState: запрос не читает диск.
+    """
+
+    ROUTES = {"/": "json", "/state": "json", "/state.json": "json", "/metrics": "prometheus"}
+
+    def __init__(self, state: OfficeState, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.not_modified = 0
+
+    def respond(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """(код, заголовки, тело) ответа на запрос"""
+        self.requests += 1
+        cors = {"Access-Control-Allow-Origin": "*", "Access-Control-Expose-Headers": "ETag"}
+        if method == "OPTIONS":
+            return 204, dict(cors, **{"Access-Control-Allow-Methods": "GET, HEAD",
+                                      "Access-Control-Allow-Headers": "If-None-Match"}), b""
+        if method not in ("GET", "HEAD"):
+            return 405, dict(cors, Allow="GET, HEAD, OPTIONS"), b""
+
+        path = urlsplit(target).path
+        if path == "/healthz":
+            return 200, dict(cors, **{"Content-Type": JSON_TYPE, "Cache-Control": "no-store"}), encode(self.state.health())
+        kind = self.ROUTES.get(path)
+        if kind is None:
+            return 404, dict(cors, **{"Content-Type": "text/plain; charset=utf-8"}), b"not found\n"
+        representation = self.state.get(kind)
+        if representation is None:
+            # First scan not finished yet
+            return 503, dict(cors, **{"Retry-After": "1", "Content-Type": "text/plain; charset=utf-8"}), b"scanning\n"
+
+        headers_out = dict(cors, **{"ETag": representation.etag, "Cache-Control": "no-cache"})
+        if _etag_matches(headers.get("if-none-match", ""), representation.etag):
+            self.not_modified += 1
+            return 304, headers_out, b""
+        headers_out["Content-Type"] = representation.content_type
+        return 200, headers_out, representation.body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_SECONDS)
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                status, headers_out, body = self.respond(method, target, headers)
+                reason = {200: "OK", 204: "No Content", 304: "Not Modified", 404: "Not Found",
+                          405: "Method Not Allowed", 503: "Service Unavailable"}[status]
+                response = [f"HTTP/1.1 {status} {reason}"]
+                response += [f"{name}: {value}" for name, value in headers_out.items()]
+                if status not in (204, 304):
+                    response.append(f"Content-Length: {len(body)}")
+                response.append("Connection: keep-alive" if keep_alive else "Connection: close")
+                writer.write(("\r\n".join(response) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD" and status not in (204, 304):
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve_forever(self, started: Optional[threading.Event] = None):
+        server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_REQUEST_BYTES)
+        if started is not None:
+            started.set()
+        async with server:
+            await server.serve_forever()
+
+
+class OfficeStateClient:
+    """Чтение состояния с сервера монитора с условными запросами (If-None-Match)
+
+    state() возвращает документ или None, если сервер не запущен; неизменившееся
+    состояние приходит как 304 и берется из кэша клиента.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 0.5):
+        self.url = f"http://{host}:{port}/state"
+        self.timeout = timeout
+        self.etag: Optional[str] = None
+        self.document: Optional[Dict] = None
+
+    def state(self) -> Optional[Dict]:
+        request = urllib.request.Request(self.url)
+        if self.etag and self.document is not None:
+            request.add_header("If-None-Match", self.etag)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                self.document = decode(response.read())
+                self.etag = response.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                return None
+        except (OSError, ValueError):
+            return None
+        return self.document
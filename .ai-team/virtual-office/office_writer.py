@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Office Writer for Virtual Office
+Очередь записи с групповой фиксацией и атомарной публикацией файлов
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from codec import DEFAULT_CODEC, encode
+
+# Windows refuses to replace a file another process holds open (PowerShell reading
+# a task, the monitor reading metrics): retry for about a second before failing
+REPLACE_RETRY_DELAYS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.4)
+MAX_FAILURES = 100
+
+
+def replace_file(src: Path, dst: Path):
+    """os.replace с повтором, пока файл назначения занят читателем"""
+    for delay in REPLACE_RETRY_DELAYS:
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            time.sleep(delay)
+    os.replace(src, dst)
+
+
+def atomic_write(path: Path, data: bytes, fsync: bool = False):
+    """Записать файл целиком: временный файл рядом и os.replace
+
+    Читатель видит либо старое, либо новое содержимое, но не половину. Имя временного
+    файла не оканчивается на .json, поэтому обходы каталогов его не подхватывают.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        replace_file(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def fsync_dir(path: Path):
+    """Зафиксировать запись каталога (переименования) на диске; на Windows не требуется"""
+    if sys.platform == "win32":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteError(OSError):
+    """Операции очереди, не попавшие в файлы: failures - [(путь, ошибка), ...]"""
+
+    def __init__(self, failures: List[Tuple[Path, BaseException]]):
+        self.failures = failures
+        path, error = failures[0]
+        more = f" (+{len(failures) - 1})" if len(failures) > 1 else ""
+        super().__init__(f"{path}: {error}{more}")
+
+
+class WriteTicket:
+    """Квитанция операции: wait() ждет публикации и пробрасывает ошибку записи"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.reported = False
+
+    @property
+    def done(self) -> bool:
+        return self.event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if not self.event.wait(timeout):
+            return False
+        if self.error is not None:
+            self.reported = True
+            raise self.error
+        return True
+
+
+class _Op:
+    __slots__ = ("kind", "path", "data", "durable", "on_commit", "ticket")
+
+    def __init__(self, kind: str, path: Path, data: bytes, durable: bool,
+                 on_commit: Optional[Callable[[], None]]):
+        self.kind = kind
+        self.path = Path(path)
+        self.data = data
+        self.durable = durable
+        self.on_commit = on_commit
+        self.ticket = WriteTicket()
+
+
+class GroupCommitWriter:
+    """Фоновый писатель: операции копятся и фиксируются пачками
+
+    Пачка уходит, когда прошло flush_interval секунд с первой операции, набралось
+    max_batch операций или пришла операция с durable=True. Операции над одним файлом
+    применяются в порядке постановки и объединяются в одну запись:
+      - put публикует документ атомарно (temp + rename) и отменяет все, что стояло до него;
+      - append после put попадает в тот же атомарно публикуемый файл, без put - дописывается.
+    on_commit вызывается после публикации (например, обновить индекс в TaskStore).
+
+    Ошибку операции пробрасывает ее квитанция (wait()); ошибки, которые никто не забрал
+    из квитанций, пробрасывает следующий flush() или close() как WriteError.
+
+    fsync="none" - на диск сбрасывает ОС, кроме операций с durable=True;
+    fsync="always" - каждая пачка сбрасывается целиком (файлы и записи каталогов).
+    По умолчанию вызов возвращается сразу ("fire-and-forget"); durable=True ждет,
+    пока данные не окажутся на диске.
+    """
+
+    def __init__(self, flush_interval: float = 0.05, max_batch: int = 256, fsync: str = "none"):
+        if fsync not in ("none", "always"):
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+
+        self.cond = threading.Condition()
+        self.queue: List[_Op] = []
+        self.committing: Optional[_Op] = None  # last op of the batch being written
+        self.first_queued_at = 0.0
+        self.urgent = False
+        self.closed = False
+        self.batches = 0
+        self.ops = 0
+        self.failed: deque = deque(maxlen=MAX_FAILURES)  # ops whose error nobody collected yet
+        self.thread = threading.Thread(target=self._run, name="office-writer", daemon=True)
+        self.thread.start()
+
+    # --- API ----------------------------------------------------------------
+
+    def _submit(self, op: _Op) -> WriteTicket:
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("writer is closed")
+            if not self.queue:
+                self.first_queued_at = time.monotonic()
+            self.queue.append(op)
+            if op.durable or len(self.queue) >= self.max_batch:
+                self.urgent = True
+            self.cond.notify()
+        if op.durable:
+            op.ticket.wait()
+        return op.ticket
+
+    def put_json(self, path: Path, document: Any, on_commit: Optional[Callable[[], None]] = None,
+                 durable: bool = False, codec: str = DEFAULT_CODEC) -> WriteTicket:
+        """Атомарно записать документ (по умолчанию компактный JSON, целиком заменяет файл)"""
+        return self._submit(_Op("put", path, encode(document, codec), durable, on_commit))
+
+    def put_bytes(self, path: Path, data: bytes, on_commit: Optional[Callable[[], None]] = None,
+                  durable: bool = False) -> WriteTicket:
+        """Атомарно записать готовые байты"""
+        return self._submit(_Op("put", path, data, durable, on_commit))
+
+    def append_text(self, path: Path, text: str, on_commit: Optional[Callable[[], None]] = None,
+                    durable: bool = False) -> WriteTicket:
+        """Дописать текст в конец файла (chat.md и т.п.)"""
+        return self._submit(_Op("append", path, text.encode("utf-8"), durable, on_commit))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться фиксации всего, что поставлено в очередь до вызова
+
+        Ошибки записи, не забранные из квитанций, пробрасываются как WriteError.
+        """
+        with self.cond:
+            last = self.queue[-1] if self.queue else self.committing
+            if last is not None:
+                self.urgent = True
+                self.cond.notify()
+        done = last is None or last.ticket.event.wait(timeout)
+        self._raise_failures()
+        return done
+
+    def close(self):
+        """Зафиксировать очередь и остановить поток"""
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.urgent = True
+            self.cond.notify()
+        self.thread.join()
+        self._raise_failures()
+
+    def _raise_failures(self):
+        with self.cond:
+            failed, self.failed = list(self.failed), deque(maxlen=MAX_FAILURES)
+        failures = [(op.path, op.ticket.error) for op in failed if not op.ticket.reported]
+        if failures:
+            raise WriteError(failures)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики пачек и операций"""
+        with self.cond:
+            return {"batches": self.batches, "ops": self.ops, "queued": len(self.queue)}
+
+    # --- worker -------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                while self.queue and not self.urgent:
+                    remaining = self.first_queued_at + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.queue = self.queue, []
+                self.committing = batch[-1] if batch else None
+                self.urgent = False
+                if not batch and self.closed:
+                    return
+            self._commit(batch)
+
+    def _commit(self, batch: List[_Op]):
+        sync_all = self.fsync == "always"
+        errors: Dict[Path, BaseException] = {}
+        synced_dirs = set()
+
+        by_path: Dict[Path, List[_Op]] = {}
+        for op in batch:
+            by_path.setdefault(op.path, []).append(op)
+
+        for path, ops in by_path.items():
+            fsync = sync_all or any(op.durable for op in ops)
+            # The last put replaces everything queued before it; later appends extend it
+            last_put = max((i for i, op in enumerate(ops) if op.kind == "put"), default=None)
+            try:
+                if last_put is None:
+                    with open(path, 'ab') as f:
+                        f.write(b"".join(op.data for op in ops))
+                        if fsync:
+                            f.flush()
+                            os.fsync(f.fileno())
+                else:
+                    atomic_write(path, b"".join(op.data for op in ops[last_put:]), fsync)
+                    if fsync and path.parent not in synced_dirs:
+                        fsync_dir(path.parent)
+                        synced_dirs.add(path.parent)
+            except Exception as e:
+                errors[path] = e
+
+        for op in batch:
+            op.ticket.error = errors.get(op.path)
+            if op.ticket.error is None and op.on_commit is not None:
+                try:
+                    op.on_commit()
+                except Exception as e:
+                    op.ticket.error = e
+
+        # Record failures before releasing the tickets, so a flush() waiting on them sees them
+        with self.cond:
+            # durable submitters get the error from their own wait()
+            self.failed.extend(op for op in batch if op.ticket.error is not None and not op.durable)
+            self.batches += 1
+            self.ops += len(batch)
+        for op in batch:
+            op.ticket.event.set()
+
+
+_shared_writer: Optional[GroupCommitWriter] = None
+_shared_lock = threading.Lock()
+
+
+def get_writer() -> GroupCommitWriter:
+    """Общий на процесс писатель; очередь дописывается при выходе из процесса"""
+    global _shared_writer
+    with _shared_lock:
+        if _shared_writer is None:
+            _shared_writer = GroupCommitWriter()
+            atexit.register(_shared_writer.close)
+        return _shared_writer
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Presence Engine for Virtual Office
+Переходы online/idle/offline по таймерам иерархического колеса и журнал переходов
+"""
+
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from codec import decode, encode
+from log_follower import FileFollower
+from office_writer import get_writer
+
+# (state, seconds since the last heartbeat until it ends); the last state has no end
+THRESHOLDS: Tuple[Tuple[str, Optional[float]], ...] = (
+    ("online", 300),
+    ("idle", 900),
+    ("offline", None),
+)
+
+
+def state_for(age: float) -> str:
+    """Состояние агента через age секунд после последнего пульса"""
+    for state, until in THRESHOLDS:
+        if until is None or age < until:
+            return state
+    return THRESHOLDS[-1][0]
+
+
+def next_change(last_seen: float, state: str) -> Optional[float]:
+    """Когда кончится состояние state (None - больше переходов без нового пульса нет)"""
+    for name, until in THRESHOLDS:
+        if name == state:
+            return None if until is None else last_seen + until
+    return None
+
+
+class TimerWheel:
+    """Иерархическое колесо таймеров: по таймеру на ключ
+
+    Уровень l - slots ячеек по tick * slots**l секунд. Таймер лежит на самом
+    низком уровне, где его срок и текущее время отличаются только младшими
+    разрядами; при переходе на следующую ячейку уровня ее таймеры опускаются
+    ниже. schedule/cancel - O(1), advance - O(число сработавших + ячеек по
+    пути), пустые уровни проматываются целиком.
+    """
+
+    def __init__(self, tick: float = 1.0, slot_bits: int = 6, levels: int = 4, now: Optional[float] = None):
+        self.tick = tick
+        self.bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.levels = levels
+        self.wheels: List[List[Dict]] = [[{} for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self.counts = [0] * levels
+        self.overflow: Dict = {}
+        self.timers: Dict = {}  # key -> (level or -1 for overflow, slot, due tick, when)
+        self.current = int((time.time() if now is None else now) // tick)
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def _place(self, key, due: int, when: float):
+        for level in range(self.levels):
+            if due >> (self.bits * (level + 1)) == self.current >> (self.bits * (level + 1)):
+                slot = (due >> (self.bits * level)) & self.mask
+                self.wheels[level][slot][key] = (due, when)
+                self.counts[level] += 1
+                self.timers[key] = (level, slot, due, when)
+                return
+        self.overflow[key] = (due, when)
+        self.timers[key] = (-1, 0, due, when)
+
+    def schedule(self, key, when: float):
+        """Таймер key на момент when (заменяет прежний таймер key)"""
+        self.cancel(key)
+        # Already due: fires on the next advance
+        due = max(-(-when // self.tick), self.current + 1)
+        self._place(key, int(due), when)
+
+    def cancel(self, key) -> bool:
+        entry = self.timers.pop(key, None)
+        if entry is None:
+            return False
+        level, slot, _, _ = entry
+        if level < 0:
+            del self.overflow[key]
+        else:
+            del self.wheels[level][slot][key]
+            self.counts[level] -= 1
+        return True
+
+    def _cascade(self, level: int):
+        slot = self.wheels[level][(self.current >> (self.bits * level)) & self.mask]
+        entries = list(slot.items())
+        slot.clear()
+        self.counts[level] -= len(entries)
+        for key, (due, when) in entries:
+            del self.timers[key]
+            self._place(key, due, when)
+
+    def advance(self, now: float) -> List[Tuple[object, float]]:
+        """Сдвинуть колесо до now, вернуть сработавшие (ключ, срок) по порядку сроков"""
+        target = int(now // self.tick)
+        fired: List[Tuple[object, float]] = []
+        while self.current < target:
+            if not self.timers:
+                self.current = target
+                break
+            # Skip ahead over empty levels: jump to the next slot boundary of the
+            # lowest non-empty level instead of stepping tick by tick
+            empty = 0
+            while empty < self.levels and not self.counts[empty]:
+                empty += 1
+            step = 1 << (self.bits * empty)
+            self.current = min((self.current // step + 1) * step, target)
+
+            if self.current & self.mask == 0:
+                # Entering a new slot on higher levels: bring their timers down
+                top = 1
+                while top < self.levels and self.current & ((1 << (self.bits * (top + 1))) - 1) == 0:
+                    top += 1
+                if top == self.levels:
+                    overflow, self.overflow = self.overflow, {}
+                    for key, (due, when) in overflow.items():
+                        del self.timers[key]
+                        self._place(key, due, when)
+                for level in range(min(top, self.levels - 1), 0, -1):
+                    self._cascade(level)
+
+            slot = self.wheels[0][self.current & self.mask]
+            if slot:
+                due_now = [(key, when) for key, (due, when) in slot.items() if due <= self.current]
+                for key, when in sorted(due_now, key=lambda item: item[1]):
+                    del slot[key]
+                    del self.timers[key]
+                    self.counts[0] -= 1
+                    fired.append((key, when))
+        return fired
+
+
+class PresenceEvent(NamedTuple):
+    """Переход агента из одного состояния в другое в момент at (unix time)"""
+    agent: str
+    old: str
+    new: str
+    at: float
+
+    def describe(self) -> str:
+        verb = {"online": "came online", "idle": "went idle", "offline": "went offline"}.get(self.new, self.new)
+        return f"{self.agent} {verb} at {datetime.fromtimestamp(self.at).strftime('%H:%M')}"
+
+
+class PresenceLog:
+    """Журнал переходов: строка JSON на переход (system/presence.log)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def append(self, events: List[PresenceEvent]):
+        if events:
+            lines = b"".join(encode(event._asdict()) + b"\n" for event in events)
+            get_writer().append_text(self.path, lines.decode("utf-8"))
+
+    def _parse(self, lines: Iterator[bytes]) -> Iterator[PresenceEvent]:
+        for line in lines:
+            try:
+                doc = decode(line)
+                yield PresenceEvent(doc["agent"], doc["old"], doc["new"], float(doc["at"]))
+            except (ValueError, KeyError, TypeError):
+                continue  # torn or foreign line
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              agent: Optional[str] = None, limit: Optional[int] = None) -> List[PresenceEvent]:
+        """Переходы за [since, until] (unix time), по агенту; limit - последние limit"""
+        try:
+            with open(self.path, 'rb') as f:
+                events = [event for event in self._parse(f)
+                          if (since is None or event.at >= since) and (until is None or event.at <= until)
+                          and (agent is None or event.agent == agent)]
+        except FileNotFoundError:
+            return []
+        if limit is not None:
+            events = events[-limit:] if limit > 0 else []
+        return events
+
+    def follow(self, from_end: bool = True) -> Callable[[], List[PresenceEvent]]:
+        """Функция, возвращающая переходы, дописанные с прошлого вызова"""
+        follower = FileFollower(self.path, from_end)
+        return lambda: list(self._parse(follower.poll().encode("utf-8").splitlines()))
+
+
+class PresenceEngine:
+    """Состояние присутствия агентов, меняющееся только по таймерам
+
+    observe() получает время последнего пульса; для агента планируется один
+    таймер - на момент следующего перехода (online -> idle через 5 минут,
+    idle -> offline через 15). Между переходами проверка присутствия - чтение
+    словаря состояний. Переходы уходят подписчикам и в журнал; первое
+    наблюдение агента задает состояние без события.
+    """
+
+    def __init__(self, log: Optional[PresenceLog] = None, now: Optional[float] = None):
+        self.lock = threading.RLock()
+        self.wheel = TimerWheel(now=now)
+        self.states: Dict[str, str] = {}
+        self.last_seen: Dict[str, float] = {}
+        self.log = log
+        self.subscribers: List[Callable[[PresenceEvent], None]] = []
+        self.recent: List[PresenceEvent] = []
+
+    def subscribe(self, callback: Callable[[PresenceEvent], None]):
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def _emit(self, events: List[PresenceEvent]):
+        if not events:
+            return
+        self.recent = (self.recent + events)[-100:]
+        if self.log is not None:
+            self.log.append(events)
+        for event in events:
+            for callback in list(self.subscribers):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"⚠️ Ошибка подписчика присутствия: {e}")
+
+    def _schedule(self, agent: str):
+        change = next_change(self.last_seen[agent], self.states[agent])
+        if change is None:
+            self.wheel.cancel(agent)
+        else:
+            self.wheel.schedule(agent, change)
+
+    def _transition(self, agent: str, at: float, until: float, events: List[PresenceEvent]):
+        """Состояние агента в момент at и все его переходы до until"""
+        while True:
+            state = state_for(at - self.last_seen[agent])
+            old = self.states.get(agent)
+            if old != state:
+                self.states[agent] = state
+                events.append(PresenceEvent(agent, old, state, at))
+            change = next_change(self.last_seen[agent], state)
+            if change is None or change > until:
+                break
+            at = change  # already past: e.g. idle and then offline while nobody looked
+        self._schedule(agent)
+
+    def _fire(self, until: float, events: List[PresenceEvent]):
+        for agent, when in self.wheel.advance(until):
+            self._transition(agent, when, until, events)
+
+    def observe(self, agent: str, last_seen: float, now: Optional[float] = None) -> List[PresenceEvent]:
+        """Учесть пульс агента в момент last_seen, вернуть переходы"""
+        now = time.time() if now is None else now
+        events: List[PresenceEvent] = []
+        with self.lock:
+            known = self.last_seen.get(agent)
+            if known is not None and last_seen <= known:
+                return events
+            if known is None:
+                # First sight: current state, no history to report
+                self.last_seen[agent] = last_seen
+                self.states[agent] = state_for(max(0.0, now - last_seen))
+                self._schedule(agent)
+            else:
+                # Transitions due before this beat happened first (e.g. idle, then back online)
+                self._fire(min(last_seen, now), events)
+                self.last_seen[agent] = last_seen
+                self._transition(agent, min(last_seen, now), now, events)
+        self._emit(events)
+        return events
+
+    def observe_all(self, last_seen: Dict[str, float], now: Optional[float] = None) -> List[PresenceEvent]:
+        """Пульсы нескольких агентов и сдвиг до now"""
+        now = time.time() if now is None else now
+        events: List[PresenceEvent] = []
+        for agent, seen in sorted(last_seen.items(), key=lambda item: item[1]):
+            events += self.observe(agent, seen, now)
+        events += self.advance(now)
+        return events
+
+    def advance(self, now: Optional[float] = None) -> List[PresenceEvent]:
+        """Выполнить переходы, наступившие к now"""
+        now = time.time() if now is None else now
+        events: List[PresenceEvent] = []
+        with self.lock:
+            self._fire(now, events)
+        self._emit(events)
+        return events
+
+    def presence(self) -> Dict[str, str]:
+        """Текущие состояния {агент: online/idle/offline}"""
+        with self.lock:
+            return dict(self.states)
+
+
+def main():
+    log = PresenceLog(Path(r"C:\www.spa.com\.ai-team") / "system" / "presence.log")
+    args = sys.argv[1:]
+
+    if args and args[0] == "log":
+        agent = args[1] if len(args) > 1 else None
+        for event in log.query(agent=agent, limit=50):
+            print(f"{datetime.fromtimestamp(event.at):%Y-%m-%d %H:%M:%S}  {event.agent:<12} {event.old} → {event.new}")
+
+    elif args and args[0] == "follow":
+        poll = log.follow()
+        try:
+            while True:
+                for event in poll():
+                    print(event.describe())
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+    else:
+        print("Usage:")
+        print("  python presence.py log [agent] - Last presence transitions")
+        print("  python presence.py follow      - Print transitions as they happen")
+
+
+if __name__ == "__main__":
+    main()
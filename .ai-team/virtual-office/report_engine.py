@@ -0,0 +1,747 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report Engine for Virtual Office
+Отчеты за один потоковый проход по задачам, inbox, каналам и метрикам
+"""
+
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from channel_store import SEGMENT_SUFFIX, SEGMENTS_DIR, read_segment
+from codec import decode, encode
+from inbox_store import ReadCursor
+from office_writer import atomic_write
+
+
+class Record(NamedTuple):
+    """Одна запись потока: источник, владелец (агент/канал), документ"""
+    kind: str            # task | message | channel | metrics
+    origin: str
+    doc: Any
+    unread: bool = False  # messages only: not covered by the agent's read cursor
+
+
+class Job(NamedTuple):
+    """Единица работы пула: один каталог (или его доля) одного источника"""
+    kind: str
+    path: str
+    origin: str = ""
+    shard: int = 0
+    shards: int = 1
+
+
+# --- aggregators ------------------------------------------------------------
+
+class Aggregator:
+    """Свертка записей в итог отчета
+
+    Запись сначала сводится к ключу (key) - небольшому кортежу только с нужными
+    полями, затем ключ добавляется в итог (add, count раз). Ключи не зависят от даты
+    отчета и хранятся в контрольной точке: неизменившиеся файлы повторно не читаются,
+    а неизменившийся каталог сворачивается из гистограммы ключей.
+    Каждый рабочий процесс сворачивает свою часть записей в свой экземпляр,
+    затем экземпляры объединяются (merge). Состояние - только счетчики, а не
+    записи. Класс должен быть определен на уровне модуля: экземпляры передаются
+    между процессами.
+    """
+    name = ""
+    kinds: Sequence[str] = ()
+
+    def __init__(self, context: Dict[str, Any]):
+        self.context = context
+
+    def key(self, record: Record) -> Any:
+        """Хэшируемая проекция записи из кортежей, строк и чисел (None - не учитывается)"""
+        raise NotImplementedError
+
+    def add(self, key: Any, count: int = 1):
+        raise NotImplementedError
+
+    def fold(self, record: Record):
+        key = self.key(record)
+        if key is not None:
+            self.add(key)
+
+    def merge(self, other: "Aggregator"):
+        raise NotImplementedError
+
+    def result(self) -> Dict[str, Any]:
+        """Итог в виде JSON-совместимого словаря"""
+        raise NotImplementedError
+
+    @staticmethod
+    def render(result: Dict[str, Any]) -> List[str]:
+        """Строки текстового отчета по итогу"""
+        return []
+
+
+class TaskAggregator(Aggregator):
+    """Задачи: всего, по статусу, исполнителю, приоритету; просроченные"""
+    name = "tasks"
+    kinds = ("task",)
+
+    def __init__(self, context: Dict[str, Any]):
+        super().__init__(context)
+        self.total = 0
+        self.overdue = 0
+        self.by_status: Counter = Counter()
+        self.by_assignee: Counter = Counter()
+        self.by_priority: Counter = Counter()
+
+    def key(self, record: Record) -> Any:
+        task = record.doc
+        if not isinstance(task, dict):
+            return None
+        return (task.get("status", "unknown"), task.get("assignee") or "unassigned",
+                task.get("priority", "normal"), str(task.get("deadline") or "")[:10])
+
+    def add(self, key: Any, count: int = 1):
+        status, assignee, priority, deadline = key
+        self.total += count
+        self.by_status[status] += count
+        self.by_assignee[assignee] += count
+        self.by_priority[priority] += count
+        if deadline and deadline < self.context["today"] and status not in ("completed", "done"):
+            self.overdue += count
+
+    def merge(self, other: "TaskAggregator"):
+        self.total += other.total
+        self.overdue += other.overdue
+        self.by_status.update(other.by_status)
+        self.by_assignee.update(other.by_assignee)
+        self.by_priority.update(other.by_priority)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "overdue": self.overdue,
+            "by_status": dict(self.by_status.most_common()),
+            "by_assignee": dict(self.by_assignee.most_common()),
+            "by_priority": dict(self.by_priority.most_common()),
+        }
+
+    @staticmethod
+    def render(result: Dict[str, Any]) -> List[str]:
+        lines = ["\n📋 ЗАДАЧИ:", f"Всего: {result['total']}"]
+        if result["overdue"]:
+            lines.append(f"Просрочено: {result['overdue']}")
+        if result["by_status"]:
+            lines.append("\nПо статусу:")
+            lines.extend(f"  {status}: {count}" for status, count in result["by_status"].items())
+        if result["by_assignee"]:
+            lines.append("\nПо исполнителям:")
+            lines.extend(f"  {assignee}: {count}" for assignee, count in result["by_assignee"].items())
+        return lines
+
+
+class InboxAggregator(Aggregator):
+    """Inbox: всего и непрочитанных по агентам"""
+    name = "inbox"
+    kinds = ("message",)
+
+    def __init__(self, context: Dict[str, Any]):
+        super().__init__(context)
+        self.total: Counter = Counter()
+        self.unread: Counter = Counter()
+        self.urgent: Counter = Counter()
+
+    def key(self, record: Record) -> Any:
+        priority = record.doc.get("priority") if isinstance(record.doc, dict) else None
+        return (record.origin, record.unread, priority in ("high", "critical"))
+
+    def add(self, key: Any, count: int = 1):
+        agent, unread, urgent = key
+        self.total[agent] += count
+        if unread:
+            self.unread[agent] += count
+            if urgent:
+                self.urgent[agent] += count
+
+    def merge(self, other: "InboxAggregator"):
+        self.total.update(other.total)
+        self.unread.update(other.unread)
+        self.urgent.update(other.urgent)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            agent: {"total": self.total[agent], "unread": self.unread[agent], "urgent": self.urgent[agent]}
+            for agent in sorted(self.total)
+        }
+
+    @staticmethod
+    def render(result: Dict[str, Any]) -> List[str]:
+        lines = ["\n📬 СООБЩЕНИЯ:"]
+        for agent, stats in result.items():
+            if stats["unread"] > 0:
+                urgent = f" (срочных: {stats['urgent']})" if stats["urgent"] else ""
+                lines.append(f"  {agent}: {stats['unread']} непрочитанных{urgent}")
+        return lines
+
+
+class ChannelAggregator(Aggregator):
+    """Каналы: сообщений всего и за сегодня, активность авторов"""
+    name = "channels"
+    kinds = ("channel",)
+
+    def __init__(self, context: Dict[str, Any]):
+        super().__init__(context)
+        self.total: Counter = Counter()
+        self.today: Counter = Counter()
+        self.by_agent: Counter = Counter()
+        self.last: Dict[str, str] = {}
+
+    def key(self, record: Record) -> Any:
+        post = record.doc if isinstance(record.doc, dict) else {}
+        return (record.origin, str(post.get("timestamp") or ""),
+                post.get("agent") or post.get("from") or "unknown")
+
+    def add(self, key: Any, count: int = 1):
+        channel, timestamp, agent = key
+        self.total[channel] += count
+        if timestamp[:10] == self.context["today"]:
+            self.today[channel] += count
+        self.by_agent[agent] += count
+        if timestamp > self.last.get(channel, ""):
+            self.last[channel] = timestamp
+
+    def merge(self, other: "ChannelAggregator"):
+        self.total.update(other.total)
+        self.today.update(other.today)
+        self.by_agent.update(other.by_agent)
+        for channel, timestamp in other.last.items():
+            if timestamp > self.last.get(channel, ""):
+                self.last[channel] = timestamp
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "channels": {
+                channel: {"total": self.total[channel], "today": self.today[channel],
+                          "last": self.last.get(channel) or None}
+                for channel in sorted(self.total)
+            },
+            "by_agent": dict(self.by_agent.most_common()),
+        }
+
+    @staticmethod
+    def render(result: Dict[str, Any]) -> List[str]:
+        if not result["channels"]:
+            return []
+        lines = ["\n💬 КАНАЛЫ:"]
+        for channel, stats in result["channels"].items():
+            lines.append(f"  #{channel}: {stats['today']} сегодня, {stats['total']} всего")
+        return lines
+
+
+class MetricsAggregator(Aggregator):
+    """Метрики: суммы общих счетчиков и счетчиков агентов"""
+    name = "metrics"
+    kinds = ("metrics",)
+
+    def __init__(self, context: Dict[str, Any]):
+        super().__init__(context)
+        self.totals: Counter = Counter()
+        self.agents: Dict[str, Counter] = {}
+
+    @staticmethod
+    def _numbers(values: Any) -> Tuple:
+        if not isinstance(values, dict):
+            return ()
+        return tuple(sorted((key, value) for key, value in values.items()
+                            if isinstance(value, (int, float)) and not isinstance(value, bool)))
+
+    def key(self, record: Record) -> Any:
+        metrics = record.doc if isinstance(record.doc, dict) else {}
+        if record.origin:
+            # virtual-office/metrics/<agent>.json
+            return ((), ((record.origin, self._numbers(metrics)),))
+        agents = metrics.get("agents") if isinstance(metrics.get("agents"), dict) else {}
+        return (self._numbers(metrics.get("totals")),
+                tuple(sorted((agent, self._numbers(values)) for agent, values in agents.items())))
+
+    def add(self, key: Any, count: int = 1):
+        totals, agents = key
+        for name, value in totals:
+            self.totals[name] += value * count
+        for agent, values in agents:
+            counters = self.agents.setdefault(agent, Counter())
+            for name, value in values:
+                counters[name] += value * count
+
+    def merge(self, other: "MetricsAggregator"):
+        self.totals.update(other.totals)
+        for agent, counters in other.agents.items():
+            self.agents.setdefault(agent, Counter()).update(counters)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "totals": dict(self.totals),
+            "agents": {agent: dict(counters) for agent, counters in sorted(self.agents.items())},
+        }
+
+    @staticmethod
+    def render(result: Dict[str, Any]) -> List[str]:
+        if not result["totals"] and not result["agents"]:
+            return []
+        lines = ["\n📈 МЕТРИКИ:"]
+        lines.extend(f"  {key}: {value}" for key, value in result["totals"].items())
+        for agent, counters in result["agents"].items():
+            completed = counters.get("tasks_completed", 0)
+            lines.append(f"  {agent}: выполнено задач {completed}")
+        return lines
+
+
+class PresenceAggregator(Aggregator):
+    """Присутствие: переходы online/idle/offline за сегодня из журнала монитора"""
+    name = "presence"
+    kinds = ("presence",)
+
+    def __init__(self, context: Dict[str, Any]):
+        super().__init__(context)
+        self.transitions: Counter = Counter()
+
+    def key(self, record: Record) -> Any:
+        event = record.doc if isinstance(record.doc, dict) else {}
+        at = datetime.fromtimestamp(float(event.get("at") or 0)).isoformat(timespec="seconds")
+        return (at, record.origin, str(event.get("old")), str(event.get("new")))
+
+    def add(self, key: Any, count: int = 1):
+        self.transitions[key] += count
+
+    def merge(self, other: "PresenceAggregator"):
+        self.transitions.update(other.transitions)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "transitions": [{"at": at, "agent": agent, "from": old, "to": new}
+                            for at, agent, old, new in sorted(self.transitions)],
+        }
+
+    @staticmethod
+    def render(result: Dict[str, Any]) -> List[str]:
+        if not result["transitions"]:
+            return []
+        lines = ["\n👥 ПРИСУТСТВИЕ:"]
+        for event in result["transitions"][-10:]:
+            lines.append(f"  {event['at'][11:16]} {event['agent']}: {event['from']} → {event['to']}")
+        return lines
+
+
+DEFAULT_AGGREGATORS: List[Type[Aggregator]] = [TaskAggregator, InboxAggregator,
+                                               ChannelAggregator, MetricsAggregator, PresenceAggregator]
+
+
+# --- sources ----------------------------------------------------------------
+
+def _read(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def _json_files(directory: str, shard: int = 0, shards: int = 1) -> Iterator[os.DirEntry]:
+    """Файлы *.json каталога (доля shard из shards по хэшу имени)"""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                if shards > 1 and zlib.crc32(entry.name.encode("utf-8")) % shards != shard:
+                    continue
+                yield entry
+    except OSError:
+        return
+
+
+def _job_files(job: Job) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """(имя, путь, stat) файлов единицы работы"""
+    if job.kind == "metrics":
+        try:
+            yield os.path.basename(job.path), job.path, os.stat(job.path)
+        except OSError:
+            pass
+        return
+    for entry in _json_files(job.path, job.shard, job.shards):
+        try:
+            yield entry.name, entry.path, entry.stat()
+        except OSError:
+            continue  # moved to outbox while scanning
+    if job.kind == "channel":
+        # Day segments written by ChannelCompactor
+        for entry in _segment_files(job.path):
+            try:
+                yield f"{SEGMENTS_DIR}/{entry.name}", entry.path, entry.stat()
+            except OSError:
+                continue
+
+
+def _segment_files(channel_dir: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(os.path.join(channel_dir, SEGMENTS_DIR)) as entries:
+            return [entry for entry in entries if entry.name.endswith(SEGMENT_SUFFIX)]
+    except OSError:
+        return []
+
+
+def _file_docs(job: Job, name: str, path: str) -> List[Any]:
+    """Документы файла: один для JSON файла, все строки для сегмента канала"""
+    if name.startswith(f"{SEGMENTS_DIR}/"):
+        return [doc for _, doc in read_segment(Path(path))]
+    return [_read(path)]
+
+
+def _aggregators_for(job: Job, aggregator_types: Sequence[Type[Aggregator]],
+                     context: Dict[str, Any]) -> List[Aggregator]:
+    return [cls(context) for cls in aggregator_types if job.kind in cls.kinds]
+
+
+def scan_job(job: Job, aggregator_types: Sequence[Type[Aggregator]], context: Dict[str, Any],
+             previous: Optional[bytes] = None) -> Dict[str, Any]:
+    """Свернуть одну единицу работы (выполняется в рабочем процессе)
+
+    previous - файлы из контрольной точки {имя: (mtime_ns, size, [ключи записей])}:
+    файлы с той же сигнатурой не читаются, берутся сохраненные ключи.
+    """
+    stats: Counter = Counter()
+    aggregators = _aggregators_for(job, aggregator_types, context)
+    known_files: Dict[str, Tuple] = decode(previous) if previous else {}
+    files: Dict[str, Tuple] = {}
+    histogram: Counter = Counter()
+    cursor = None
+    if job.kind == "message":
+        cursor = ReadCursor(Path(job.path).parent / f"{job.origin}.read_cursor")
+        cursor.refresh()
+
+    for name, path, st in _job_files(job):
+        known = known_files.get(name)
+        if known is not None and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            records = known[2]
+            stats["reused"] += len(records)
+        else:
+            try:
+                docs = _file_docs(job, name, path)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                stats["errors"] += 1
+                continue
+            stats["parsed"] += len(docs)
+            records = []
+            for doc in docs:
+                unread = False
+                if cursor is not None:
+                    msg = doc if isinstance(doc, dict) else {}
+                    msg_id = msg.get("id") or msg.get("task_id") or Path(path).stem
+                    unread = msg.get("status") != "read" and not cursor.is_read(msg_id)
+                record = Record(job.kind, job.origin, doc, unread)
+                records.append(tuple(aggregator.key(record) for aggregator in aggregators))
+
+        files[name] = (st.st_mtime_ns, st.st_size, records)
+        for keys in records:
+            histogram[keys] += 1
+
+    return {
+        "aggregators": fold_histogram(job, aggregator_types, context, histogram.items()),
+        "stats": stats,
+        "state": {"histogram": list(histogram.items()), "files": encode(files, "binary")},
+    }
+
+
+def fold_histogram(job: Job, aggregator_types: Sequence[Type[Aggregator]], context: Dict[str, Any],
+                   histogram: Iterable[Tuple[Tuple, int]]) -> List[Aggregator]:
+    """Итог единицы работы по гистограмме ключей {ключи: число файлов}, без чтения файлов"""
+    aggregators = _aggregators_for(job, aggregator_types, context)
+    for keys, count in histogram:
+        for aggregator, key in zip(aggregators, keys):
+            if key is not None:
+                aggregator.add(key, count)
+    return aggregators
+
+
+# --- checkpoint -------------------------------------------------------------
+
+class ReportCheckpoint:
+    """Состояние прошлого прохода по единицам работы
+
+    Для каждой единицы: сигнатура каталога, гистограмма ключей (для свертки без
+    чтения файлов) и упакованная таблица файлов {имя: (mtime_ns, size, [ключи])},
+    которая распаковывается только для изменившихся каталогов. Хранится в двоичном
+    формате (читает только Python). Если файл поврежден, другой версии или записан
+    для другого набора агрегаторов, load() возвращает пустое состояние - следующий
+    проход полный.
+    """
+    VERSION = 3
+
+    def __init__(self, path: Path, aggregator_names: Sequence[str]):
+        self.path = Path(path)
+        self.aggregator_names = list(aggregator_names)
+        self.signature = None
+        self.jobs: Dict[str, Dict] = {}
+
+    def load(self) -> Dict[str, Dict]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            self.signature, self.jobs = None, {}
+            return {}
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature == self.signature:
+            return dict(self.jobs)
+        try:
+            with open(self.path, 'rb') as f:
+                state = decode(f.read())
+            if (state.get("version") != self.VERSION
+                    or state.get("aggregators") != self.aggregator_names):
+                return {}
+            jobs = dict(state["jobs"])
+        except Exception as e:
+            print(f"⚠️ Контрольная точка отчета {self.path.name} повреждена, полный пересчет: {e}")
+            return {}
+        self.signature, self.jobs = signature, jobs
+        return dict(jobs)
+
+    def save(self, jobs: Dict[str, Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, encode({
+            "version": self.VERSION,
+            "aggregators": self.aggregator_names,
+            "jobs": jobs,
+        }, "binary"))
+        st = self.path.stat()
+        self.signature, self.jobs = (st.st_ino, st.st_mtime_ns, st.st_size), dict(jobs)
+
+    def clear(self):
+        self.signature, self.jobs = None, {}
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+# --- engine -----------------------------------------------------------------
+
+class Report:
+    """Итог прохода: из него строятся и текстовый, и JSON отчет"""
+
+    def __init__(self, generated_at: datetime, results: Dict[str, Dict],
+                 aggregator_types: Sequence[Type[Aggregator]], stats: Dict[str, Any]):
+        self.generated_at = generated_at
+        self.results = results
+        self.aggregator_types = aggregator_types
+        self.stats = stats
+
+    def __getitem__(self, name: str) -> Dict:
+        return self.results[name]
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "date": self.generated_at.isoformat(),
+            **self.results,
+            "scan": self.stats,
+        }
+
+    def to_text(self) -> str:
+        lines = ["=" * 50, f"📊 DAILY REPORT - {self.generated_at.strftime('%Y-%m-%d')}", "=" * 50]
+        for cls in self.aggregator_types:
+            if cls.name in self.results:
+                lines.extend(cls.render(self.results[cls.name]))
+        return "\n".join(lines)
+
+
+def _job_id(job: Job) -> str:
+    return f"{job.kind}:{job.path}:{job.shard}/{job.shards}"
+
+
+def _job_signature(job: Job) -> Tuple:
+    """(сигнатура файлов единицы, сигнатура курсора прочтения)
+
+    Сигнатура файлов - sha1 по (имя, mtime_ns, size) каждого файла (как в
+    TaskStore.sync): mtime каталога не меняется, когда task-manager.ps1 или
+    агент переписывает файл на месте. Файлы при этом только stat-ятся, не читаются.
+    """
+    digest = hashlib.sha1()
+    count = 0
+    for name, _, st in _job_files(job):
+        digest.update(f"{name}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8"))
+        count += 1
+    own = (count, digest.hexdigest()) if count or os.path.exists(job.path) else None
+    cursor = None
+    if job.kind == "message":
+        try:
+            st = os.stat(Path(job.path).parent / f"{job.origin}.read_cursor")
+            cursor = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+    return (own, cursor)
+
+
+class ReportEngine:
+    """Один проход по данным офиса для всех форматов отчета
+
+    Обход разбит на единицы работы: каталог задач делится на доли по хэшу имени
+    (по одной на процесс), inbox - по агентам, каналы - по каналам, метрики - по
+    файлам. Единицы выполняются в пуле процессов (разбор JSON упирается в CPU,
+    потоки ограничены GIL); каждая читает файлы по одному и сворачивает их в свои
+    агрегаторы, результаты объединяются в родительском процессе. processes=False
+    или недоступный пул процессов - тот же проход в потоках.
+
+    С контрольной точкой (checkpoint) проход инкрементальный: единица с прежней
+    сигнатурой файлов сворачивается из гистограммы ключей, в изменившейся читаются только
+    новые и измененные файлы; после смены курсора прочтения inbox агента читается заново.
+    Повторные проходы идут в потоках - запуск процессов дороже такого прохода.
+    """
+
+    def __init__(self, virtual_office: Path, agents: Sequence[str],
+                 aggregators: Optional[Sequence[Type[Aggregator]]] = None,
+                 metrics_files: Sequence[Path] = (), workers: Optional[int] = None,
+                 processes: bool = True, checkpoint: Optional[Path] = None, counters: Any = None,
+                 presence_log: Any = None):
+        self.virtual_office = Path(virtual_office)
+        self.agents = list(agents)
+        self.aggregator_types = list(aggregators or DEFAULT_AGGREGATORS)
+        self.metrics_files = [Path(p) for p in metrics_files]
+        self.workers = workers or os.cpu_count() or 1
+        self.processes = processes
+        self.counters = counters  # CounterStore: sharded increments on top of the metrics files
+        self.presence_log = presence_log  # PresenceLog written by the monitor
+        self.checkpoint = None
+        if checkpoint is not None:
+            self.checkpoint = ReportCheckpoint(checkpoint, [cls.name for cls in self.aggregator_types])
+
+        self.lock = threading.Lock()
+
+    def jobs(self) -> List[Job]:
+        """Единицы работы прохода"""
+        jobs = [Job("task", str(self.virtual_office / "tasks"), "", shard, self.workers)
+                for shard in range(self.workers)]
+
+        inbox_dir = self.virtual_office / "inbox"
+        jobs += [Job("message", str(inbox_dir / agent), agent) for agent in self.agents]
+
+        channels_dir = self.virtual_office / "channels"
+        try:
+            channels = sorted(entry.name for entry in os.scandir(channels_dir) if entry.is_dir())
+        except OSError:
+            channels = []
+        jobs += [Job("channel", str(channels_dir / channel), channel) for channel in channels]
+
+        jobs += [Job("metrics", str(path)) for path in self.metrics_files if path.exists()]
+        for entry in _json_files(str(self.virtual_office / "metrics")):
+            jobs.append(Job("metrics", entry.path, entry.name[:-len(".json")]))
+
+        wanted = {kind for cls in self.aggregator_types for kind in cls.kinds}
+        return [job for job in jobs if job.kind in wanted]
+
+    def reset(self):
+        """Забыть контрольную точку: следующий проход полный"""
+        with self.lock:
+            if self.checkpoint is not None:
+                self.checkpoint.clear()
+
+    def _executor(self, cold_jobs: int) -> Executor:
+        if self.processes and self.workers > 1 and cold_jobs > 1:
+            try:
+                return ProcessPoolExecutor(max_workers=self.workers)
+            except (OSError, NotImplementedError, ImportError):
+                pass
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report")
+
+    def _scan(self, executor: Executor, pending: List[Tuple[Job, Optional[bytes]]],
+              context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with executor:
+            futures = [executor.submit(scan_job, job, self.aggregator_types, context, previous)
+                       for job, previous in pending]
+            return [future.result() for future in futures]
+
+    def run(self, full: bool = False) -> Report:
+        """Выполнить проход и вернуть отчет (full=True - без контрольной точки)"""
+        started = time.perf_counter()
+        now = datetime.now()
+        context = {"today": now.strftime("%Y-%m-%d")}
+        jobs = self.jobs()
+
+        with self.lock:
+            states = self.checkpoint.load() if self.checkpoint and not full else {}
+
+            merged: Dict[str, Aggregator] = {cls.name: cls(context) for cls in self.aggregator_types}
+            stats: Counter = Counter()
+            new_states: Dict[str, Dict] = {}
+            pending: List[Tuple[Job, Optional[bytes]]] = []
+            signatures: Dict[str, Tuple] = {}
+            for job in jobs:
+                job_id = _job_id(job)
+                # Taken before scanning: changes made during the scan show up next run
+                signature = signatures[job_id] = _job_signature(job)
+                state = states.get(job_id)
+                if state is not None and state["signature"] == signature:
+                    new_states[job_id] = state
+                    for aggregator in fold_histogram(job, self.aggregator_types, context, state["histogram"]):
+                        merged[aggregator.name].merge(aggregator)
+                    stats["reused"] += sum(count for _, count in state["histogram"])
+                    continue
+                # Same read cursor: only new and changed files are read
+                usable = state is not None and state["signature"][1] == signature[1]
+                pending.append((job, state["files"] if usable else None))
+
+            mode = "checkpoint"
+            if pending:
+                executor = self._executor(sum(1 for _, previous in pending if previous is None))
+                try:
+                    results = self._scan(executor, pending, context)
+                except BrokenProcessPool:
+                    # e.g. no fork/spawn in a restricted environment: same pass in threads
+                    executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report")
+                    results = self._scan(executor, pending, context)
+                mode = "processes" if isinstance(executor, ProcessPoolExecutor) else "threads"
+
+                for (job, _), partial in zip(pending, results):
+                    job_id = _job_id(job)
+                    stats.update(partial["stats"])
+                    new_states[job_id] = {"signature": signatures[job_id], **partial["state"]}
+                    for aggregator in partial["aggregators"]:
+                        merged[aggregator.name].merge(aggregator)
+
+            if self.checkpoint is not None and (pending or new_states.keys() != states.keys()):
+                try:
+                    self.checkpoint.save(new_states)
+                except OSError as e:
+                    print(f"⚠️ Не удалось сохранить контрольную точку отчета: {e}")
+
+        scan = {
+            "records": stats["parsed"] + stats["reused"],
+            "parsed": stats["parsed"],
+            "reused": stats["reused"],
+            "errors": stats["errors"],
+            "jobs": len(jobs),
+            "scanned_jobs": len(pending),
+            "workers": self.workers,
+            "mode": mode,
+            "incremental": bool(states),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if self.counters is not None:
+            # Already merged and cached by the store: cheaper than a job
+            counters = Record("metrics", "", self.counters.apply({}))
+            for aggregator in merged.values():
+                if "metrics" in aggregator.kinds:
+                    aggregator.fold(counters)
+
+        if self.presence_log is not None:
+            midnight = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+            records = [Record("presence", event.agent, event._asdict())
+                       for event in self.presence_log.query(since=midnight)]
+            for aggregator in merged.values():
+                if "presence" in aggregator.kinds:
+                    for record in records:
+                        aggregator.fold(record)
+
+        results = {name: aggregator.result() for name, aggregator in merged.items()}
+        return Report(now, results, self.aggregator_types, scan)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Screen Renderer for Virtual Office
+Дифференциальный вывод кадров в терминал: только изменившиеся ячейки, без очистки экрана
+"""
+
+import os
+import shutil
+import sys
+import time
+import unicodedata
+from typing import List, Optional, TextIO
+
+CSI = "\x1b["
+
+
+def _char_width(char: str) -> int:
+    if unicodedata.combining(char) or char in "‍︎️":
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+
+def cells(line: str) -> List[str]:
+    """Строка по ячейкам экрана: широкий символ - ячейка и пустая вторая половина,
+    символы нулевой ширины (вариации, комбинируемые) - в ячейке предыдущего"""
+    result: List[str] = []
+    for char in line:
+        width = _char_width(char)
+        if width == 0 and result:
+            # Attach to the last real cell (skip the empty half of a wide one)
+            index = len(result) - 1 if result[-1] else len(result) - 2
+            result[index] += char
+        elif width == 2:
+            result += [char, ""]
+        elif width:
+            result.append(char)
+    return result
+
+
+def _clip(row: List[str], width: int) -> List[str]:
+    """Ячейки строки в пределах ширины терминала (разрезанный широкий символ - пробел)"""
+    if len(row) <= width:
+        return row
+    clipped = row[:width]
+    if row[width] == "":
+        clipped[-1] = " "  # the right half did not fit
+    return clipped
+
+
+def _enable_vt() -> bool:
+    """Включить ANSI-последовательности в консоли Windows (10+)"""
+    if os.name != "nt":
+        return True
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)  # STD_OUTPUT_HANDLE
+        mode = ctypes.c_uint32()
+        if not kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            return False
+        return bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+    except (AttributeError, OSError, ImportError):
+        return False
+
+
+class ScreenRenderer:
+    """Вывод кадра (список строк) с учетом предыдущего кадра
+
+    В терминале первый кадр рисуется целиком, дальше для каждой изменившейся
+    строки - переход курсора к первой отличающейся ячейке и ячейки до последней
+    отличающейся; неизменный кадр не пишет ничего. Строки обрезаются по ширине
+    терминала, чтобы перенос не сдвигал нумерацию строк, а кадр - по высоте (одна
+    строка остается под курсор), чтобы экран не прокручивался. Кадры чаще max_fps
+    откладываются (последний ждет flush()). Вне терминала (перенаправленный вывод)
+    кадр пишется обычным текстом и только если изменился.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, max_fps: float = 4.0,
+                 headless: Optional[bool] = None):
+        self.stream = stream or sys.stdout
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        if headless is None:
+            headless = not (hasattr(self.stream, "isatty") and self.stream.isatty()) or not _enable_vt()
+        self.headless = headless
+        self.previous: Optional[List[List[str]]] = None
+        self.size = None
+        self.pending: Optional[List[str]] = None
+        self.last_write = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.last_bytes = 0
+
+    def _terminal_size(self):
+        try:
+            return shutil.get_terminal_size()
+        except (OSError, ValueError):
+            return None
+
+    def _diff(self, lines: List[str]) -> str:
+        size = self._terminal_size()
+        if size is not None and size.lines > 1 and len(lines) > size.lines - 1:
+            # A taller frame scrolls the screen and every later update lands a line off;
+            # the last row is left for the cursor
+            shown = size.lines - 2
+            lines = lines[:shown] + [f"... {len(lines) - shown} more lines, enlarge the terminal"]
+        frame = [cells(line) for line in lines]
+        if size is not None and size.columns > 0:
+            # A row wider than the terminal would wrap and shift every row below it
+            frame = [_clip(row, size.columns) for row in frame]
+        out = []
+        if self.previous is None or size != self.size:
+            # First frame or resized terminal: one full redraw
+            out.append(f"{CSI}?25l{CSI}H{CSI}2J")
+            out.extend("".join(row) + "\r\n" for row in frame)
+            self.size = size
+        else:
+            for number, row in enumerate(frame):
+                old = self.previous[number] if number < len(self.previous) else []
+                if row == old:
+                    continue
+                first = 0
+                while first < min(len(row), len(old)) and row[first] == old[first]:
+                    first += 1
+                if first < len(row) and row[first] == "" and first > 0:
+                    first -= 1  # start at the left half of a wide character
+                last = len(row)
+                if len(row) == len(old):
+                    while last > first and row[last - 1] == old[last - 1]:
+                        last -= 1
+                    if last < len(row) and row[last] == "":
+                        last += 1  # finish the wide character
+                out.append(f"{CSI}{number + 1};{first + 1}H" + "".join(row[first:last]))
+                if len(row) < len(old):
+                    out.append(f"{CSI}K")
+            if len(frame) < len(self.previous):
+                out.append(f"{CSI}{len(frame) + 1};1H{CSI}J")
+            if out:
+                out.append(f"{CSI}{len(frame) + 1};1H")
+        self.previous = frame
+        return "".join(out)
+
+    def render(self, lines: List[str], force: bool = False) -> int:
+        """Вывести кадр, вернуть число записанных байт (0 - кадр не изменился или отложен)"""
+        now = time.monotonic()
+        if not force and now - self.last_write < self.min_interval:
+            self.pending = lines
+            self.skipped += 1
+            return 0
+        self.pending = None
+        self.last_write = now
+
+        if self.headless:
+            if self.previous is not None and lines == self.previous:
+                return 0
+            self.previous = list(lines)
+            text = "\n".join(lines) + "\n\n"
+        else:
+            text = self._diff(lines)
+        if not text:
+            return 0
+
+        self.stream.write(text)
+        self.stream.flush()
+        self.frames += 1
+        self.last_bytes = len(text.encode("utf-8", "replace"))
+        return self.last_bytes
+
+    def due_in(self) -> Optional[float]:
+        """Через сколько секунд можно вывести отложенный кадр (None - отложенного нет)"""
+        if self.pending is None:
+            return None
+        return max(0.0, self.min_interval - (time.monotonic() - self.last_write))
+
+    def flush(self) -> int:
+        """Вывести отложенный кадр"""
+        if self.pending is None:
+            return 0
+        return self.render(self.pending, force=True)
+
+    def invalidate(self):
+        """Следующий кадр - полная перерисовка (экран мог быть испорчен другим выводом)"""
+        self.previous = None
+
+    def close(self):
+        """Вернуть курсор под последний кадр"""
+        self.flush()
+        if not self.headless and self.previous is not None:
+            self.stream.write(f"{CSI}{len(self.previous) + 1};1H{CSI}?25h")
+            self.stream.flush()
+        self.previous = None
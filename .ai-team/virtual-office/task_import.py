@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Task Import for Virtual Office
+Потоковый массовый импорт задач из JSONL/CSV/stdin с возобновлением после прерывания
+"""
+
+import csv
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from codec import decode, encode
+from ids import new_id
+from office_writer import atomic_write
+
+PRIORITIES = ("low", "normal", "medium", "high", "critical")
+FIELDS = ("title", "description", "assignee", "priority", "deadline")
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def source_fingerprint(path: Path) -> str:
+    """Отпечаток файла-источника: размер, mtime и sha1 первых 64 КБ"""
+    st = path.stat()
+    with open(path, 'rb') as f:
+        head = hashlib.sha1(f.read(FINGERPRINT_BYTES)).hexdigest()
+    return f"{st.st_size}:{st.st_mtime_ns}:{head}"
+
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """(номер записи, запись) по одной, без чтения всего файла в память"""
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(stream), 1):
+            yield number, row
+        return
+
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = {"__error__": f"invalid JSON: {e}"}
+        yield number, record
+
+
+def validate(record: Dict, agents: List[str]) -> Dict:
+    """Проверить и нормализовать запись задачи (ValueError - запись пропускается)"""
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    if "__error__" in record:
+        raise ValueError(record["__error__"])
+
+    task = {field: str(record.get(field) or "").strip() for field in FIELDS}
+    if not task["title"]:
+        raise ValueError("title is required")
+
+    task["assignee"] = task["assignee"].lower().lstrip("@")
+    if task["assignee"] and agents and task["assignee"] not in agents:
+        raise ValueError(f"unknown assignee '{task['assignee']}'")
+
+    task["priority"] = task["priority"].lower() or "normal"
+    if task["priority"] not in PRIORITIES:
+        raise ValueError(f"unknown priority '{task['priority']}'")
+
+    if task["deadline"]:
+        try:
+            datetime.strptime(task["deadline"][:10], "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"bad deadline '{task['deadline']}' (expected YYYY-MM-DD)") from None
+    return task
+
+
+class ImportCheckpoint:
+    """Контрольная точка импорта: сколько записей зафиксировано и id текущей пачки
+
+    id пачки сохраняются до записи файлов, поэтому после прерывания посреди пачки
+    те же записи получают те же id и перезаписывают уже созданные файлы, а не дублируются.
+    Точка хранит отпечаток источника: с другим отпечатком (файл изменен или это другой
+    поток stdin) она не используется - mismatch. path=None - без сохранения на диск.
+    """
+
+    def __init__(self, path: Optional[Path], fingerprint: str = ""):
+        self.path = Path(path) if path is not None else None
+        self.fingerprint = fingerprint
+        self.committed = 0
+        self.imported = 0
+        self.pending: List[str] = []
+        self.mismatch = False
+        if self.path is not None and self.path.exists():
+            with open(self.path, 'rb') as f:
+                state = decode(f.read())
+            if state.get("fingerprint", "") != fingerprint:
+                self.mismatch = True
+                return
+            self.committed = state.get("committed", 0)
+            self.imported = state.get("imported", 0)
+            self.pending = state.get("pending", [])
+
+    def save(self):
+        if self.path is None:
+            return
+        atomic_write(self.path, encode({
+            "fingerprint": self.fingerprint,
+            "committed": self.committed,
+            "imported": self.imported,
+            "pending": self.pending,
+        }), fsync=True)
+
+    def clear(self):
+        if self.path is None:
+            return
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+class TaskImporter:
+    """Импорт задач пачками через общий писатель и индекс задач
+
+    Память не зависит от размера входа: в памяти только текущая пачка.
+    Для возобновления используется ключ источника (путь к файлу) и его отпечаток;
+    импорт из stdin возобновляется только по явному имени (resume), иначе без
+    контрольной точки.
+    """
+
+    def __init__(self, ceo, batch_size: int = 500, progress: TextIO = sys.stderr):
+        self.ceo = ceo
+        self.batch_size = batch_size
+        self.progress = progress
+        self.agents = list(ceo.inbox_store.agents)
+        self.checkpoint_dir = ceo.virtual_office / "system" / "imports"
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    def _checkpoint_for(self, source: str, resume: Optional[str] = None) -> ImportCheckpoint:
+        if source == "-":
+            if resume is None:
+                return ImportCheckpoint(None)
+            key, fingerprint = f"stdin:{resume}", f"stdin:{resume}"
+        else:
+            key, fingerprint = str(Path(source).resolve()), source_fingerprint(Path(source))
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        checkpoint = ImportCheckpoint(self.checkpoint_dir / f"{digest}.checkpoint", fingerprint)
+        if checkpoint.mismatch:
+            self.progress.write(f"⚠️ {source} изменился после прерванного импорта - импорт с начала\n")
+        return checkpoint
+
+    def _write_batch(self, batch: List[Tuple[int, Dict]], checkpoint: ImportCheckpoint):
+        # Reuse ids recorded before an interruption, assign new ones for the rest
+        ids = checkpoint.pending[:len(batch)]
+        ids += [new_id("TASK") for _ in range(len(batch) - len(ids))]
+        checkpoint.pending = ids
+        checkpoint.save()
+
+        items = []
+        tickets = []
+        for task_id, (_, fields) in zip(ids, batch):
+            task = self.ceo.build_task(fields["title"], fields["description"], fields["assignee"],
+                                       fields["priority"], fields["deadline"], task_id=task_id)
+            task_file = self.ceo.tasks_dir / f"{task_id}.json"
+            tickets.append(self.ceo.writer.put_json(task_file, task))
+            items.append((task, task_file))
+
+        self.ceo.writer.flush()
+        for ticket in tickets:
+            ticket.wait()
+        self.ceo.task_store.put_many(items)
+
+        checkpoint.committed = batch[-1][0]
+        checkpoint.imported += len(batch)
+        checkpoint.pending = []
+        checkpoint.save()
+
+    def run(self, source: str, fmt: Optional[str] = None, resume: Optional[str] = None) -> Dict[str, int]:
+        """Импортировать задачи из файла (source='-' - stdin, resume - имя для возобновления), вернуть статистику"""
+        if fmt is None:
+            fmt = "csv" if source.lower().endswith(".csv") else "jsonl"
+        checkpoint = self._checkpoint_for(source, resume)
+        resumed_from = checkpoint.committed
+        if resumed_from:
+            self.progress.write(f"↻ Продолжение импорта после записи {resumed_from}\n")
+
+        stream = sys.stdin if source == "-" else open(source, 'r', encoding='utf-8-sig', newline='')
+        started = time.perf_counter()
+        invalid = 0
+        imported = 0
+        batch: List[Tuple[int, Dict]] = []
+        try:
+            for number, record in iter_records(stream, fmt):
+                if number <= checkpoint.committed:
+                    continue
+                try:
+                    batch.append((number, validate(record, self.agents)))
+                except ValueError as e:
+                    invalid += 1
+                    self.progress.write(f"\n⚠️ Запись {number} пропущена: {e}\n")
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch, checkpoint)
+                    imported += len(batch)
+                    batch = []
+                    self._report(imported, invalid, started)
+
+            if batch:
+                self._write_batch(batch, checkpoint)
+                imported += len(batch)
+            self._report(imported, invalid, started)
+            self.progress.write("\n")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        total = checkpoint.imported
+        checkpoint.clear()
+        return {"imported": imported, "total": total, "invalid": invalid, "resumed_from": resumed_from}
+
+    def _report(self, imported: int, invalid: int, started: float):
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed > 0 else 0.0
+        self.progress.write(f"\r📥 Импортировано: {imported}, пропущено: {invalid}, {rate:,.0f} задач/с")
+        self.progress.flush()
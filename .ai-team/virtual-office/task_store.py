@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Task Store for Virtual Office
+Индексированное хранилище задач (SQLite) поверх tasks/*.json
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from codec import decode, encode
+
+# Directory mtimes younger than this are not trusted to cover every change (coarse timestamps)
+DIR_SETTLE_NS = 2_000_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id    TEXT PRIMARY KEY,
+    title      TEXT,
+    assignee   TEXT,
+    status     TEXT,
+    priority   TEXT,
+    deadline   TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    mtime_ns   INTEGER,
+    size       INTEGER,
+    doc        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status     ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_assignee   ON tasks(assignee);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority   ON tasks(priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_deadline   ON tasks(deadline);
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+
+CREATE TABLE IF NOT EXISTS ignored_files (
+    name     TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size     INTEGER
+);
+
+-- Materialized summary view: ('total', ''), ('status', 'new'), ('assignee', 'backend'), ...
+CREATE TABLE IF NOT EXISTS task_counts (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (field, value)
+) WITHOUT ROWID;
+"""
+
+# Triggers keep task_counts in sync with every insert/update/delete in O(1)
+VIEW_KEYS = (
+    ("total", "''"),
+    ("status", "IFNULL({row}.status, 'unknown')"),
+    ("assignee", "IFNULL({row}.assignee, 'unassigned')"),
+    ("priority", "IFNULL({row}.priority, 'normal')"),
+)
+
+
+def _view_inc(row: str) -> str:
+    return "\n".join(
+        f"    INSERT INTO task_counts VALUES ('{field}', {expr.format(row=row)}, 1)"
+        f" ON CONFLICT(field, value) DO UPDATE SET count = count + 1;"
+        for field, expr in VIEW_KEYS
+    )
+
+
+def _view_dec(row: str) -> str:
+    return "\n".join(
+        f"    UPDATE task_counts SET count = count - 1 WHERE field = '{field}' AND value = {expr.format(row=row)};\n"
+        f"    DELETE FROM task_counts WHERE field = '{field}' AND value = {expr.format(row=row)} AND count <= 0;"
+        for field, expr in VIEW_KEYS
+    )
+
+
+TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_task_counts_insert AFTER INSERT ON tasks BEGIN
+{_view_inc("NEW")}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_task_counts_delete AFTER DELETE ON tasks BEGIN
+{_view_dec("OLD")}
+END;
+CREATE TRIGGER IF NOT EXISTS trg_task_counts_update AFTER UPDATE OF status, assignee, priority ON tasks BEGIN
+{_view_dec("OLD")}
+{_view_inc("NEW")}
+END;
+"""
+
+# Columns that can be used in find()/count()/count_by()
+INDEXED_FIELDS = ("status", "assignee", "priority", "deadline")
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Открыть общую базу офиса (WAL, чтобы монитор и CEO могли работать одновременно)"""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=10, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class TaskStore:
+    """Индекс задач в SQLite с вторичными индексами по status/assignee/priority/deadline
+
+    JSON-файлы в tasks/ остаются источником истины (их читают PowerShell агенты),
+    база хранит разобранные документы (двоичный кодек, старые строки JSON тоже читаются)
+    и подхватывает чужие изменения через sync() по сигнатуре (mtime, size) без повторного
+    разбора неизмененных файлов.
+    """
+
+    def __init__(self, db_path: Path, tasks_dir: Path):
+        self.db_path = Path(db_path)
+        self.tasks_dir = Path(tasks_dir)
+
+        self.lock = threading.RLock()
+        self.dir_mark: Optional[int] = None  # tasks/ mtime at the last full listing
+        self.conn = connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+        self.conn.executescript(TRIGGERS)
+
+        # Index created before the views existed
+        has_tasks = self.conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone()
+        has_counts = self.conn.execute("SELECT 1 FROM task_counts LIMIT 1").fetchone()
+        if has_tasks and not has_counts:
+            self._recompute_views()
+        self.conn.commit()
+
+    def close(self):
+        """Закрыть соединение с базой"""
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def _row_values(task_id: str, task: Dict, mtime_ns: int, size: int) -> tuple:
+        return (
+            task_id,
+            task.get("title"),
+            task.get("assignee"),
+            task.get("status"),
+            task.get("priority"),
+            task.get("deadline"),
+            task.get("created_at"),
+            task.get("updated_at"),
+            mtime_ns,
+            size,
+            encode(task, "binary"),
+        )
+
+    def _upsert(self, task_id: str, task: Dict, mtime_ns: int, size: int):
+        # Real UPSERT (not INSERT OR REPLACE) so that the update trigger fires
+        self.conn.execute(
+            "INSERT INTO tasks (task_id, title, assignee, status, priority, deadline,"
+            " created_at, updated_at, mtime_ns, size, doc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(task_id) DO UPDATE SET title = excluded.title, assignee = excluded.assignee,"
+            " status = excluded.status, priority = excluded.priority, deadline = excluded.deadline,"
+            " created_at = excluded.created_at, updated_at = excluded.updated_at,"
+            " mtime_ns = excluded.mtime_ns, size = excluded.size, doc = excluded.doc",
+            self._row_values(task_id, task, mtime_ns, size)
+        )
+
+    def put(self, task: Dict, task_file: Path):
+        """Записать задачу в индекс сразу после сохранения её файла"""
+        task_file = Path(task_file)
+        try:
+            st = task_file.stat()
+            mtime_ns, size = st.st_mtime_ns, st.st_size
+        except OSError:
+            mtime_ns, size = 0, 0
+
+        with self.lock:
+            self._upsert(task_file.stem, task, mtime_ns, size)
+            self.conn.commit()
+
+    def put_many(self, items: List[Tuple[Dict, Path]]):
+        """Записать пачку задач одной транзакцией (массовый импорт)"""
+        with self.lock:
+            for task, task_file in items:
+                task_file = Path(task_file)
+                try:
+                    st = task_file.stat()
+                    mtime_ns, size = st.st_mtime_ns, st.st_size
+                except OSError:
+                    mtime_ns, size = 0, 0
+                self._upsert(task_file.stem, task, mtime_ns, size)
+            self.conn.commit()
+
+    def sync(self, force: bool = False) -> int:
+        """Синхронизировать индекс с tasks/*.json, возвращает число перечитанных файлов
+
+        Если mtime каталога изменился (файлы созданы, удалены или заменены
+        переименованием, как пишет task-manager.ps1), все файлы сверяются по
+        (mtime_ns, size) из записей каталога - на Windows это не требует stat.
+        Иначе stat делается только для незавершенных задач: их могут переписать
+        на месте, а завершенная история не трогается. force=True перечитывает все файлы.
+        """
+        try:
+            dir_mtime = self.tasks_dir.stat().st_mtime_ns
+        except OSError:
+            return 0
+
+        with self.lock:
+            known = {
+                row["task_id"]: (row["status"], (row["mtime_ns"], row["size"]))
+                for row in self.conn.execute("SELECT task_id, status, mtime_ns, size FROM tasks")
+            }
+            ignored = {
+                row["name"]: (row["mtime_ns"], row["size"])
+                for row in self.conn.execute("SELECT name, mtime_ns, size FROM ignored_files")
+            }
+            listed = force or self.dir_mark != dir_mtime
+
+            # (stem, path, signature) of every file that may have changed
+            candidates = []
+            if listed:
+                with os.scandir(self.tasks_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".json") and entry.is_file():
+                            st = entry.stat()
+                            candidates.append((entry.name[:-5], entry.path, (st.st_mtime_ns, st.st_size)))
+                seen = {stem for stem, _, _ in candidates}
+            else:
+                for task_id, (status, _) in known.items():
+                    if status == "completed":
+                        continue
+                    path = self.tasks_dir / f"{task_id}.json"
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue  # removed: the directory mtime moved, the next sync lists it
+                    candidates.append((task_id, path, (st.st_mtime_ns, st.st_size)))
+
+            reparsed = 0
+            for stem, path, signature in candidates:
+                if not force and (known.get(stem, (None, None))[1] == signature or ignored.get(stem) == signature):
+                    continue
+
+                try:
+                    with open(path, 'rb') as f:
+                        task = decode(f.read())
+                except (OSError, ValueError):
+                    # Half-written or broken file - retry on next sync
+                    continue
+
+                reparsed += 1
+                if isinstance(task, dict):
+                    self._upsert(stem, task, *signature)
+                    self.conn.execute("DELETE FROM ignored_files WHERE name = ?", (stem,))
+                else:
+                    # Not a task document (e.g. active.json list)
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO ignored_files (name, mtime_ns, size) VALUES (?, ?, ?)",
+                        (stem, *signature)
+                    )
+                    self.conn.execute("DELETE FROM tasks WHERE task_id = ?", (stem,))
+
+            if listed:
+                removed = [(task_id,) for task_id in known if task_id not in seen]
+                if removed:
+                    self.conn.executemany("DELETE FROM tasks WHERE task_id = ?", removed)
+                gone = [(name,) for name in ignored if name not in seen]
+                if gone:
+                    self.conn.executemany("DELETE FROM ignored_files WHERE name = ?", gone)
+                # A directory changed within the last mtime tick may change again unseen
+                self.dir_mark = dir_mtime if time.time_ns() - dir_mtime > DIR_SETTLE_NS else None
+
+            self.conn.commit()
+            return reparsed
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """Получить задачу по ID (имя файла без .json)"""
+        with self.lock:
+            row = self.conn.execute("SELECT doc FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return decode(row["doc"]) if row is not None else None
+
+    def rebuild(self) -> int:
+        """Пересобрать индекс и материализованные сводки с нуля из файлов"""
+        with self.lock:
+            self.conn.execute("DELETE FROM tasks")
+            self.conn.execute("DELETE FROM ignored_files")
+            self.conn.commit()
+            reparsed = self.sync(force=True)
+
+            # Recompute views from the rebuilt table in case they drifted
+            self._recompute_views()
+            self.conn.commit()
+            return reparsed
+
+    def _recompute_views(self):
+        self.conn.execute("DELETE FROM task_counts")
+        for field, expr in VIEW_KEYS:
+            self.conn.execute(
+                f"INSERT INTO task_counts SELECT '{field}', {expr.format(row='tasks')}, COUNT(*)"
+                f" FROM tasks GROUP BY 2"
+            )
+
+    def summary(self) -> Dict:
+        """Сводка по задачам из материализованного представления (O(число групп))"""
+        summary = {
+            "total": 0,
+            "by_status": {},
+            "by_assignee": {},
+            "by_priority": {}
+        }
+        with self.lock:
+            for row in self.conn.execute("SELECT field, value, count FROM task_counts"):
+                if row["field"] == "total":
+                    summary["total"] = row["count"]
+                else:
+                    summary[f"by_{row['field']}"][row["value"]] = row["count"]
+        return summary
+
+    @staticmethod
+    def _where(filters: Dict) -> tuple:
+        clauses = []
+        params = []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"Unknown task field: {field}")
+            clauses.append(f"{field} = ?")
+            params.append(value)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def find(self, order_by: str = "created_at DESC", limit: Optional[int] = None,
+             deadline_before: Optional[str] = None, **filters) -> List[Dict]:
+        """Найти задачи по индексированным полям (status, assignee, priority, deadline)"""
+        where, params = self._where(filters)
+        if deadline_before is not None:
+            where += (" AND " if where else " WHERE ") + "deadline < ?"
+            params.append(deadline_before)
+
+        column, _, direction = order_by.partition(" ")
+        if column not in INDEXED_FIELDS + ("created_at", "updated_at", "task_id"):
+            raise ValueError(f"Cannot order by: {order_by}")
+        direction = "DESC" if direction.upper() == "DESC" else "ASC"
+
+        sql = f"SELECT doc FROM tasks{where} ORDER BY {column} {direction}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self.lock:
+            return [decode(row["doc"]) for row in self.conn.execute(sql, params)]
+
+    def count(self, **filters) -> int:
+        """Количество задач по индексированным полям"""
+        where, params = self._where(filters)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM tasks{where}", params).fetchone()[0]
+
+    def count_by(self, field: str) -> Dict[Optional[str], int]:
+        """Группировка по полю: {значение: количество}, None - поле отсутствует"""
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Unknown task field: {field}")
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {field}, COUNT(*) FROM tasks GROUP BY {field}")
+            return {row[0]: row[1] for row in rows}
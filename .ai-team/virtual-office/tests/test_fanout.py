@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fan-out Tests for Virtual Office
+Разосланное жесткими ссылками сообщение читается каждым получателем отдельно
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from codec import decode, encode
+from fanout import FanOut
+from inbox_store import InboxStore
+from office_writer import atomic_write
+
+AGENTS = ["backend", "frontend", "qa"]
+
+
+class FanOutReadStateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.fanout = FanOut(self.root / "messages", self.root / "inbox")
+        msg = {"id": "MSG-1", "from": "CEO", "message": "Team meeting", "status": "unread"}
+        self.delivered = dict(self.fanout.send("MSG-1", msg, AGENTS))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @staticmethod
+    def status(path: Path) -> str:
+        return decode(path.read_bytes())["status"]
+
+    def test_marking_one_copy_read_leaves_others_unread(self):
+        # The way every writer marks a message read: replace this inbox's file
+        target = self.delivered["backend"]
+        msg = decode(target.read_bytes())
+        msg["status"] = "read"
+        atomic_write(target, encode(msg))
+
+        self.assertEqual(self.status(self.delivered["backend"]), "read")
+        self.assertEqual(self.status(self.delivered["frontend"]), "unread")
+        self.assertEqual(self.status(self.delivered["qa"]), "unread")
+
+    def test_inbox_store_marks_only_its_agent(self):
+        store = InboxStore(self.root / "office.db", self.root / "inbox", AGENTS)
+        try:
+            store.sync()
+            self.assertTrue(store.mark_read("backend", "MSG-1"))
+            self.assertEqual(store.summary()["backend"]["unread"], 0)
+            self.assertEqual(store.summary()["frontend"]["unread"], 1)
+        finally:
+            store.close()
+
+        self.assertEqual(self.status(self.delivered["backend"]), "read")
+        self.assertEqual(self.status(self.delivered["frontend"]), "unread")
+        self.assertEqual(self.status(self.delivered["qa"]), "unread")
+
+    def test_prune_keeps_payload_while_linked(self):
+        self.assertEqual(self.fanout.prune(), 0)
+        for path in self.delivered.values():
+            path.unlink()
+        self.assertEqual(self.fanout.prune(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
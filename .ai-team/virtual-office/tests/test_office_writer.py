@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Office Writer Tests for Virtual Office
+Порядок операций в пачке и доставка ошибок записи вызывающему
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import office_writer
+from office_writer import GroupCommitWriter, WriteError, atomic_write
+
+
+class GroupCommitOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        # A long interval keeps every operation of a test in one batch
+        self.writer = GroupCommitWriter(flush_interval=10)
+
+    def tearDown(self):
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def test_append_after_put_extends_the_new_document(self):
+        path = self.root / "chat.md"
+        path.write_bytes(b"old\n")
+        self.writer.append_text(path, "lost\n")
+        self.writer.put_bytes(path, b"header\n")
+        self.writer.append_text(path, "line 1\n")
+        self.writer.append_text(path, "line 2\n")
+        self.writer.flush()
+        self.assertEqual(path.read_bytes(), b"header\nline 1\nline 2\n")
+
+    def test_put_after_append_wins(self):
+        path = self.root / "metrics.json"
+        self.writer.append_text(path, "partial")
+        self.writer.put_bytes(path, b"{}")
+        self.writer.flush()
+        self.assertEqual(path.read_bytes(), b"{}")
+
+    def test_flush_raises_uncollected_failures_once(self):
+        missing = self.root / "no-such-dir" / "task.json"
+        self.writer.put_json(missing, {"task_id": "TASK-1"})
+        with self.assertRaises(WriteError) as raised:
+            self.writer.flush()
+        self.assertEqual(raised.exception.failures[0][0], missing)
+        self.assertTrue(self.writer.flush())
+
+    def test_failure_collected_from_ticket_is_not_raised_again(self):
+        writer = GroupCommitWriter(flush_interval=0.01)
+        try:
+            ticket = writer.put_json(self.root / "no-such-dir" / "task.json", {})
+            with self.assertRaises(FileNotFoundError):
+                ticket.wait(timeout=5)
+            self.assertTrue(writer.flush())
+        finally:
+            writer.close()
+
+
+class AtomicWriteRetryTest(unittest.TestCase):
+    def test_replace_retried_while_target_is_busy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "task.json"
+            real_replace = os.replace
+            calls = []
+
+            def busy_twice(src, dst):
+                calls.append(dst)
+                if len(calls) <= 2:
+                    raise PermissionError(13, "file is open in another process")
+                real_replace(src, dst)
+
+            with mock.patch.object(office_writer.os, "replace", busy_twice), \
+                    mock.patch.object(office_writer.time, "sleep"):
+                atomic_write(path, b"{}")
+            self.assertEqual(path.read_bytes(), b"{}")
+            self.assertEqual(len(calls), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time Series Store for Virtual Office
+История метрик: кольцевые буферы фиксированного размера с прореживанием до 1 мин и 1 ч
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# (name, bucket seconds, slots); bucket 0 = every sample kept as is
+LEVELS: Tuple[Tuple[str, int, int], ...] = (
+    ("raw", 0, 1024),
+    ("1m", 60, 1440),     # 24 hours
+    ("1h", 3600, 2160),   # 90 days
+)
+
+MAGIC = b"VOTS"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xdd")      # magic, version, last counter value, last sample time
+LEVEL_HEADER = struct.Struct("<II")     # head (newest slot), count
+SLOT = struct.Struct("<qdddI4x")        # bucket start, sum, min, max, samples
+HEADER_SIZE = 64
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class Point(NamedTuple):
+    """Точка ряда: начало интервала (unix time) и сводка значений за интервал"""
+    ts: int
+    sum: float
+    min: float
+    max: float
+    count: int
+
+
+def _layout() -> Tuple[List[int], int]:
+    offsets = []
+    offset = HEADER_SIZE
+    for _, _, slots in LEVELS:
+        offsets.append(offset)
+        offset += slots * SLOT.size
+    return offsets, offset
+
+
+LEVEL_OFFSETS, FILE_SIZE = _layout()
+
+
+class Series:
+    """Один ряд в файле фиксированного размера (все уровни - кольца в одном mmap)
+
+    Запись за O(1) обновляет все уровни сразу: сырое значение добавляется в кольцо
+    raw, а в 1m и 1h - к текущему интервалу (новый интервал вытесняет самый старый).
+    Размер файла не зависит от времени работы офиса.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0))
+        try:
+            valid = False
+            if os.fstat(fd).st_size == FILE_SIZE:
+                magic, version, _, _ = HEADER.unpack(os.read(fd, HEADER.size))
+                valid = magic == MAGIC and version == VERSION
+            if not valid:
+                if os.fstat(fd).st_size:
+                    print(f"⚠️ Ряд {self.path.name} другого формата, история начата заново")
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, FILE_SIZE)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, HEADER.pack(MAGIC, VERSION, 0.0, 0.0))
+            self.map = mmap.mmap(fd, FILE_SIZE)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self.lock:
+            self.map.close()
+
+    # --- header -------------------------------------------------------------
+
+    @property
+    def last_value(self) -> Tuple[float, float]:
+        """(последнее значение счетчика, время выборки) - для record_counter"""
+        _, _, value, ts = HEADER.unpack_from(self.map, 0)
+        return value, ts
+
+    def _set_last_value(self, value: float, ts: float):
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, value, ts)
+
+    # --- rings --------------------------------------------------------------
+
+    def _ring_header_offset(self, level: int) -> int:
+        # Ring headers live in the spare header bytes after HEADER
+        return HEADER.size + LEVEL_HEADER.size * level
+
+    def _get_ring(self, level: int) -> Tuple[int, int]:
+        return LEVEL_HEADER.unpack_from(self.map, self._ring_header_offset(level))
+
+    def _set_ring(self, level: int, head: int, count: int):
+        LEVEL_HEADER.pack_into(self.map, self._ring_header_offset(level), head, count)
+
+    def _slot_offset(self, level: int, index: int) -> int:
+        return LEVEL_OFFSETS[level] + index * SLOT.size
+
+    def _add(self, level: int, ts: float, value: float):
+        _, width, slots = LEVELS[level]
+        head, count = self._get_ring(level)
+        bucket = int(ts) - int(ts) % width if width else int(ts)
+        if count and width:
+            offset = self._slot_offset(level, head)
+            start, total, low, high, samples = SLOT.unpack_from(self.map, offset)
+            # Same interval, or a late sample (clock step back): fold into the newest
+            if bucket <= start:
+                SLOT.pack_into(self.map, offset, start, total + value,
+                               min(low, value), max(high, value), samples + 1)
+                return
+        head = (head + 1) % slots if count else 0
+        SLOT.pack_into(self.map, self._slot_offset(level, head), bucket, value, value, value, 1)
+        self._set_ring(level, head, min(count + 1, slots))
+
+    def record(self, value: float, ts: Optional[float] = None):
+        """Добавить значение (для счетчиков - прирост за интервал)"""
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            for level in range(len(LEVELS)):
+                self._add(level, ts, value)
+
+    def record_counter(self, value: float, ts: Optional[float] = None) -> float:
+        """Записать прирост накопительного счетчика с прошлой выборки, вернуть прирост
+
+        Первая выборка только запоминает значение; уменьшение (сброс счетчика)
+        считается приростом с нуля.
+        """
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            last, last_ts = self.last_value
+            self._set_last_value(value, ts)
+            if not last_ts:
+                return 0.0
+            delta = value - last if value >= last else value
+            if delta:
+                for level in range(len(LEVELS)):
+                    self._add(level, ts, delta)
+            return delta
+
+    def points(self, level: int) -> List[Point]:
+        """Все точки уровня от старой к новой"""
+        _, _, slots = LEVELS[level]
+        with self.lock:
+            head, count = self._get_ring(level)
+            first = (head - count + 1) % slots
+            if first + count <= slots:
+                data = self.map[self._slot_offset(level, first):self._slot_offset(level, first + count)]
+            else:
+                data = (self.map[self._slot_offset(level, first):self._slot_offset(level, slots)]
+                        + self.map[self._slot_offset(level, 0):self._slot_offset(level, head + 1)])
+        return [Point(*slot) for slot in SLOT.iter_unpack(data)]
+
+    def query(self, start: float, end: Optional[float] = None, resolution: Optional[str] = None) -> List[Point]:
+        """Точки за [start, end]; resolution raw/1m/1h, по умолчанию самый подробный
+        уровень, который еще хранит start"""
+        end = time.time() if end is None else end
+        names = [name for name, _, _ in LEVELS]
+        if resolution is not None:
+            levels = [names.index(resolution)]
+        else:
+            levels = list(range(len(LEVELS)))
+        for level in levels:
+            points = self.points(level)
+            covers = points and points[0].ts <= start
+            if covers or level == levels[-1] or len(points) < LEVELS[level][2]:
+                width = LEVELS[level][1]
+                if not width:
+                    return [point for point in points if start <= point.ts <= end]
+                # Intervals overlapping [start, end]
+                return [point for point in points if point.ts + width > start and point.ts <= end]
+        return []
+
+    def buckets(self, resolution: str, count: int, now: Optional[float] = None) -> List[float]:
+        """Суммы за последние count интервалов resolution (пустые интервалы - 0), от старых к новым"""
+        names = [name for name, _, _ in LEVELS]
+        level = names.index(resolution)
+        width = LEVELS[level][1]
+        now = time.time() if now is None else now
+        current = int(now) - int(now) % width
+        first = current - (count - 1) * width
+        sums = [0.0] * count
+        for point in self.points(level):
+            if point.ts >= first:
+                index = (point.ts - first) // width
+                if 0 <= index < count:
+                    sums[index] += point.sum
+        return sums
+
+    def total(self, seconds: float, now: Optional[float] = None) -> float:
+        """Сумма значений за последние seconds секунд (по минутному уровню)"""
+        now = time.time() if now is None else now
+        return sum(point.sum for point in self.query(now - seconds, now, "1m"))
+
+
+def _series_name(metric: str, agent: str = "") -> str:
+    name = f"{metric}@{agent}" if agent else metric
+    return re.sub(r"[^A-Za-z0-9_.@-]", "_", name) + ".ts"
+
+
+class TimeSeriesStore:
+    """Каталог рядов: один файл на метрику и агента (агент "" - общие итоги)
+
+    Файлы фиксированного размера, поэтому место на диске ограничено числом рядов.
+    Писатель один - семплер монитора; читать можно из любого процесса.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.series: Dict[str, Series] = {}
+
+    def get(self, metric: str, agent: str = "") -> Series:
+        name = _series_name(metric, agent)
+        with self.lock:
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = Series(self.directory / name)
+            return series
+
+    def exists(self, metric: str, agent: str = "") -> bool:
+        return (self.directory / _series_name(metric, agent)).exists()
+
+    def record(self, metric: str, value: float, agent: str = "", ts: Optional[float] = None):
+        self.get(metric, agent).record(value, ts)
+
+    def record_counters(self, counters: Iterable[Tuple[str, str, float]], ts: Optional[float] = None):
+        """Выборка накопительных счетчиков: (метрика, агент, значение)"""
+        ts = time.time() if ts is None else ts
+        for metric, agent, value in counters:
+            self.get(metric, agent).record_counter(value, ts)
+
+    def query(self, metric: str, start: float, end: Optional[float] = None,
+              agent: str = "", resolution: Optional[str] = None) -> List[Point]:
+        return self.get(metric, agent).query(start, end, resolution)
+
+    def close(self):
+        with self.lock:
+            for series in self.series.values():
+                series.close()
+            self.series.clear()
+
+
+def metric_counters(metrics: Dict) -> List[Tuple[str, str, float]]:
+    """Счетчики из документа metrics.json: (метрика, агент, значение)"""
+    counters = []
+    for agent, values in (metrics.get("agents") or {}).items():
+        for metric, value in (values or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                counters.append((metric, agent, float(value)))
+    for metric, value in (metrics.get("totals") or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            counters.append((metric, "", float(value)))
+    return counters
+
+
+def sparkline(values: List[float]) -> str:
+    """Строка из блоков ▁..█ по значениям (нули - самый низкий блок)"""
+    high = max(values, default=0)
+    if high <= 0:
+        return SPARK_CHARS[0] * len(values)
+    scale = len(SPARK_CHARS) - 1
+    # Any activity shows above the zero block
+    return "".join(SPARK_CHARS[max(1, round(value / high * scale)) if value > 0 else 0] for value in values)